@@ -1,17 +1,71 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import Session
-from .database import SessionLocal, engine, Base
-from .models import User, Home, DeviceCategory, Device
-import bcrypt
+from alembic import command
+from alembic.config import Config
+from .database import SessionLocal, engine
+from .models import DeviceCategory
+import argparse
 import logging
+import os
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 创建所有表
+# Alembic配置文件位于项目根目录
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+# 引入迁移前由create_all建表的数据库对应的版本
+BASELINE_REVISION = "0001"
+
+# 多个进程同时执行迁移时（如每个worker启动时都迁移）用于排队的咨询锁
+MIGRATION_LOCK = "smart_home_api.migrations"
+# 等待其他进程释放迁移锁的最长时间（秒），0表示一直等待
+MIGRATION_LOCK_TIMEOUT = float(os.getenv("DB_MIGRATION_LOCK_TIMEOUT_SECONDS", "600"))
+
+class MigrationLockTimeout(RuntimeError):
+    """等待迁移锁超时"""
+
+def get_alembic_config():
+    """构建Alembic配置，日志沿用应用自身的配置"""
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    return config
+
+# 将数据库升级到最新版本
 def init_db():
-    logger.info("正在创建数据库表...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("数据库表创建完成")
+    logger.info("正在执行数据库迁移...")
+    config = get_alembic_config()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        # 会话级锁在整个迁移期间持有，后获得锁的进程会发现已是最新版本。
+        # 用try_lock轮询而不是阻塞等待：阻塞中的语句持有快照，会让迁移中的CREATE INDEX CONCURRENTLY一直等待它
+        locked = connection.dialect.name == "postgresql"
+        if locked:
+            deadline = time.monotonic() + MIGRATION_LOCK_TIMEOUT
+            while not connection.execute(
+                text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": MIGRATION_LOCK}
+            ).scalar():
+                if MIGRATION_LOCK_TIMEOUT > 0 and time.monotonic() >= deadline:
+                    # 持有锁的会话卡住时，可在pg_locks中按locktype = 'advisory'找到其pid并结束它
+                    raise MigrationLockTimeout(
+                        f"等待迁移锁超过{MIGRATION_LOCK_TIMEOUT:.0f}秒，其他进程可能仍在迁移或已卡住；"
+                        f"可通过DB_MIGRATION_LOCK_TIMEOUT_SECONDS调整等待时间"
+                    )
+                time.sleep(0.5)
+        try:
+            tables = inspect(connection).get_table_names()
+
+            # 没有版本记录但表已存在，说明是之前用create_all创建的数据库，先标记为基线版本
+            if "alembic_version" not in tables and "users" in tables:
+                logger.info(f"检测到未纳入版本管理的数据库，标记为基线版本{BASELINE_REVISION}")
+                command.stamp(config, BASELINE_REVISION)
+
+            command.upgrade(config, "head")
+        finally:
+            if locked:
+                connection.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": MIGRATION_LOCK})
+    logger.info("数据库迁移完成")
 
 # 添加默认设备类别
 def create_device_categories(db: Session):
@@ -37,17 +91,25 @@ def create_device_categories(db: Session):
     logger.info(f"已添加{len(categories)}个设备类别")
 
 def main():
+    parser = argparse.ArgumentParser(description="初始化或升级智能家居系统数据库（部署时在启动API服务之前执行）")
+    parser.add_argument(
+        "command", nargs="?", default="init", choices=["init", "migrate"],
+        help="init：执行迁移并添加默认设备类别（默认）；migrate：只执行迁移"
+    )
+    args = parser.parse_args()
+
     logger.info("开始初始化数据库...")
     
-    # 创建数据库表
+    # 创建或升级数据库表
     init_db()
     
     # 添加初始数据
-    db = SessionLocal()
-    try:
-        create_device_categories(db)
-    finally:
-        db.close()
+    if args.command == "init":
+        db = SessionLocal()
+        try:
+            create_device_categories(db)
+        finally:
+            db.close()
     
     logger.info("数据库初始化完成")
 
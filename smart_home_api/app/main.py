@@ -1,16 +1,82 @@
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import logging
+import os
 
-from .database import engine, Base, get_db
+from .database import engine, async_engine, get_pool_status, ping_database, pool_exhausted, warm_pool
+from .initial_data import init_db
 from .routers import users, homes, devices, device_usage, security_events, analytics, feedback
+from .services import analytics_views, charts, partitions, passwords, pattern_jobs, reference_data, usage_buffer, usage_itemsets, usage_rollup
+from .utils import cache, query_counter, scheduler
+from .utils.security import get_auth_cache_stats
 
-# 创建数据库表
-Base.metadata.create_all(bind=engine)
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 导入应用时不再访问数据库。表结构由`python -m app.initial_data`在部署时创建和升级，
+# 单进程开发时可设置DB_MIGRATE_ON_STARTUP=true在启动时执行迁移
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "false").strip().lower() in ("1", "true", "yes", "on")
+# 是否在本进程中运行后台维护任务（可只在部分实例上开启）
+ENABLE_BACKGROUND_JOBS = os.getenv("ENABLE_BACKGROUND_JOBS", "true").strip().lower() in ("1", "true", "yes", "on")
+# 就绪检查中探测数据库的超时时间（秒）
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+
+async def _warm_pool():
+    try:
+        logger.info(f"连接池已预热{await warm_pool()}个连接")
+    except Exception as e:
+        # 数据库暂不可用时照常启动，/health/ready在数据库恢复前返回503
+        logger.warning(f"预热连接池出错，将在处理请求时建立连接: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    if DB_MIGRATE_ON_STARTUP:
+        await run_in_threadpool(init_db)
+    # 预热互不依赖，并发执行以缩短启动时间
+    await asyncio.gather(_warm_pool(), run_in_threadpool(reference_data.warm), passwords.start())
+    if ENABLE_BACKGROUND_JOBS:
+        scheduler.register_job(
+            "device_usage_partitions",
+            partitions.PARTITION_MAINTENANCE_INTERVAL,
+            partitions.run_partition_maintenance
+        )
+        scheduler.register_job(
+            "device_usage_hourly_compaction",
+            usage_rollup.ROLLUP_COMPACTION_INTERVAL,
+            usage_rollup.run_rollup_compaction,
+            run_on_start=False
+        )
+        scheduler.register_job(
+            "analytics_view_refresh",
+            analytics_views.ANALYTICS_VIEW_REFRESH_INTERVAL,
+            analytics_views.run_analytics_view_refresh
+        )
+        scheduler.register_job(
+            "usage_itemset_counts",
+            usage_itemsets.ITEMSET_COUNT_REFRESH_INTERVAL,
+            usage_itemsets.run_itemset_count_refresh
+        )
+        scheduler.start_jobs()
+    if usage_buffer.WRITE_BEHIND_ENABLED:
+        await usage_buffer.start()
+    app.state.ready = True
+    yield
+    # 关闭期间不再接收新流量
+    app.state.ready = False
+    await usage_buffer.stop()
+    await scheduler.stop_jobs()
+    pattern_jobs.shutdown_executor()
+    passwords.shutdown_executor()
+    charts.shutdown_executor(wait=True)
 
 # 初始化FastAPI
 app = FastAPI(
+    lifespan=lifespan,
     title="智能家居系统API",
     description="智能家居系统的REST API接口，用于管理智能家居设备、用户、住宅及相关数据分析",
     version="1.0.0",
@@ -44,6 +110,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 统计每个请求执行的SQL语句数（调试用，见README）
+query_counter.install(engine)
+if async_engine is not None:
+    query_counter.install(async_engine.sync_engine)
+if query_counter.SQL_STATEMENT_COUNT_ENABLED:
+    app.middleware("http")(query_counter.statement_count_middleware)
+
 # 包含各路由
 app.include_router(users.router, prefix="/api/users", tags=["用户管理"])
 app.include_router(homes.router, prefix="/api/homes", tags=["住宅管理"])
@@ -57,6 +130,35 @@ app.include_router(analytics.router, prefix="/api/analytics", tags=["数据分
 def read_root():
     return {"message": "欢迎使用智能家居系统API"}
 
+@app.get("/health/live")
+def liveness_check():
+    """进程能处理请求即为存活，不访问数据库（数据库故障时重启进程无济于事）"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check(response: Response):
+    """启动完成、连接池未耗尽且数据库可用时返回200，否则返回503"""
+    checks = {"startup": getattr(app.state, "ready", False), "pool_available": not pool_exhausted()}
+    if all(checks.values()):
+        try:
+            await asyncio.wait_for(ping_database(), READINESS_TIMEOUT)
+            checks["database"] = True
+        except Exception as e:
+            logger.warning(f"就绪检查访问数据库失败: {type(e).__name__} {str(e)}")
+            checks["database"] = False
+    ready = all(checks.values())
+    response.status_code = 200 if ready else 503
+    return {"status": "ready" if ready else "not_ready", "checks": checks}
+
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "database_pool": get_pool_status(),
+        "cache": cache.get_cache_stats(),
+        "reference_cache": reference_data.get_stats(),
+        "write_behind": usage_buffer.get_stats(),
+        "password_hashing": passwords.get_stats(),
+        "chart_rendering": charts.get_stats(),
+        "auth_cache": get_auth_cache_stats()
+    }
@@ -3,7 +3,9 @@ from .users import User
 from .homes import Home
 from .devices import DeviceCategory, Device
 from .feedback import Feedback
-from .device_usage import DeviceUsage
+from .device_usage import DeviceUsage, DeviceUsageHourly
 from .security_events import SecurityEvent
+from .pattern_jobs import PatternMiningJob
+from .usage_itemsets import UsageItemsetCount, UsageItemsetState
 
 # 确保所有模型都已加载和注册
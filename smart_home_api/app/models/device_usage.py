@@ -1,19 +1,42 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, func
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Index, func
 from sqlalchemy.orm import relationship
 from ..database import Base
 
 class DeviceUsage(Base):
     __tablename__ = "device_usage"
     
-    usage_id = Column(Integer, primary_key=True, index=True)
+    # 表按start_time月度分区（迁移0003），分区表的主键必须包含分区键
+    usage_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     device_id = Column(Integer, ForeignKey("devices.device_id"))
     user_id = Column(Integer, ForeignKey("users.user_id"))
-    start_time = Column(DateTime, nullable=False)
+    start_time = Column(DateTime, primary_key=True, nullable=False)
     end_time = Column(DateTime)
     operation_type = Column(String(50))
     operation_value = Column(Text)
     created_at = Column(DateTime, default=func.now())
     
+    # 索引（由迁移0002创建）
+    __table_args__ = (
+        Index("ix_device_usage_device_id_start_time", device_id, start_time.desc()),
+        Index("ix_device_usage_user_id_start_time", user_id, start_time.desc()),
+        Index("ix_device_usage_start_time_brin", start_time, postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
+    
     # 关系
     device = relationship("Device", back_populates="usage_records")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+class DeviceUsageHourly(Base):
+    """按设备和小时预聚合的使用统计，随device_usage写入增量维护"""
+    __tablename__ = "device_usage_hourly"
+    
+    device_id = Column(Integer, ForeignKey("devices.device_id"), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # start_time截断到小时
+    usage_count = Column(Integer, nullable=False, default=0)  # 全部使用记录数
+    completed_count = Column(Integer, nullable=False, default=0)  # 已结束（end_time不为空）的记录数
+    total_seconds = Column(Float, nullable=False, default=0)  # 已结束记录的累计使用时长
+    
+    __table_args__ = (
+        Index("ix_device_usage_hourly_bucket", bucket),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
 from sqlalchemy.orm import relationship
 from ..database import Base
 
@@ -30,5 +30,6 @@ class Device(Base):
     
     # 关系
     home = relationship("Home", back_populates="devices")
-    category = relationship("DeviceCategory", back_populates="devices")
+    # 响应模型嵌套了category，查询时必须显式预加载（见services/devices.py），遗漏时直接报错而不是逐条查询
+    category = relationship("DeviceCategory", back_populates="devices", lazy="raise_on_sql")
     usage_records = relationship("DeviceUsage", back_populates="device")
\ No newline at end of file
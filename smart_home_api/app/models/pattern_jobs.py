@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, JSON, UniqueConstraint
+from ..database import Base
+from datetime import datetime
+
+class PatternMiningJob(Base):
+    """设备使用模式（关联规则）挖掘任务及其结果"""
+    __tablename__ = "pattern_mining_jobs"
+
+    job_id = Column(Integer, primary_key=True, index=True)
+    params_key = Column(String(64), nullable=False)  # 规范化参数的摘要
+    params = Column(JSON, nullable=False)
+    data_watermark = Column(BigInteger, nullable=False)  # 提交时device_usage的数据版本
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, succeeded, failed
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    # 相同参数在同一数据版本上只保留一个任务，重复提交直接复用
+    __table_args__ = (
+        UniqueConstraint("params_key", "data_watermark", name="uq_pattern_mining_jobs_params_watermark"),
+    )
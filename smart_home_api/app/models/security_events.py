@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, synonym
 from ..database import Base
 
 class SecurityEvent(Base):
@@ -18,6 +18,10 @@ class SecurityEvent(Base):
     resolved_at = Column(DateTime)
     created_at = Column(DateTime, default=func.now())
     
+    # 接口中使用的字段名
+    resolved = synonym("is_resolved")
+    resolution_time = synonym("resolved_at")
+    
     # 关系
     home = relationship("Home")
     device = relationship("Device")
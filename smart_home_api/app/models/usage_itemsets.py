@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, Text, DateTime, Index
+from sqlalchemy.dialects.postgresql import ARRAY
+from ..database import Base
+
+class UsageItemsetCount(Base):
+    """设备组合（项集）在购物篮中出现的次数，供增量关联规则分析使用"""
+    __tablename__ = "usage_itemset_counts"
+    
+    itemset = Column(ARRAY(Text), primary_key=True)  # 按名称排序的设备名
+    length = Column(SmallInteger, nullable=False)
+    basket_count = Column(BigInteger, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index("ix_usage_itemset_counts_length_basket_count", length, basket_count),
+    )
+
+class UsageItemsetState(Base):
+    """项集计数的进度（单行），counted_until之前的时间窗口已计入"""
+    __tablename__ = "usage_itemset_state"
+    
+    state_id = Column(Integer, primary_key=True)
+    counted_until = Column(DateTime, nullable=True)
+    basket_count = Column(BigInteger, nullable=False, default=0)  # 已计入的购物篮数
+    usage_count = Column(BigInteger, nullable=False, default=0)  # 已计入的使用记录数
+    max_len = Column(Integer, nullable=False)  # 计数的最大项集长度
+    updated_at = Column(DateTime, nullable=True)
@@ -1,65 +1,319 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import Dict, Any, Optional
+from datetime import datetime
+from ..database import DbSession, get_session, run_db
 from ..services import analytics as service
+from ..services import analytics_views, charts
+from ..services import pattern_jobs
+from ..schemas.pattern_jobs import PatternJob, PatternJobCreate
+from ..utils import cache
+from ..utils.visualization_helpers import CHART_MEDIA_TYPES
+import json
 import logging
+import os
+import time
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 是否缓存分析结果
+ANALYTICS_CACHE_ENABLED = os.getenv("ANALYTICS_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+
+def _cache_ttl(endpoint: str, default: int) -> float:
+    """各接口的缓存时间（秒），可通过ANALYTICS_CACHE_TTL_<接口名>覆盖，0表示不缓存"""
+    return float(os.getenv(f"ANALYTICS_CACHE_TTL_{endpoint.upper().replace('-', '_')}", str(default)))
+
+ANALYTICS_CACHE_TTLS = {
+    "device-usage-frequency": _cache_ttl("device-usage-frequency", 60),
+    "device-usage-timeframe": _cache_ttl("device-usage-timeframe", 60),
+    "device-usage-patterns": _cache_ttl("device-usage-patterns", 300),
+    "home-area-impact": _cache_ttl("home-area-impact", 120),
+    "security-events-summary": _cache_ttl("security-events-summary", 15),
+    "user-feedback-analysis": _cache_ttl("user-feedback-analysis", 120),
+}
+
+def analytics_filters(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    home_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    user_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    分析接口通用的过滤参数，全部在SQL中执行
+
+    - start/end: 时间范围（左闭右开）
+    - home_id/category_id: 住宅、设备类别
+    - user_id: 设备使用者（使用分析）、住宅所有者（安防事件）或反馈提交者（用户反馈）
+    """
+    return {"start": start, "end": end, "home_id": home_id, "category_id": category_id, "user_id": user_id}
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    # 弱比较：忽略W/前缀
+    candidates = [value[2:] if value.startswith("W/") else value for value in candidates]
+    return "*" in candidates or etag in candidates
+
+async def _analytics_entry(endpoint: str, tags, compute, fresh: bool = False, **params):
+    """
+    读取或计算分析结果的缓存条目，返回(条目, 缓存时间)
+
+    条目包含已序列化的响应体、ETag和数据来源元信息。fresh=true时既不读也不写缓存。
+    """
+    ttl = ANALYTICS_CACHE_TTLS[endpoint] if ANALYTICS_CACHE_ENABLED and not fresh else 0
+    key = None
+    entry = None
+    if ttl > 0:
+        key = await cache.abuild_key(f"analytics:{endpoint}", params, tags)
+        entry = await cache.aget(key)
+
+    if entry is None:
+        result, meta = await compute()
+        body = JSONResponse(content=jsonable_encoder(result)).body
+        entry = {"body": body, "etag": cache.etag_for(body), "meta": meta, "created_at": time.time()}
+        if key is not None:
+            await cache.aput(key, entry, ttl)
+    return entry, ttl
+
+def _entry_headers(entry: Dict[str, Any], ttl: float) -> Dict[str, str]:
+    """响应头：ETag、缓存时间以及数据来源和新鲜度"""
+    age = time.time() - entry["created_at"]
+    meta = entry["meta"]
+    headers = {
+        "ETag": entry["etag"],
+        "Cache-Control": f"private, max-age={max(int(ttl - age), 0)}" if ttl > 0 else "no-cache",
+        "X-Data-Source": meta["source"],
+    }
+    if meta["source"] == "view":
+        headers["X-Data-Refreshed-At"] = meta["refreshed_at"].isoformat()
+        headers["X-Data-Staleness-Seconds"] = f"{meta['staleness_seconds'] + age:.0f}"
+    return headers
+
+async def _cached_analytics(request: Request, endpoint: str, tags, compute, fresh: bool = False, **params) -> Response:
+    """
+    带缓存执行分析查询
+
+    命中缓存时直接返回已序列化的响应体；If-None-Match与ETag一致时返回304。
+    fresh=true时既不读也不写缓存。响应头同时报告数据来源和新鲜度。
+    """
+    entry, ttl = await _analytics_entry(endpoint, tags, compute, fresh=fresh, **params)
+    headers = _entry_headers(entry, ttl)
+    if _etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+def _view_query(db: DbSession, analyze, view_name: str, fresh: bool, **filters):
+    """返回执行分析查询（不带过滤条件时优先读取物化视图）的协程函数"""
+    async def compute():
+        return await run_db(db, analytics_views.query_analytics, analyze, view_name, fresh=fresh, **filters)
+    return compute
+
 @router.get("/device-usage-frequency")
-def get_device_usage_frequency(db: Session = Depends(get_db)):
-    """获取设备使用频率分析"""
+async def get_device_usage_frequency(
+    request: Request,
+    filters: Dict[str, Any] = Depends(analytics_filters),
+    fresh: bool = False,
+    db: DbSession = Depends(get_session)
+):
+    """获取设备使用频率分析（fresh=true时绕过缓存和物化视图实时计算）"""
     try:
-        return service.analyze_device_usage_frequency(db)
+        return await _cached_analytics(
+            request, "device-usage-frequency", [cache.DEVICE_USAGE_TAG],
+            _view_query(db, service.analyze_device_usage_frequency, service.FREQUENCY_VIEW, fresh, **filters),
+            fresh=fresh, **filters
+        )
     except Exception as e:
         logger.error(f"设备使用频率分析出错: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"设备使用频率分析出错: {str(e)}")
 
 @router.get("/device-usage-timeframe")
-def get_device_usage_timeframe(db: Session = Depends(get_db)):
-    """获取设备使用时间段分析"""
+async def get_device_usage_timeframe(
+    request: Request,
+    filters: Dict[str, Any] = Depends(analytics_filters),
+    fresh: bool = False,
+    db: DbSession = Depends(get_session)
+):
+    """获取设备使用时间段分析（fresh=true时绕过缓存和物化视图实时计算）"""
     try:
-        return service.analyze_device_usage_timeframe(db)
+        return await _cached_analytics(
+            request, "device-usage-timeframe", [cache.DEVICE_USAGE_TAG],
+            _view_query(db, service.analyze_device_usage_timeframe, service.TIMEFRAME_VIEW, fresh, **filters),
+            fresh=fresh, **filters
+        )
     except Exception as e:
         logger.error(f"设备使用时间段分析出错: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"设备使用时间段分析出错: {str(e)}")
 
 @router.get("/device-usage-patterns")
-def get_device_usage_patterns(min_support: float = 0.1, db: Session = Depends(get_db)):
+async def get_device_usage_patterns(
+    request: Request,
+    min_support: float = 0.1,
+    min_confidence: float = Query(0.5, gt=0, le=1, description="关联规则的最小置信度"),
+    max_len: Optional[int] = Query(None, ge=1, description="频繁项集的最大长度"),
+    incremental: bool = Query(False, description="由增量维护的项集计数推导规则（仅在不带过滤条件时生效）"),
+    filters: Dict[str, Any] = Depends(analytics_filters),
+    fresh: bool = False,
+    db: DbSession = Depends(get_session)
+):
     """分析设备使用模式（哪些设备经常一起使用）"""
+    async def compute():
+        result = await run_db(
+            db, service.analyze_device_usage_patterns, min_support,
+            max_len=max_len, min_confidence=min_confidence, incremental=incremental, **filters
+        )
+        return result, {"source": "live"}
+
     try:
-        return service.analyze_device_usage_patterns(db, min_support)
+        return await _cached_analytics(
+            request, "device-usage-patterns", [cache.DEVICE_USAGE_TAG], compute,
+            fresh=fresh, min_support=min_support, min_confidence=min_confidence, max_len=max_len,
+            incremental=incremental, **filters
+        )
     except Exception as e:
         logger.error(f"设备使用模式分析出错: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"设备使用模式分析出错: {str(e)}")
 
+@router.post("/device-usage-patterns/jobs", response_model=PatternJob)
+async def submit_device_usage_pattern_job(
+    job: PatternJobCreate,
+    response: Response,
+    db: DbSession = Depends(get_session)
+):
+    """
+    提交设备使用模式挖掘任务，在后台进程中执行
+
+    参数相同且数据未变化时直接返回已有任务（已完成的任务包含结果）；
+    新任务返回202，之后通过GET /device-usage-patterns/jobs/{job_id}查询状态和结果。
+    """
+    try:
+        db_job, created = await run_db(db, pattern_jobs.submit_pattern_job, job)
+        if created:
+            pattern_jobs.dispatch_pattern_job(db_job.job_id)
+    except Exception as e:
+        logger.error(f"提交设备使用模式挖掘任务出错: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"提交设备使用模式挖掘任务出错: {str(e)}")
+    if db_job.status != pattern_jobs.SUCCEEDED:
+        response.status_code = 202
+    return db_job
+
+@router.get("/device-usage-patterns/jobs/{job_id}", response_model=PatternJob)
+async def get_device_usage_pattern_job(job_id: int, db: DbSession = Depends(get_session)):
+    """查询设备使用模式挖掘任务的状态和结果"""
+    db_job = await run_db(db, pattern_jobs.get_pattern_job, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return db_job
+
 @router.get("/home-area-impact")
-def get_home_area_impact(db: Session = Depends(get_db)):
-    """分析房屋面积对设备使用行为的影响"""
+async def get_home_area_impact(
+    request: Request,
+    filters: Dict[str, Any] = Depends(analytics_filters),
+    fresh: bool = False,
+    db: DbSession = Depends(get_session)
+):
+    """分析房屋面积对设备使用行为的影响（fresh=true时绕过缓存和物化视图实时计算）"""
     try:
-        return service.analyze_home_area_impact(db)
+        return await _cached_analytics(
+            request, "home-area-impact", [cache.DEVICE_USAGE_TAG],
+            _view_query(db, service.analyze_home_area_impact, service.HOME_AREA_IMPACT_VIEW, fresh, **filters),
+            fresh=fresh, **filters
+        )
     except Exception as e:
         logger.error(f"房屋面积影响分析出错: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"房屋面积影响分析出错: {str(e)}")
 
 @router.get("/security-events-summary")
-def get_security_events_summary(db: Session = Depends(get_db)):
-    """获取安防事件摘要"""
+async def get_security_events_summary(
+    request: Request,
+    filters: Dict[str, Any] = Depends(analytics_filters),
+    fresh: bool = False,
+    db: DbSession = Depends(get_session)
+):
+    """获取安防事件摘要（fresh=true时绕过缓存和物化视图实时计算）"""
     try:
-        return service.analyze_security_events(db)
+        return await _cached_analytics(
+            request, "security-events-summary", [cache.SECURITY_EVENTS_TAG],
+            _view_query(db, service.analyze_security_events, service.SECURITY_EVENTS_VIEW, fresh, **filters),
+            fresh=fresh, **filters
+        )
     except Exception as e:
         logger.error(f"安防事件摘要分析出错: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"安防事件摘要分析出错: {str(e)}")
 
 @router.get("/user-feedback-analysis")
-def get_user_feedback_analysis(db: Session = Depends(get_db)):
-    """分析用户反馈"""
+async def get_user_feedback_analysis(
+    request: Request,
+    filters: Dict[str, Any] = Depends(analytics_filters),
+    fresh: bool = False,
+    db: DbSession = Depends(get_session)
+):
+    """分析用户反馈（fresh=true时绕过缓存和物化视图实时计算）"""
     try:
-        return service.analyze_user_feedback(db)
+        return await _cached_analytics(
+            request, "user-feedback-analysis", [cache.FEEDBACK_TAG],
+            _view_query(db, service.analyze_user_feedback, service.USER_FEEDBACK_VIEW, fresh, **filters),
+            fresh=fresh, **filters
+        )
     except Exception as e:
         logger.error(f"用户反馈分析出错: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"用户反馈分析出错: {str(e)}")
+
+# 可绘制为图表的分析接口：接口名 -> (失效标签, 分析函数, 物化视图)
+_CHART_SOURCES = {
+    "device-usage-frequency": ([cache.DEVICE_USAGE_TAG], service.analyze_device_usage_frequency, service.FREQUENCY_VIEW),
+    "device-usage-timeframe": ([cache.DEVICE_USAGE_TAG], service.analyze_device_usage_timeframe, service.TIMEFRAME_VIEW),
+    "home-area-impact": ([cache.DEVICE_USAGE_TAG], service.analyze_home_area_impact, service.HOME_AREA_IMPACT_VIEW),
+    "security-events-summary": ([cache.SECURITY_EVENTS_TAG], service.analyze_security_events, service.SECURITY_EVENTS_VIEW),
+    "user-feedback-analysis": ([cache.FEEDBACK_TAG], service.analyze_user_feedback, service.USER_FEEDBACK_VIEW),
+}
+
+@router.get("/charts/{name}")
+async def get_chart(
+    request: Request,
+    name: str,
+    format: str = Query("png", pattern="^(png|svg)$", description="图像格式"),
+    width: int = Query(1000, ge=200, le=4000, description="图像宽度（像素）"),
+    height: int = Query(600, ge=200, le=4000, description="图像高度（像素）"),
+    limit: int = Query(20, ge=1, le=200, description="柱状图和热力图最多显示的设备或住宅数"),
+    filters: Dict[str, Any] = Depends(analytics_filters),
+    fresh: bool = False,
+    db: DbSession = Depends(get_session)
+):
+    """
+    将分析结果绘制为PNG或SVG图像（返回图像的原始字节）
+
+    数据与对应的分析接口共用缓存；图表的ETag由数据的ETag和绘图参数决定，
+    If-None-Match一致时不绘图直接返回304。图像在后台进程中绘制并按ETag缓存。
+    """
+    endpoint = charts.CHARTS.get(name)
+    if endpoint is None:
+        raise HTTPException(status_code=404, detail=f"图表不存在，可用的图表: {', '.join(charts.CHARTS)}")
+    tags, analyze, view_name = _CHART_SOURCES[endpoint]
+    try:
+        entry, ttl = await _analytics_entry(
+            endpoint, tags, _view_query(db, analyze, view_name, fresh, **filters), fresh=fresh, **filters
+        )
+    except Exception as e:
+        logger.error(f"图表数据分析出错({name}): {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"图表数据分析出错: {str(e)}")
+
+    headers = _entry_headers(entry, ttl)
+    etag = charts.chart_etag(name, entry["etag"], format, width, height, limit)
+    headers["ETag"] = etag
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        image = await charts.get_chart(name, json.loads(entry["body"]), etag, format, width, height, limit)
+    except charts.ChartRenderBusy:
+        raise HTTPException(status_code=503, detail="图表绘制繁忙，请稍后重试", headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"绘制图表出错({name}): {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"绘制图表出错: {str(e)}")
+    return Response(content=image, media_type=CHART_MEDIA_TYPES[format], headers=headers)
@@ -1,57 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import device_usage as models
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional
+from ..database import DbSession, get_session, run_db
 from ..schemas import device_usage as schemas
 from ..services import device_usage as service
+from ..services import usage_buffer
+from ..utils.pagination import InvalidCursor, set_next_cursor
 from datetime import datetime
 
 router = APIRouter()
 
-@router.post("/", response_model=schemas.DeviceUsage, status_code=status.HTTP_201_CREATED)
-def create_device_usage(device_usage: schemas.DeviceUsageCreate, db: Session = Depends(get_db)):
-    return service.create_device_usage(db=db, device_usage=device_usage)
+@router.post(
+    "/",
+    response_model=schemas.DeviceUsage,
+    status_code=status.HTTP_201_CREATED,
+    responses={202: {"description": "写后缓冲模式下已接收，稍后批量写入"}}
+)
+async def create_device_usage(device_usage: schemas.DeviceUsageCreate, db: DbSession = Depends(get_session)):
+    if usage_buffer.WRITE_BEHIND_ENABLED:
+        try:
+            queue_depth = await usage_buffer.enqueue(device_usage)
+        except usage_buffer.QueueFull:
+            raise HTTPException(status_code=503, detail="写入队列已满，请稍后重试", headers={"Retry-After": "1"})
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"status": "accepted", "queue_depth": queue_depth})
+    return await run_db(db, service.create_device_usage, device_usage=device_usage)
+
+@router.post("/bulk", response_model=schemas.DeviceUsageBulkResult)
+async def bulk_create_device_usage(request: Request, db: DbSession = Depends(get_session)):
+    """
+    批量写入使用记录
+
+    请求体为JSON数组，或Content-Type为application/x-ndjson时每行一条记录。
+    返回每条记录的写入结果，出错的记录不影响其他记录。
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    ndjson = "ndjson" in content_type or "jsonlines" in content_type
+    try:
+        records, errors = service.parse_bulk_payload(body, ndjson=ndjson)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"无法解析请求体: {str(e)}")
+    if len(records) + len(errors) > service.BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"单次最多写入{service.BULK_MAX_ROWS}条记录")
+    return await run_db(db, service.bulk_create_device_usages, records, errors)
+
+@router.post("/bulk/columnar", response_model=schemas.DeviceUsageBulkResult)
+async def bulk_create_device_usage_columnar(request: Request, db: DbSession = Depends(get_session)):
+    """
+    批量写入列式上报的使用记录
+
+    请求体为MessagePack编码的{"列名": [值, ...]}（Content-Type: application/msgpack），
+    列为device_id、user_id、start_time（必填）以及end_time、operation_type、operation_value。
+    时间为毫秒时间戳或ISO 8601字符串。返回格式与/bulk相同。
+    """
+    content_type = request.headers.get("content-type", "")
+    if "msgpack" not in content_type:
+        raise HTTPException(status_code=415, detail="Content-Type必须为application/msgpack")
+    body = await request.body()
+    try:
+        columns = service.parse_columnar_payload(body)
+        if max((len(values) for values in columns.values() if isinstance(values, list)), default=0) > service.BULK_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"单次最多写入{service.BULK_MAX_ROWS}条记录")
+        return await run_db(db, service.bulk_create_device_usages_columnar, columns)
+    except service.ColumnarFormatUnavailable as e:
+        # 服务端不支持该格式，客户端可改用JSON或NDJSON格式的/bulk
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"无法解析请求体: {str(e)}")
 
 @router.get("/", response_model=List[schemas.DeviceUsage])
-def read_device_usages(
+async def read_device_usages(
     skip: int = 0, 
     limit: int = 100, 
     device_id: int = None,
     user_id: int = None,
-    db: Session = Depends(get_db)
+    start: datetime = None,
+    end: datetime = None,
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: DbSession = Depends(get_session)
 ):
-    device_usages = service.get_device_usages(
-        db, skip=skip, limit=limit, device_id=device_id, user_id=user_id
-    )
+    try:
+        device_usages = await run_db(
+            db, service.get_device_usages, skip=skip, limit=limit, device_id=device_id, user_id=user_id,
+            start=start, end=end, cursor=cursor
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, service.DEVICE_USAGE_KEYSET, device_usages, limit)
     return device_usages
 
+@router.get("/export", response_class=StreamingResponse)
+async def export_device_usages(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="导出格式：ndjson或csv"),
+    device_id: int = None,
+    user_id: int = None,
+    start: datetime = None,
+    end: datetime = None
+):
+    # 流式响应在路由返回后才读取数据，生成器使用自己的会话而不是请求级会话
+    chunks = service.export_device_usages(format, device_id=device_id, user_id=user_id, start=start, end=end)
+    if format == "csv":
+        return StreamingResponse(
+            chunks,
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="device_usage.csv"'}
+        )
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
+
 @router.get("/{usage_id}", response_model=schemas.DeviceUsage)
-def read_device_usage(usage_id: int, db: Session = Depends(get_db)):
-    db_device_usage = service.get_device_usage(db, usage_id=usage_id)
+async def read_device_usage(usage_id: int, db: DbSession = Depends(get_session)):
+    db_device_usage = await run_db(db, service.get_device_usage, usage_id=usage_id)
     if db_device_usage is None:
         raise HTTPException(status_code=404, detail="使用记录不存在")
     return db_device_usage
 
 @router.put("/{usage_id}", response_model=schemas.DeviceUsage)
-def update_device_usage(usage_id: int, device_usage: schemas.DeviceUsageUpdate, db: Session = Depends(get_db)):
-    db_device_usage = service.get_device_usage(db, usage_id=usage_id)
+async def update_device_usage(usage_id: int, device_usage: schemas.DeviceUsageUpdate, db: DbSession = Depends(get_session)):
+    db_device_usage = await run_db(db, service.update_device_usage, usage_id=usage_id, device_usage=device_usage)
     if db_device_usage is None:
         raise HTTPException(status_code=404, detail="使用记录不存在")
-    return service.update_device_usage(db=db, usage_id=usage_id, device_usage=device_usage)
+    return db_device_usage
 
 @router.delete("/{usage_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_device_usage(usage_id: int, db: Session = Depends(get_db)):
-    db_device_usage = service.get_device_usage(db, usage_id=usage_id)
-    if db_device_usage is None:
+async def delete_device_usage(usage_id: int, db: DbSession = Depends(get_session)):
+    if not await run_db(db, service.delete_device_usage, usage_id=usage_id):
         raise HTTPException(status_code=404, detail="使用记录不存在")
-    service.delete_device_usage(db=db, usage_id=usage_id)
     return {"ok": True}
 
 @router.post("/{device_id}/start", response_model=schemas.DeviceUsage)
-def start_device_usage(device_id: int, user_id: int, operation_type: str = None, db: Session = Depends(get_db)):
-    return service.start_device_usage(db=db, device_id=device_id, user_id=user_id, operation_type=operation_type)
+async def start_device_usage(device_id: int, user_id: int, operation_type: str = None, db: DbSession = Depends(get_session)):
+    return await run_db(db, service.start_device_usage, device_id=device_id, user_id=user_id, operation_type=operation_type)
 
 @router.post("/{device_id}/stop", response_model=schemas.DeviceUsage)
-def stop_device_usage(device_id: int, operation_value: str = None, db: Session = Depends(get_db)):
-    return service.stop_device_usage(db=db, device_id=device_id, operation_value=operation_value)
+async def stop_device_usage(device_id: int, operation_value: str = None, db: DbSession = Depends(get_session)):
+    return await run_db(db, service.stop_device_usage, device_id=device_id, operation_value=operation_value)
@@ -1,26 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import devices as models
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import List, Optional
+from ..database import DbSession, get_session, run_db
 from ..schemas import devices as schemas
 from ..services import devices as service
+from ..utils.pagination import InvalidCursor, set_next_cursor
 
 router = APIRouter()
 
 # 设备类别API
 @router.post("/categories/", response_model=schemas.DeviceCategory, status_code=status.HTTP_201_CREATED)
-def create_category(category: schemas.DeviceCategoryCreate, db: Session = Depends(get_db)):
-    return service.create_device_category(db=db, category=category)
+async def create_category(category: schemas.DeviceCategoryCreate, db: DbSession = Depends(get_session)):
+    return await run_db(db, service.create_device_category, category=category)
 
 @router.get("/categories/", response_model=List[schemas.DeviceCategory])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    categories = service.get_device_categories(db, skip=skip, limit=limit)
+async def read_categories(skip: int = 0, limit: int = 100, db: DbSession = Depends(get_session)):
+    categories = await run_db(db, service.get_device_categories, skip=skip, limit=limit)
     return categories
 
 @router.get("/categories/{category_id}", response_model=schemas.DeviceCategory)
-def read_category(category_id: int, db: Session = Depends(get_db)):
-    db_category = service.get_device_category(db, category_id=category_id)
+async def read_category(category_id: int, db: DbSession = Depends(get_session)):
+    db_category = await run_db(db, service.get_device_category, category_id=category_id)
     if db_category is None:
         raise HTTPException(status_code=404, detail="设备类别不存在")
     return db_category
@@ -28,7 +27,7 @@ def read_category(category_id: int, db: Session = Depends(get_db)):
 # 设备API
 # 例如在routers/devices.py中
 @router.post("/", response_model=schemas.Device, status_code=status.HTTP_201_CREATED)
-def create_device(device: schemas.DeviceCreate, db: Session = Depends(get_db)):
+async def create_device(device: schemas.DeviceCreate, db: DbSession = Depends(get_session)):
     """
     创建新设备
     
@@ -43,31 +42,43 @@ def create_device(device: schemas.DeviceCreate, db: Session = Depends(get_db)):
     - **firmware_version**: 固件版本（可选）
     - **status**: 设备状态，默认为"offline"
     """
-    return service.create_device(db=db, device=device)
+    return await run_db(db, service.create_device, device=device)
 
 @router.get("/", response_model=List[schemas.Device])
-def read_devices(skip: int = 0, limit: int = 100, home_id: int = None, category_id: int = None, db: Session = Depends(get_db)):
-    devices = service.get_devices(db, skip=skip, limit=limit, home_id=home_id, category_id=category_id)
+async def read_devices(
+    skip: int = 0,
+    limit: int = 100,
+    home_id: int = None,
+    category_id: int = None,
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: DbSession = Depends(get_session)
+):
+    try:
+        devices = await run_db(
+            db, service.get_devices, skip=skip, limit=limit, home_id=home_id, category_id=category_id, cursor=cursor
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, service.DEVICE_KEYSET, devices, limit)
     return devices
 
 @router.get("/{device_id}", response_model=schemas.Device)
-def read_device(device_id: int, db: Session = Depends(get_db)):
-    db_device = service.get_device(db, device_id=device_id)
+async def read_device(device_id: int, db: DbSession = Depends(get_session)):
+    db_device = await run_db(db, service.get_cached_device, device_id=device_id)
     if db_device is None:
         raise HTTPException(status_code=404, detail="设备不存在")
     return db_device
 
 @router.put("/{device_id}", response_model=schemas.Device)
-def update_device(device_id: int, device: schemas.DeviceUpdate, db: Session = Depends(get_db)):
-    db_device = service.get_device(db, device_id=device_id)
+async def update_device(device_id: int, device: schemas.DeviceUpdate, db: DbSession = Depends(get_session)):
+    db_device = await run_db(db, service.update_device, device_id=device_id, device=device)
     if db_device is None:
         raise HTTPException(status_code=404, detail="设备不存在")
-    return service.update_device(db=db, device_id=device_id, device=device)
+    return db_device
 
 @router.delete("/{device_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_device(device_id: int, db: Session = Depends(get_db)):
-    db_device = service.get_device(db, device_id=device_id)
-    if db_device is None:
+async def delete_device(device_id: int, db: DbSession = Depends(get_session)):
+    if not await run_db(db, service.delete_device, device_id=device_id):
         raise HTTPException(status_code=404, detail="设备不存在")
-    service.delete_device(db=db, device_id=device_id)
     return {"ok": True}
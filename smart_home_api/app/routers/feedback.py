@@ -1,55 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import feedback as models
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import List, Optional
+from ..database import DbSession, get_session, run_db
 from ..schemas import feedback as schemas
 from ..services import feedback as service
+from ..utils.pagination import InvalidCursor, set_next_cursor
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.Feedback, status_code=status.HTTP_201_CREATED)
-def create_feedback(feedback: schemas.FeedbackCreate, db: Session = Depends(get_db)):
-    return service.create_feedback(db=db, feedback=feedback)
+async def create_feedback(feedback: schemas.FeedbackCreate, db: DbSession = Depends(get_session)):
+    return await run_db(db, service.create_feedback, feedback=feedback)
 
 @router.get("/", response_model=List[schemas.Feedback])
-def read_feedbacks(
+async def read_feedbacks(
     skip: int = 0, 
     limit: int = 100, 
     user_id: int = None,
     feedback_type: str = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: DbSession = Depends(get_session)
 ):
-    feedbacks = service.get_feedbacks(
-        db, skip=skip, limit=limit, user_id=user_id, feedback_type=feedback_type
-    )
+    try:
+        feedbacks = await run_db(
+            db, service.get_feedbacks, skip=skip, limit=limit, user_id=user_id, feedback_type=feedback_type,
+            cursor=cursor
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, service.FEEDBACK_KEYSET, feedbacks, limit)
     return feedbacks
 
 @router.get("/{feedback_id}", response_model=schemas.Feedback)
-def read_feedback(feedback_id: int, db: Session = Depends(get_db)):
-    db_feedback = service.get_feedback(db, feedback_id=feedback_id)
+async def read_feedback(feedback_id: int, db: DbSession = Depends(get_session)):
+    db_feedback = await run_db(db, service.get_feedback, feedback_id=feedback_id)
     if db_feedback is None:
         raise HTTPException(status_code=404, detail="反馈不存在")
     return db_feedback
 
 @router.put("/{feedback_id}", response_model=schemas.Feedback)
-def update_feedback(feedback_id: int, feedback: schemas.FeedbackUpdate, db: Session = Depends(get_db)):
-    db_feedback = service.get_feedback(db, feedback_id=feedback_id)
+async def update_feedback(feedback_id: int, feedback: schemas.FeedbackUpdate, db: DbSession = Depends(get_session)):
+    db_feedback = await run_db(db, service.update_feedback, feedback_id=feedback_id, feedback=feedback)
     if db_feedback is None:
         raise HTTPException(status_code=404, detail="反馈不存在")
-    return service.update_feedback(db=db, feedback_id=feedback_id, feedback=feedback)
+    return db_feedback
 
 @router.delete("/{feedback_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_feedback(feedback_id: int, db: Session = Depends(get_db)):
-    db_feedback = service.get_feedback(db, feedback_id=feedback_id)
-    if db_feedback is None:
+async def delete_feedback(feedback_id: int, db: DbSession = Depends(get_session)):
+    if not await run_db(db, service.delete_feedback, feedback_id=feedback_id):
         raise HTTPException(status_code=404, detail="反馈不存在")
-    service.delete_feedback(db=db, feedback_id=feedback_id)
     return {"ok": True}
 
 @router.post("/{feedback_id}/respond", response_model=schemas.Feedback)
-def respond_to_feedback(feedback_id: int, response: schemas.FeedbackResponse, db: Session = Depends(get_db)):
-    db_feedback = service.get_feedback(db, feedback_id=feedback_id)
+async def respond_to_feedback(feedback_id: int, response: schemas.FeedbackResponse, db: DbSession = Depends(get_session)):
+    db_feedback = await run_db(db, service.respond_to_feedback, feedback_id=feedback_id, response=response)
     if db_feedback is None:
         raise HTTPException(status_code=404, detail="反馈不存在")
-    return service.respond_to_feedback(db=db, feedback_id=feedback_id, response=response)
+    return db_feedback
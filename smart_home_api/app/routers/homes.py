@@ -1,40 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import homes as models
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import List, Optional
+from ..database import DbSession, get_session, run_db
 from ..schemas import homes as schemas
 from ..services import homes as service
+from ..utils.pagination import InvalidCursor, set_next_cursor
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.Home, status_code=status.HTTP_201_CREATED)
-def create_home(home: schemas.HomeCreate, db: Session = Depends(get_db)):
-    return service.create_home(db=db, home=home)
+async def create_home(home: schemas.HomeCreate, db: DbSession = Depends(get_session)):
+    return await run_db(db, service.create_home, home=home)
 
 @router.get("/", response_model=List[schemas.Home])
-def read_homes(skip: int = 0, limit: int = 100, user_id: int = None, db: Session = Depends(get_db)):
-    homes = service.get_homes(db, skip=skip, limit=limit, user_id=user_id)
+async def read_homes(
+    skip: int = 0,
+    limit: int = 100,
+    user_id: int = None,
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: DbSession = Depends(get_session)
+):
+    try:
+        homes = await run_db(db, service.get_homes, skip=skip, limit=limit, user_id=user_id, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, service.HOME_KEYSET, homes, limit)
     return homes
 
 @router.get("/{home_id}", response_model=schemas.Home)
-def read_home(home_id: int, db: Session = Depends(get_db)):
-    db_home = service.get_home(db, home_id=home_id)
+async def read_home(home_id: int, db: DbSession = Depends(get_session)):
+    db_home = await run_db(db, service.get_home, home_id=home_id)
     if db_home is None:
         raise HTTPException(status_code=404, detail="住宅不存在")
     return db_home
 
 @router.put("/{home_id}", response_model=schemas.Home)
-def update_home(home_id: int, home: schemas.HomeUpdate, db: Session = Depends(get_db)):
-    db_home = service.get_home(db, home_id=home_id)
+async def update_home(home_id: int, home: schemas.HomeUpdate, db: DbSession = Depends(get_session)):
+    db_home = await run_db(db, service.update_home, home_id=home_id, home=home)
     if db_home is None:
         raise HTTPException(status_code=404, detail="住宅不存在")
-    return service.update_home(db=db, home_id=home_id, home=home)
+    return db_home
 
 @router.delete("/{home_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_home(home_id: int, db: Session = Depends(get_db)):
-    db_home = service.get_home(db, home_id=home_id)
-    if db_home is None:
+async def delete_home(home_id: int, db: DbSession = Depends(get_session)):
+    if not await run_db(db, service.delete_home, home_id=home_id):
         raise HTTPException(status_code=404, detail="住宅不存在")
-    service.delete_home(db=db, home_id=home_id)
     return {"ok": True}
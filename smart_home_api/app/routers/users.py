@@ -1,51 +1,105 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import users as models
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.security import OAuth2PasswordRequestForm
+from typing import List, Optional
+from ..database import DbSession, get_session, run_db
 from ..schemas import users as schemas
+from ..services import passwords
 from ..services import users as service
-from datetime import datetime
+from ..utils.pagination import InvalidCursor, set_next_cursor
+from ..utils.security import create_access_token, get_current_user
 
 router = APIRouter()
 
+async def _password_task(coro):
+    """等待进程池中的密码哈希任务，排队已满时返回503"""
+    try:
+        return await coro
+    except passwords.PasswordHashBusy:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试", headers={"Retry-After": "1"})
+
+async def _check_password(password: str, stored_hash: str) -> Optional[str]:
+    """校验密码，错误时返回401；成本因子与当前配置不同时返回按新成本计算的哈希，否则返回None"""
+    if not await _password_task(passwords.check_password_async(password, stored_hash)):
+        raise HTTPException(status_code=401, detail="密码错误")
+    if passwords.needs_rehash(stored_hash):
+        return await _password_task(passwords.hash_password_async(password))
+    return None
+
 @router.post("/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = service.get_user_by_email(db, email=user.email)
+async def create_user(user: schemas.UserCreate, db: DbSession = Depends(get_session)):
+    db_user = await run_db(db, service.get_user_by_email, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="邮箱已被注册")
-    return service.create_user(db=db, user=user)
+    password_hash = await _password_task(passwords.hash_password_async(user.password))
+    return await run_db(db, service.create_user, user=user, password_hash=password_hash)
 
 @router.get("/", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = service.get_users(db, skip=skip, limit=limit)
+async def read_users(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: DbSession = Depends(get_session)
+):
+    try:
+        users = await run_db(db, service.get_users, skip=skip, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, service.USER_KEYSET, users, limit)
     return users
 
+@router.post("/token", response_model=schemas.Token)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: DbSession = Depends(get_session)):
+    # OAuth2表单的username字段填写邮箱
+    db_user = await run_db(db, service.get_user_by_email, email=form_data.username)
+    if db_user is None:
+        raise HTTPException(status_code=401, detail="邮箱或密码错误", headers={"WWW-Authenticate": "Bearer"})
+    user_id = db_user.user_id
+    password_hash = await _check_password(form_data.password, db_user.password_hash)
+    await run_db(db, service.update_last_login, user_id=user_id, password_hash=password_hash)
+    return {"access_token": create_access_token({"sub": str(user_id)}), "token_type": "bearer"}
+
+@router.get("/me", response_model=schemas.User)
+async def read_current_user(current_user: schemas.User = Depends(get_current_user)):
+    return current_user
+
 @router.get("/{user_id}", response_model=schemas.User)
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = service.get_user(db, user_id=user_id)
+async def read_user(user_id: int, db: DbSession = Depends(get_session)):
+    db_user = await run_db(db, service.get_user, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="用户不存在")
     return db_user
 
 @router.put("/{user_id}", response_model=schemas.User)
-def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db)):
-    db_user = service.get_user(db, user_id=user_id)
+async def update_user(user_id: int, user: schemas.UserUpdate, db: DbSession = Depends(get_session)):
+    password_hash = None
+    if user.password is not None:
+        password_hash = await _password_task(passwords.hash_password_async(user.password))
+    db_user = await run_db(db, service.update_user, user_id=user_id, user=user, password_hash=password_hash)
     if db_user is None:
         raise HTTPException(status_code=404, detail="用户不存在")
-    return service.update_user(db=db, user_id=user_id, user=user)
+    return db_user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = service.get_user(db, user_id=user_id)
-    if db_user is None:
+async def delete_user(user_id: int, db: DbSession = Depends(get_session)):
+    if not await run_db(db, service.delete_user, user_id=user_id):
         raise HTTPException(status_code=404, detail="用户不存在")
-    service.delete_user(db=db, user_id=user_id)
     return {"ok": True}
 
 @router.post("/{user_id}/login", response_model=schemas.User)
-def login_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = service.get_user(db, user_id=user_id)
+async def login_user(
+    user_id: int,
+    credentials: Optional[schemas.UserLogin] = None,
+    db: DbSession = Depends(get_session)
+):
+    # 提供密码时先校验，成本因子与当前配置不同则顺带重新哈希
+    password_hash = None
+    if credentials is not None:
+        db_user = await run_db(db, service.get_user, user_id=user_id)
+        if db_user is None:
+            raise HTTPException(status_code=404, detail="用户不存在")
+        password_hash = await _check_password(credentials.password, db_user.password_hash)
+    db_user = await run_db(db, service.update_last_login, user_id=user_id, password_hash=password_hash)
     if db_user is None:
         raise HTTPException(status_code=404, detail="用户不存在")
-    return service.update_last_login(db=db, user_id=user_id)
+    return db_user
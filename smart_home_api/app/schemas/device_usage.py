@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, field_validator
+from typing import Any, List, Optional
 from datetime import datetime
+from ..utils.time_utils import to_naive_utc
 
 class DeviceUsageBase(BaseModel):
     device_id: int
@@ -10,6 +11,9 @@ class DeviceUsageBase(BaseModel):
     operation_type: Optional[str] = None
     operation_value: Optional[str] = None
 
+    # 带时区的时间换算为UTC后保存，与列式上报一致
+    _normalize_times = field_validator("start_time", "end_time")(to_naive_utc)
+
 class DeviceUsageCreate(DeviceUsageBase):
     pass
 
@@ -18,6 +22,8 @@ class DeviceUsageUpdate(BaseModel):
     operation_type: Optional[str] = None
     operation_value: Optional[str] = None
 
+    _normalize_times = field_validator("end_time")(to_naive_utc)
+
 class DeviceUsageInDB(DeviceUsageBase):
     usage_id: int
     created_at: datetime
@@ -27,3 +33,13 @@ class DeviceUsageInDB(DeviceUsageBase):
 
 class DeviceUsage(DeviceUsageInDB):
     pass
+
+class DeviceUsageBulkError(BaseModel):
+    index: int  # 记录在请求中的序号（从0开始）
+    detail: Any
+
+class DeviceUsageBulkResult(BaseModel):
+    inserted: int
+    failed: int
+    usage_ids: List[Optional[int]]  # 与请求顺序一致，失败的记录为null
+    errors: List[DeviceUsageBulkError]
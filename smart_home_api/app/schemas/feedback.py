@@ -20,7 +20,7 @@ class FeedbackResponse(BaseModel):
 
 class Feedback(FeedbackBase):
     feedback_id: int
-    created_at: datetime
+    created_at: Optional[datetime] = None  # 列可为空，绕过API写入的行可能没有
     responded: bool = False
     response: Optional[str] = None
     response_time: Optional[datetime] = None
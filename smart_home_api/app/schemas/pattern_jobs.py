@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Any, Dict
+from datetime import datetime
+
+class PatternJobCreate(BaseModel):
+    min_support: float = Field(0.1, gt=0, le=1)
+    min_confidence: float = Field(0.5, gt=0, le=1)
+    max_len: Optional[int] = Field(None, ge=1)
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    home_id: Optional[int] = None
+    category_id: Optional[int] = None
+    user_id: Optional[int] = None
+
+class PatternJob(BaseModel):
+    job_id: int
+    status: str  # pending, running, succeeded, failed
+    params: Dict[str, Any]
+    data_watermark: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
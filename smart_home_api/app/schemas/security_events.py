@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel
+from typing import Optional
 from datetime import datetime
 
 class SecurityEventBase(BaseModel):
@@ -25,7 +25,7 @@ class SecurityEventResolution(BaseModel):
 
 class SecurityEvent(SecurityEventBase):
     event_id: int
-    event_time: datetime
+    event_time: Optional[datetime] = None  # 列可为空，绕过API写入的行可能没有
     resolved: bool = False
     resolution_time: Optional[datetime] = None
     resolution_notes: Optional[str] = None
@@ -16,6 +16,13 @@ class UserUpdate(BaseModel):
     phone: Optional[str] = None
     password: Optional[str] = Field(None, min_length=8)
 
+class UserLogin(BaseModel):
+    password: str
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+
 class UserInDB(UserBase):
     user_id: int
     created_at: datetime
@@ -1,40 +1,122 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text, and_, extract
-from ..models.device_usage import DeviceUsage
-from ..models.devices import Device, DeviceCategory
-from ..models.homes import Home
-from ..models.security_events import SecurityEvent
-from ..models.feedback import Feedback
-from typing import List, Dict, Any
-import pandas as pd
-from mlxtend.frequent_patterns import apriori, association_rules
+from sqlalchemy import text
+from .usage_rollup import is_hour_aligned
+from .usage_itemsets import basket_window_sql, load_frequent_itemsets
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
+from datetime import datetime
 import logging
 
+# numpy、scipy、pandas和mlxtend只有设备使用模式分析用到，在首次分析时才导入，
+# 只处理增删改查的进程启动时不加载它们
+if TYPE_CHECKING:
+    import pandas as pd
+    from scipy import sparse
+
 # 设置日志
 logger = logging.getLogger(__name__)
 
-def analyze_device_usage_frequency(db: Session):
-    """分析设备使用频率"""
+# 不带过滤条件的分析结果对应的物化视图（见迁移0005，由analytics_views定期刷新）
+FREQUENCY_VIEW = "mv_device_usage_frequency"
+TIMEFRAME_VIEW = "mv_device_usage_timeframe"
+HOME_AREA_IMPACT_VIEW = "mv_home_area_impact"
+SECURITY_EVENTS_VIEW = "mv_security_events_summary"
+USER_FEEDBACK_VIEW = "mv_user_feedback_analysis"
+
+def _time_range(params: Dict[str, Any], column: str, start: Optional[datetime], end: Optional[datetime]) -> str:
+    """构建左闭右开的时间范围条件"""
+    clauses = ""
+    if start is not None:
+        clauses += f" AND {column} >= :start"
+        params["start"] = start
+    if end is not None:
+        clauses += f" AND {column} < :end"
+        params["end"] = end
+    return clauses
+
+def _usage_time_range(params: Dict[str, Any], start: Optional[datetime], end: Optional[datetime], alias: str = "du") -> str:
+    """
+    构建device_usage.start_time的时间范围条件
+
+    直接比较分区键start_time，PostgreSQL据此只扫描相关月份的分区。
+    """
+    return _time_range(params, f"{alias}.start_time", start, end)
+
+def _rollup_time_range(params: Dict[str, Any], start: Optional[datetime], end: Optional[datetime], alias: str = "r") -> str:
+    """构建device_usage_hourly.bucket的时间范围条件（start/end须为整点）"""
+    return _time_range(params, f"{alias}.bucket", start, end)
+
+def _equals(params: Dict[str, Any], column: str, name: str, value: Any) -> str:
+    """值不为空时构建等值条件"""
+    if value is None:
+        return ""
+    params[name] = value
+    return f" AND {column} = :{name}"
+
+def _device_filters(params: Dict[str, Any], home_id: Optional[int], category_id: Optional[int], alias: str = "d") -> str:
+    """构建设备所属住宅和类别的过滤条件"""
+    return _equals(params, f"{alias}.home_id", "home_id", home_id) + _equals(params, f"{alias}.category_id", "category_id", category_id)
+
+def _use_rollup(start: Optional[datetime], end: Optional[datetime], user_id: Optional[int] = None) -> bool:
+    """
+    是否可以从小时汇总表device_usage_hourly读取
+
+    汇总粒度为小时，时间范围边界不在整点时回退到扫描device_usage以保证结果精确；
+    汇总表不区分使用者，按user_id过滤时同样回退（走user_id, start_time索引）。
+    """
+    return is_hour_aligned(start) and is_hour_aligned(end) and user_id is None
+
+def analyze_device_usage_frequency(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    home_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    use_view: bool = False
+):
+    """分析设备使用频率，use_view为True时读取物化视图（忽略过滤条件）"""
     try:
-        # 直接使用原始SQL查询，而不依赖视图
-        sql = """
-        SELECT 
-            d.device_id,
-            d.device_name,
-            dc.category_name,
-            h.home_id,
-            h.square_meters,
-            COUNT(du.usage_id) as usage_count,
-            SUM(EXTRACT(EPOCH FROM (du.end_time - du.start_time))/3600) as total_hours
-        FROM devices d
-        JOIN device_categories dc ON d.category_id = dc.category_id
-        JOIN homes h ON d.home_id = h.home_id
-        LEFT JOIN device_usage du ON d.device_id = du.device_id
-        WHERE du.end_time IS NOT NULL
-        GROUP BY d.device_id, d.device_name, dc.category_name, h.home_id, h.square_meters
-        """
+        params = {}
+        if use_view:
+            sql = f"SELECT * FROM {FREQUENCY_VIEW}"
+        elif _use_rollup(start, end, user_id):
+            # 从小时汇总读取，扫描量与设备数和时间跨度相关，与使用记录条数无关
+            sql = f"""
+            SELECT 
+                d.device_id,
+                d.device_name,
+                dc.category_name,
+                h.home_id,
+                h.square_meters,
+                SUM(r.completed_count) as usage_count,
+                SUM(r.total_seconds)/3600 as total_hours
+            FROM devices d
+            JOIN device_categories dc ON d.category_id = dc.category_id
+            JOIN homes h ON d.home_id = h.home_id
+            JOIN device_usage_hourly r ON d.device_id = r.device_id
+            WHERE r.completed_count > 0{_rollup_time_range(params, start, end)}{_device_filters(params, home_id, category_id)}
+            GROUP BY d.device_id, d.device_name, dc.category_name, h.home_id, h.square_meters
+            """
+        else:
+            # 直接使用原始SQL查询，而不依赖视图
+            sql = f"""
+            SELECT 
+                d.device_id,
+                d.device_name,
+                dc.category_name,
+                h.home_id,
+                h.square_meters,
+                COUNT(du.usage_id) as usage_count,
+                SUM(EXTRACT(EPOCH FROM (du.end_time - du.start_time))/3600) as total_hours
+            FROM devices d
+            JOIN device_categories dc ON d.category_id = dc.category_id
+            JOIN homes h ON d.home_id = h.home_id
+            LEFT JOIN device_usage du ON d.device_id = du.device_id
+            WHERE du.end_time IS NOT NULL{_usage_time_range(params, start, end)}{_device_filters(params, home_id, category_id)}{_equals(params, 'du.user_id', 'user_id', user_id)}
+            GROUP BY d.device_id, d.device_name, dc.category_name, h.home_id, h.square_meters
+            """
         
-        result = db.execute(text(sql)).fetchall()
+        result = db.execute(text(sql), params).fetchall()
         
         # 转换为字典列表
         devices_usage = []
@@ -54,25 +136,54 @@ def analyze_device_usage_frequency(db: Session):
         logger.error(f"设备使用频率分析错误: {str(e)}")
         raise
 
-def analyze_device_usage_timeframe(db: Session):
-    """分析设备使用时间段"""
+def analyze_device_usage_timeframe(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    home_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    use_view: bool = False
+):
+    """分析设备使用时间段，use_view为True时读取物化视图（忽略过滤条件）"""
     try:
-        # 直接使用SQL查询而不是视图
-        sql = """
-        SELECT 
-            d.device_id,
-            d.device_name,
-            dc.category_name,
-            EXTRACT(HOUR FROM du.start_time) as hour_of_day,
-            COUNT(*) as usage_count
-        FROM device_usage du
-        JOIN devices d ON du.device_id = d.device_id
-        JOIN device_categories dc ON d.category_id = dc.category_id
-        GROUP BY d.device_id, d.device_name, dc.category_name, hour_of_day
-        ORDER BY d.device_id, hour_of_day
-        """
+        params = {}
+        if use_view:
+            sql = f"SELECT * FROM {TIMEFRAME_VIEW} ORDER BY device_id, hour_of_day"
+        elif _use_rollup(start, end, user_id):
+            # 从小时汇总读取，bucket的小时即为使用开始的小时
+            sql = f"""
+            SELECT 
+                d.device_id,
+                d.device_name,
+                dc.category_name,
+                EXTRACT(HOUR FROM r.bucket) as hour_of_day,
+                SUM(r.usage_count) as usage_count
+            FROM device_usage_hourly r
+            JOIN devices d ON r.device_id = d.device_id
+            JOIN device_categories dc ON d.category_id = dc.category_id
+            WHERE r.usage_count > 0{_rollup_time_range(params, start, end)}{_device_filters(params, home_id, category_id)}
+            GROUP BY d.device_id, d.device_name, dc.category_name, hour_of_day
+            ORDER BY d.device_id, hour_of_day
+            """
+        else:
+            # 直接使用SQL查询而不是视图
+            sql = f"""
+            SELECT 
+                d.device_id,
+                d.device_name,
+                dc.category_name,
+                EXTRACT(HOUR FROM du.start_time) as hour_of_day,
+                COUNT(*) as usage_count
+            FROM device_usage du
+            JOIN devices d ON du.device_id = d.device_id
+            JOIN device_categories dc ON d.category_id = dc.category_id
+            WHERE 1 = 1{_usage_time_range(params, start, end)}{_device_filters(params, home_id, category_id)}{_equals(params, 'du.user_id', 'user_id', user_id)}
+            GROUP BY d.device_id, d.device_name, dc.category_name, hour_of_day
+            ORDER BY d.device_id, hour_of_day
+            """
         
-        result = db.execute(text(sql)).fetchall()
+        result = db.execute(text(sql), params).fetchall()
         
         # 转换为字典列表
         timeframes = []
@@ -90,84 +201,178 @@ def analyze_device_usage_timeframe(db: Session):
         logger.error(f"设备使用时间段分析错误: {str(e)}")
         raise
 
-def analyze_device_usage_patterns(db: Session, min_support: float = 0.1):
-    """分析设备使用模式（哪些设备经常一起使用）"""
+def _build_usage_basket(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    home_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    user_id: Optional[int] = None
+) -> Tuple[int, "sparse.csr_matrix", List[str]]:
+    """
+    在SQL中构建设备共同使用的购物篮并编码为稀疏布尔矩阵
+
+    同一用户在同一15分钟窗口（按使用开始时间）内使用过的设备视为一个购物篮。
+    去重、窗口划分和行列编号都在数据库中完成，结果以三个数组一次取回。
+
+    返回:
+    - (参与统计的使用记录数, 购物篮×设备的稀疏矩阵, 列对应的设备名)
+    """
+    params = {}
+    filters = (
+        _usage_time_range(params, start, end)
+        + _device_filters(params, home_id, category_id)
+        + _equals(params, "du.user_id", "user_id", user_id)
+    )
+    sql = f"""
+    WITH usage AS (
+        SELECT
+            du.user_id,
+            {basket_window_sql("du.start_time")} AS time_window,
+            d.device_name
+        FROM device_usage du
+        JOIN devices d ON du.device_id = d.device_id
+        WHERE 1 = 1{filters}
+    ),
+    basket AS (
+        SELECT DISTINCT user_id, time_window, device_name
+        FROM usage
+        WHERE user_id IS NOT NULL
+    ),
+    encoded AS (
+        SELECT
+            dense_rank() OVER (ORDER BY user_id, time_window) - 1 AS basket_idx,
+            dense_rank() OVER (ORDER BY device_name) - 1 AS item_idx
+        FROM basket
+    )
+    SELECT
+        (SELECT COUNT(*) FROM usage) AS usage_count,
+        (SELECT array_agg(DISTINCT device_name ORDER BY device_name) FROM basket) AS items,
+        array_agg(basket_idx) AS basket_idx,
+        array_agg(item_idx) AS item_idx
+    FROM encoded
+    """
+    import numpy as np
+    from scipy import sparse
+
+    row = db.execute(text(sql), params).one()
+
+    items = row.items or []
+    rows = np.asarray(row.basket_idx or [], dtype=np.int64)
+    cols = np.asarray(row.item_idx or [], dtype=np.int64)
+    n_baskets = int(rows.max()) + 1 if rows.size else 0
+    matrix = sparse.csr_matrix(
+        (np.ones(rows.size, dtype=bool), (rows, cols)),
+        shape=(n_baskets, len(items))
+    )
+    return row.usage_count, matrix, items
+
+def _derive_rules(frequent_itemsets: "pd.DataFrame", min_support: float, min_confidence: float) -> Dict[str, Any]:
+    """根据频繁项集生成关联规则并转换为接口返回的格式"""
+    from mlxtend.frequent_patterns import association_rules
+
+    # 如果没有找到频繁项集，返回空结果
+    if frequent_itemsets.empty:
+        return {"message": "未找到满足最小支持度的频繁项集"}
+    
+    # 根据频繁项集生成关联规则
+    rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=min_confidence)
+    
+    # 如果没有生成规则，返回空结果
+    if rules.empty:
+        return {"message": "未找到满足条件的关联规则"}
+    
+    # 将规则转换为更易读的格式
+    formatted_rules = []
+    for _, rule in rules.iterrows():
+        # 按名称排序，输出与进程的字符串哈希顺序无关（结果会被持久化和比较）
+        antecedents = ', '.join(sorted(rule['antecedents']))
+        consequents = ', '.join(sorted(rule['consequents']))
+        formatted_rules.append({
+            "antecedents": antecedents,
+            "consequents": consequents,
+            "support": rule['support'],
+            "confidence": rule['confidence'],
+            "lift": rule['lift']
+        })
+    
+    return {
+        "rules": formatted_rules,
+        "min_support": min_support,
+        "min_confidence": min_confidence
+    }
+
+def _incremental_usage_patterns(db: Session, min_support: float, max_len: Optional[int], min_confidence: float):
+    """
+    由项集计数推导关联规则，不重新扫描全部历史
+
+    只读取计数，不在请求中刷新：计数由后台任务按ITEMSET_COUNT_REFRESH_INTERVAL刷新，
+    结果截至counted_until，可能落后于最新数据。
+    """
+    state, frequent_itemsets = load_frequent_itemsets(db, min_support, max_len)
+    
+    if state is None or state.counted_until is None:
+        return {"message": "项集计数尚未生成，请等待后台任务刷新，或执行python -m app.services.usage_itemsets"}
+    # 检查数据是否足够
+    if state.usage_count < 10:
+        return {"message": "没有足够的使用数据进行分析"}
+    
     try:
-        # 获取所有设备使用记录
-        usage_records = db.query(
-            DeviceUsage.usage_id,
-            DeviceUsage.device_id,
-            DeviceUsage.user_id,
-            DeviceUsage.start_time,
-            DeviceUsage.end_time,
-            Device.device_name
-        ).join(Device).all()
-        
-        # 检查数据是否足够
-        if not usage_records or len(usage_records) < 10:
-            return {"message": "没有足够的使用数据进行分析"}
+        result = _derive_rules(frequent_itemsets, min_support, min_confidence)
+    except Exception as e:
+        logger.error(f"关联规则分析错误: {str(e)}")
+        return {"message": f"分析设备使用模式时出错: {str(e)}"}
+    result["counted_until"] = state.counted_until
+    return result
+
+def analyze_device_usage_patterns(
+    db: Session,
+    min_support: float = 0.1,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    home_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    max_len: Optional[int] = None,
+    algorithm: Optional[str] = None,
+    min_confidence: float = 0.5,
+    incremental: bool = False
+):
+    """
+    分析设备使用模式（哪些设备经常一起使用）
+
+    max_len限制频繁项集的最大长度；algorithm选择频繁项集挖掘算法（见app.utils.itemsets）；
+    min_confidence为关联规则的最小置信度。
+
+    incremental为True且不带过滤条件时，由增量维护的项集计数（见app.services.usage_itemsets）
+    推导规则，只包含counted_until之前的时间窗口，项集长度不超过ITEMSET_COUNT_MAX_LEN；
+    带过滤条件时仍然完整挖掘。
+    """
+    try:
+        has_filters = any(value is not None for value in (start, end, home_id, category_id, user_id))
+        if incremental and not has_filters and db.bind.dialect.name == "postgresql":
+            return _incremental_usage_patterns(db, min_support, max_len, min_confidence)
         
-        # 将记录转换为DataFrame
-        df = pd.DataFrame([{
-            "usage_id": r.usage_id,
-            "device_id": r.device_id,
-            "user_id": r.user_id,
-            "start_time": r.start_time,
-            "end_time": r.end_time or r.start_time,  # 如果end_time为空，使用start_time
-            "device_name": r.device_name
-        } for r in usage_records])
+        usage_count, basket, items = _build_usage_basket(
+            db, start=start, end=end, home_id=home_id, category_id=category_id, user_id=user_id
+        )
         
-        if df.empty:
+        # 检查数据是否足够
+        if usage_count < 10:
             return {"message": "没有足够的使用数据进行分析"}
         
-        # 查找同时使用的设备
-        # 为了简化，我们按照15分钟的时间窗口分组
-        df['time_window'] = pd.to_datetime(df['start_time']).dt.floor('15min')
-        
-        # 创建透视表：每行是一个时间窗口，每列是一个设备，值为1表示该设备在该时间窗口内被使用
-        basket = (df.groupby(['user_id', 'time_window', 'device_name'])['usage_id']
-                .count().unstack().reset_index().fillna(0)
-                .set_index(['user_id', 'time_window']))
-        
-        # 将计数转换为二进制（0或1）
-        basket_sets = basket.map(lambda x: 1 if x > 0 else 0)
-        
         # 如果数据不足，返回空结果
-        if basket_sets.empty or len(basket_sets.columns) < 2:
+        if basket.shape[0] == 0 or len(items) < 2:
             return {"message": "没有足够的数据生成关联规则"}
         
         try:
-            # 使用Apriori算法找出频繁项集
-            frequent_itemsets = apriori(basket_sets, min_support=min_support, use_colnames=True)
-            
-            # 如果没有找到频繁项集，返回空结果
-            if frequent_itemsets.empty:
-                return {"message": "未找到满足最小支持度的频繁项集"}
-            
-            # 根据频繁项集生成关联规则
-            rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=0.5)
-            
-            # 如果没有生成规则，返回空结果
-            if rules.empty:
-                return {"message": "未找到满足条件的关联规则"}
-            
-            # 将规则转换为更易读的格式
-            formatted_rules = []
-            for _, rule in rules.iterrows():
-                antecedents = ', '.join(list(rule['antecedents']))
-                consequents = ', '.join(list(rule['consequents']))
-                formatted_rules.append({
-                    "antecedents": antecedents,
-                    "consequents": consequents,
-                    "support": rule['support'],
-                    "confidence": rule['confidence'],
-                    "lift": rule['lift']
-                })
-            
-            return {
-                "rules": formatted_rules,
-                "min_support": min_support
-            }
+            from ..utils.itemsets import mine_frequent_itemsets
+
+            # 在稀疏矩阵上挖掘频繁项集（每行是一个(用户, 时间窗口)，每列是一个设备）
+            frequent_itemsets = mine_frequent_itemsets(
+                basket, items, min_support, max_len=max_len, algorithm=algorithm
+            )
+            return _derive_rules(frequent_itemsets, min_support, min_confidence)
         except Exception as e:
             logger.error(f"关联规则分析错误: {str(e)}")
             return {"message": f"分析设备使用模式时出错: {str(e)}"}
@@ -175,28 +380,58 @@ def analyze_device_usage_patterns(db: Session, min_support: float = 0.1):
         logger.error(f"设备使用模式分析错误: {str(e)}")
         raise
 
-def analyze_home_area_impact(db: Session):
-    """分析房屋面积对设备使用行为的影响"""
+def analyze_home_area_impact(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    home_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    use_view: bool = False
+):
+    """分析房屋面积对设备使用行为的影响，use_view为True时读取物化视图（忽略过滤条件）"""
     try:
-        sql = """
-        SELECT 
-            h.square_meters,
-            h.num_rooms,
-            d.device_id,
-            d.device_name,
-            dc.category_name,
-            COUNT(du.usage_id) as usage_count,
-            SUM(EXTRACT(EPOCH FROM (du.end_time - du.start_time))/3600) as total_hours
-        FROM homes h
-        JOIN devices d ON h.home_id = d.home_id
-        JOIN device_categories dc ON d.category_id = dc.category_id
-        LEFT JOIN device_usage du ON d.device_id = du.device_id
-        WHERE du.end_time IS NOT NULL
-        GROUP BY h.square_meters, h.num_rooms, d.device_id, d.device_name, dc.category_name
-        ORDER BY h.square_meters
-        """
+        params = {}
+        if use_view:
+            sql = f"SELECT * FROM {HOME_AREA_IMPACT_VIEW} ORDER BY square_meters"
+        elif _use_rollup(start, end, user_id):
+            sql = f"""
+            SELECT 
+                h.square_meters,
+                h.num_rooms,
+                d.device_id,
+                d.device_name,
+                dc.category_name,
+                SUM(r.completed_count) as usage_count,
+                SUM(r.total_seconds)/3600 as total_hours
+            FROM homes h
+            JOIN devices d ON h.home_id = d.home_id
+            JOIN device_categories dc ON d.category_id = dc.category_id
+            JOIN device_usage_hourly r ON d.device_id = r.device_id
+            WHERE r.completed_count > 0{_rollup_time_range(params, start, end)}{_device_filters(params, home_id, category_id)}
+            GROUP BY h.square_meters, h.num_rooms, d.device_id, d.device_name, dc.category_name
+            ORDER BY h.square_meters
+            """
+        else:
+            sql = f"""
+            SELECT 
+                h.square_meters,
+                h.num_rooms,
+                d.device_id,
+                d.device_name,
+                dc.category_name,
+                COUNT(du.usage_id) as usage_count,
+                SUM(EXTRACT(EPOCH FROM (du.end_time - du.start_time))/3600) as total_hours
+            FROM homes h
+            JOIN devices d ON h.home_id = d.home_id
+            JOIN device_categories dc ON d.category_id = dc.category_id
+            LEFT JOIN device_usage du ON d.device_id = du.device_id
+            WHERE du.end_time IS NOT NULL{_usage_time_range(params, start, end)}{_device_filters(params, home_id, category_id)}{_equals(params, 'du.user_id', 'user_id', user_id)}
+            GROUP BY h.square_meters, h.num_rooms, d.device_id, d.device_name, dc.category_name
+            ORDER BY h.square_meters
+            """
         
-        result = db.execute(text(sql)).fetchall()
+        result = db.execute(text(sql), params).fetchall()
         
         # 转换为字典列表
         area_impact = []
@@ -216,26 +451,48 @@ def analyze_home_area_impact(db: Session):
         logger.error(f"房屋面积影响分析错误: {str(e)}")
         raise
 
-def analyze_security_events(db: Session):
-    """分析安防事件"""
+def analyze_security_events(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    home_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    use_view: bool = False
+):
+    """
+    分析安防事件，use_view为True时读取物化视图（忽略过滤条件）
+
+    start/end按事件时间过滤，category_id只统计该类别设备触发的事件，user_id为住宅所有者。
+    事件条件放在JOIN中，没有符合条件事件的住宅仍以0计数返回。
+    """
     try:
-        sql = """
-        SELECT 
-            h.home_id,
-            h.home_name,
-            h.square_meters,
-            COUNT(se.event_id) as total_events,
-            COUNT(CASE WHEN se.is_resolved = FALSE THEN 1 END) as unresolved_events,
-            COUNT(CASE WHEN se.severity = 'high' THEN 1 END) as high_severity_events,
-            COUNT(CASE WHEN se.severity = 'medium' THEN 1 END) as medium_severity_events,
-            COUNT(CASE WHEN se.severity = 'low' THEN 1 END) as low_severity_events
-        FROM homes h
-        LEFT JOIN security_events se ON h.home_id = se.home_id
-        GROUP BY h.home_id, h.home_name, h.square_meters
-        ORDER BY total_events DESC
-        """
+        params = {}
+        if use_view:
+            sql = f"SELECT * FROM {SECURITY_EVENTS_VIEW} ORDER BY total_events DESC"
+        else:
+            event_filters = _time_range(params, "se.event_time", start, end)
+            if category_id is not None:
+                event_filters += " AND se.device_id IN (SELECT device_id FROM devices WHERE category_id = :category_id)"
+                params["category_id"] = category_id
+            sql = f"""
+            SELECT 
+                h.home_id,
+                h.home_name,
+                h.square_meters,
+                COUNT(se.event_id) as total_events,
+                COUNT(CASE WHEN se.is_resolved = FALSE THEN 1 END) as unresolved_events,
+                COUNT(CASE WHEN se.severity = 'high' THEN 1 END) as high_severity_events,
+                COUNT(CASE WHEN se.severity = 'medium' THEN 1 END) as medium_severity_events,
+                COUNT(CASE WHEN se.severity = 'low' THEN 1 END) as low_severity_events
+            FROM homes h
+            LEFT JOIN security_events se ON h.home_id = se.home_id{event_filters}
+            WHERE 1 = 1{_equals(params, 'h.home_id', 'home_id', home_id)}{_equals(params, 'h.user_id', 'user_id', user_id)}
+            GROUP BY h.home_id, h.home_name, h.square_meters
+            ORDER BY total_events DESC
+            """
         
-        result = db.execute(text(sql)).fetchall()
+        result = db.execute(text(sql), params).fetchall()
         
         # 转换为字典列表
         security_summary = []
@@ -256,23 +513,51 @@ def analyze_security_events(db: Session):
         logger.error(f"安防事件分析错误: {str(e)}")
         raise
 
-def analyze_user_feedback(db: Session):
-    """分析用户反馈"""
+def analyze_user_feedback(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    home_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    use_view: bool = False
+):
+    """
+    分析用户反馈，use_view为True时读取物化视图（忽略过滤条件）
+
+    start/end按反馈创建时间过滤；home_id和category_id分别筛选该住宅所有者、
+    拥有该类别设备的用户提交的反馈。
+    """
     try:
-        sql = """
-        SELECT 
-            feedback_type,
-            AVG(rating) as average_rating,
-            COUNT(*) as total_feedbacks,
-            COUNT(CASE WHEN responded = TRUE THEN 1 END) as responded_count,
-            EXTRACT(MONTH FROM created_at) as month,
-            EXTRACT(YEAR FROM created_at) as year
-        FROM feedbacks
-        GROUP BY feedback_type, EXTRACT(MONTH FROM created_at), EXTRACT(YEAR FROM created_at)
-        ORDER BY year, month
-        """
+        params = {}
+        if use_view:
+            sql = f"SELECT * FROM {USER_FEEDBACK_VIEW} ORDER BY year, month"
+        else:
+            filters = _time_range(params, "created_at", start, end) + _equals(params, "user_id", "user_id", user_id)
+            if home_id is not None:
+                filters += " AND user_id IN (SELECT user_id FROM homes WHERE home_id = :home_id)"
+                params["home_id"] = home_id
+            if category_id is not None:
+                filters += """ AND user_id IN (
+                    SELECT h.user_id FROM homes h JOIN devices d ON d.home_id = h.home_id
+                    WHERE d.category_id = :category_id
+                )"""
+                params["category_id"] = category_id
+            sql = f"""
+            SELECT 
+                feedback_type,
+                AVG(rating) as average_rating,
+                COUNT(*) as total_feedbacks,
+                COUNT(CASE WHEN responded = TRUE THEN 1 END) as responded_count,
+                EXTRACT(MONTH FROM created_at) as month,
+                EXTRACT(YEAR FROM created_at) as year
+            FROM feedbacks
+            WHERE 1 = 1{filters}
+            GROUP BY feedback_type, EXTRACT(MONTH FROM created_at), EXTRACT(YEAR FROM created_at)
+            ORDER BY year, month
+            """
         
-        result = db.execute(text(sql)).fetchall()
+        result = db.execute(text(sql), params).fetchall()
         
         # 转换为字典列表
         feedback_analysis = []
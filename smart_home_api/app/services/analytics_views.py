@@ -0,0 +1,127 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from ..database import SessionLocal
+from ..utils import cache
+from ..utils.scheduler import try_advisory_lock
+from . import analytics
+import logging
+import os
+import time
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 是否让不带过滤条件的分析请求读取物化视图
+ANALYTICS_VIEWS_ENABLED = os.getenv("ANALYTICS_VIEWS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+# 物化视图的刷新间隔（秒）
+ANALYTICS_VIEW_REFRESH_INTERVAL = int(os.getenv("ANALYTICS_VIEW_REFRESH_INTERVAL_SECONDS", "300"))
+
+# 需要定期刷新的分析物化视图（见迁移0005）
+ANALYTICS_VIEWS = [
+    analytics.FREQUENCY_VIEW,
+    analytics.TIMEFRAME_VIEW,
+    analytics.HOME_AREA_IMPACT_VIEW,
+    analytics.SECURITY_EVENTS_VIEW,
+    analytics.USER_FEEDBACK_VIEW,
+]
+
+def get_view_refresh(db: Session, view_name: str) -> Optional[Tuple[datetime, float]]:
+    """
+    返回视图最近一次刷新的时间和距今秒数
+
+    非PostgreSQL数据库或视图尚未创建（未执行迁移0005）时返回None。
+    """
+    if db.bind.dialect.name != "postgresql":
+        return None
+    row = db.execute(text("""
+        SELECT r.refreshed_at, EXTRACT(EPOCH FROM (now() - r.refreshed_at)) AS age_seconds
+        FROM pg_matviews m
+        JOIN analytics_view_refreshes r ON r.view_name = m.matviewname
+        WHERE m.matviewname = :view_name AND m.ispopulated
+    """), {"view_name": view_name}).first()
+    if row is None:
+        return None
+    return row.refreshed_at, max(float(row.age_seconds), 0.0)
+
+def query_analytics(
+    db: Session,
+    analyze: Callable[..., Any],
+    view_name: str,
+    fresh: bool = False,
+    **filters
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    执行分析函数，不带过滤条件时优先读取物化视图
+
+    返回:
+    - (分析结果, 数据来源元信息)，元信息包含source（view或live），
+      读取视图时还包含refreshed_at和staleness_seconds
+    """
+    has_filters = any(value is not None for value in filters.values())
+    if ANALYTICS_VIEWS_ENABLED and not fresh and not has_filters:
+        refresh = get_view_refresh(db, view_name)
+        if refresh is not None:
+            refreshed_at, age_seconds = refresh
+            return analyze(db, use_view=True), {
+                "source": "view",
+                "refreshed_at": refreshed_at,
+                "staleness_seconds": age_seconds
+            }
+    return analyze(db, **filters), {"source": "live"}
+
+def refresh_analytics_views(db: Session) -> List[str]:
+    """
+    并发刷新所有分析物化视图，多个worker同时执行时只有一个生效
+
+    CONCURRENTLY刷新期间视图仍可读取。返回已刷新的视图名。
+    """
+    if db.bind.dialect.name != "postgresql":
+        return []
+
+    if not try_advisory_lock(db, "analytics_view_refresh"):
+        db.rollback()
+        return []
+
+    existing = {
+        row.matviewname
+        for row in db.execute(text("SELECT matviewname FROM pg_matviews WHERE matviewname = ANY(:names)"), {"names": ANALYTICS_VIEWS})
+    }
+
+    refreshed = []
+    for view_name in ANALYTICS_VIEWS:
+        if view_name not in existing:
+            continue
+        # 以刷新开始的时间作为视图数据的时间点
+        refreshed_at = db.execute(text("SELECT clock_timestamp()")).scalar()
+        started = time.perf_counter()
+        db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view_name}"))
+        duration_ms = (time.perf_counter() - started) * 1000
+        db.execute(text("""
+            INSERT INTO analytics_view_refreshes (view_name, refreshed_at, duration_ms)
+            VALUES (:view_name, :refreshed_at, :duration_ms)
+            ON CONFLICT (view_name) DO UPDATE SET
+                refreshed_at = EXCLUDED.refreshed_at,
+                duration_ms = EXCLUDED.duration_ms
+        """), {"view_name": view_name, "refreshed_at": refreshed_at, "duration_ms": duration_ms})
+        refreshed.append(view_name)
+    db.commit()
+    # 视图内容已更新，丢弃缓存中基于旧视图的结果
+    if refreshed:
+        cache.invalidate(cache.DEVICE_USAGE_TAG, cache.SECURITY_EVENTS_TAG, cache.FEEDBACK_TAG)
+    return refreshed
+
+def run_analytics_view_refresh():
+    """后台任务入口"""
+    db = SessionLocal()
+    try:
+        refreshed = refresh_analytics_views(db)
+        if refreshed:
+            logger.info(f"已刷新物化视图: {', '.join(refreshed)}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_analytics_view_refresh()
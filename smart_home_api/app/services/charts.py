@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from ..utils import cache
+from ..utils.process_pool import CancellingProcessPool
+from ..utils.visualization_helpers import render_chart
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 绘制图表的进程数，0表示在线程池中绘制（matplotlib不是线程安全的，同一时间只绘制一张）
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "1"))
+# 正在绘制和排队的图表上限，超过时请求返回503
+CHART_RENDER_MAX_PENDING = int(os.getenv("CHART_RENDER_MAX_PENDING", "16"))
+# 图表图像的缓存时间（秒），0表示不缓存。缓存键包含数据的ETag，数据变化后自动使用新键
+CHART_CACHE_TTL = float(os.getenv("CHART_CACHE_TTL_SECONDS", "3600"))
+# 绘图代码变化时递增，使客户端和缓存中按旧样式绘制的图像失效
+CHART_STYLE_VERSION = 1
+
+# 图表名 -> 数据来源的分析接口
+CHARTS = {
+    "device-usage-frequency": "device-usage-frequency",
+    "device-usage-hours": "device-usage-frequency",
+    "device-usage-timeframe": "device-usage-timeframe",
+    "home-area-impact": "home-area-impact",
+    "security-events": "security-events-summary",
+    "feedback-ratings": "user-feedback-analysis",
+}
+
+class ChartRenderBusy(Exception):
+    """排队的绘图任务已达上限"""
+
+_executor: Optional[CancellingProcessPool] = None
+_executor_lock = threading.Lock()
+# 同一时间只有一个线程使用pyplot（CHART_RENDER_WORKERS=0时）
+_render_lock = threading.Lock()
+_pending = 0
+_stats = {"hits": 0, "rendered": 0, "coalesced": 0, "rejected": 0, "time_total_ms": 0.0}
+# 正在绘制的图表：缓存键 -> Task，相同图表的并发请求等待同一次绘制
+_inflight: Dict[str, "asyncio.Task"] = {}
+
+def chart_etag(name: str, data_etag: str, fmt: str, width: int, height: int, limit: int) -> str:
+    """由数据的ETag和绘图参数生成图表的ETag，不需要先绘图就能响应If-None-Match"""
+    raw = f"{CHART_STYLE_VERSION}|{name}|{fmt}|{width}x{height}|{limit}|{data_etag}"
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"'
+
+def _get_executor() -> CancellingProcessPool:
+    """按需创建进程池；使用spawn启动，子进程只导入绘图模块和matplotlib"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = CancellingProcessPool(max_workers=CHART_RENDER_WORKERS, mp_context=get_context("spawn"))
+        return _executor
+
+def _render_locked(*args) -> bytes:
+    with _render_lock:
+        return render_chart(*args)
+
+async def _render(*args) -> bytes:
+    global _pending
+    with _executor_lock:
+        if _pending >= CHART_RENDER_MAX_PENDING:
+            _stats["rejected"] += 1
+            raise ChartRenderBusy()
+        _pending += 1
+    started = time.perf_counter()
+    try:
+        if CHART_RENDER_WORKERS > 0:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(_get_executor(), render_chart, *args)
+            except BrokenProcessPool:
+                # 工作进程异常退出后进程池不可再用，丢弃它，下一个请求重新创建
+                logger.error("图表绘制进程池已损坏，将重新创建")
+                shutdown_executor()
+                raise
+        return await run_in_threadpool(_render_locked, *args)
+    finally:
+        with _executor_lock:
+            _pending -= 1
+            _stats["rendered"] += 1
+            _stats["time_total_ms"] += (time.perf_counter() - started) * 1000
+
+async def _render_and_store(key: str, ttl: float, *args) -> bytes:
+    image = await _render(*args)
+    await cache.aput(key, image, ttl)
+    return image
+
+async def get_chart(name: str, data: List[Dict[str, Any]], etag: str, fmt: str = "png",
+                    width: int = 1000, height: int = 600, limit: int = 20) -> bytes:
+    """
+    返回图表图像的原始字节
+
+    先按图表ETag查缓存，未命中时在进程池中绘制；相同图表的并发请求只绘制一次。
+    排队的绘图任务已满时抛出ChartRenderBusy。
+    """
+    ttl = CHART_CACHE_TTL
+    key = "chart:" + etag.strip('"')
+    if ttl > 0:
+        image = await cache.aget(key)
+        if image is not None:
+            _stats["hits"] += 1
+            return image
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_render_and_store(key, ttl, name, data, fmt, width, height, limit))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        _stats["coalesced"] += 1
+    # 某个请求断开时不取消其他请求也在等待的绘制
+    return await asyncio.shield(task)
+
+def shutdown_executor(wait: bool = False):
+    """
+    关闭进程池，取消排队的绘图任务
+
+    服务关闭时应使用wait=True：uvicorn完成关闭后以收到的信号结束进程，不执行atexit，
+    不等待时工作进程可能收不到退出通知而残留。
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+def get_stats() -> Dict[str, Any]:
+    with _executor_lock:
+        rendered = _stats["rendered"]
+        return {
+            "workers": CHART_RENDER_WORKERS,
+            "pending": _pending,
+            "max_pending": CHART_RENDER_MAX_PENDING,
+            "cache_hits": _stats["hits"],
+            "rendered": rendered,
+            "coalesced": _stats["coalesced"],
+            "rejected": _stats["rejected"],
+            "avg_render_ms": round(_stats["time_total_ms"] / rendered, 3) if rendered else 0.0,
+        }
@@ -1,7 +1,48 @@
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from ..database import SessionLocal
 from ..models.device_usage import DeviceUsage
+from ..models.devices import Device
+from ..models.users import User
 from ..schemas.device_usage import DeviceUsageCreate, DeviceUsageUpdate
+from ..utils import cache
+from ..utils.crud import delete_returning
+from ..utils.pagination import Keyset
+from .usage_rollup import apply_usage_delta, bump_usage_watermark, usage_key
 from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import csv
+import io
+import json
+import os
+
+# numpy和pandas只用于列式上报的向量化校验，首次处理列式请求时才导入
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 列表的分页排序键：按开始时间倒序，usage_id区分同一时间的记录
+DEVICE_USAGE_KEYSET = Keyset(DeviceUsage.start_time, DeviceUsage.usage_id, descending=True)
+
+# 批量写入时每个事务包含的记录数
+BULK_BATCH_SIZE = int(os.getenv("DEVICE_USAGE_BULK_BATCH_SIZE", "1000"))
+# 单次批量请求允许的最大记录数
+BULK_MAX_ROWS = int(os.getenv("DEVICE_USAGE_BULK_MAX_ROWS", "50000"))
+# 导出时每次从服务端游标取回的行数，也是每个响应分块包含的行数
+EXPORT_BATCH_SIZE = int(os.getenv("DEVICE_USAGE_EXPORT_BATCH_SIZE", "5000"))
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_COLUMNS = [
+    DeviceUsage.usage_id,
+    DeviceUsage.device_id,
+    DeviceUsage.user_id,
+    DeviceUsage.start_time,
+    DeviceUsage.end_time,
+    DeviceUsage.operation_type,
+    DeviceUsage.operation_value,
+    DeviceUsage.created_at,
+]
 
 def get_device_usage(db: Session, usage_id: int):
     return db.query(DeviceUsage).filter(DeviceUsage.usage_id == usage_id).first()
@@ -11,17 +52,92 @@ def get_device_usages(
     skip: int = 0, 
     limit: int = 100, 
     device_id: int = None,
-    user_id: int = None
+    user_id: int = None,
+    start: datetime = None,
+    end: datetime = None,
+    cursor: str = None
 ):
-    query = db.query(DeviceUsage)
-    
+    query = _filter_usages(db.query(DeviceUsage), device_id, user_id, start, end)
+    return DEVICE_USAGE_KEYSET.paginate(query, skip, limit, cursor).all()
+
+def _filter_usages(query, device_id: int = None, user_id: int = None, start: datetime = None, end: datetime = None):
+    """列表和导出共用的过滤条件，query可以是Query或select()"""
     if device_id is not None:
         query = query.filter(DeviceUsage.device_id == device_id)
     
     if user_id is not None:
         query = query.filter(DeviceUsage.user_id == user_id)
     
-    return query.order_by(DeviceUsage.start_time.desc()).offset(skip).limit(limit).all()
+    # 按分区键过滤，只扫描相关月份的分区
+    if start is not None:
+        query = query.filter(DeviceUsage.start_time >= start)
+    
+    if end is not None:
+        query = query.filter(DeviceUsage.start_time < end)
+    
+    return query
+
+# 导出中的时间列统一为ISO 8601格式
+_EXPORT_DATETIME_INDEXES = [
+    i for i, column in enumerate(EXPORT_COLUMNS) if column.type.python_type is datetime
+]
+_export_json = json.JSONEncoder(ensure_ascii=False, default=lambda value: value.isoformat())
+
+def _format_ndjson(names: List[str], rows) -> bytes:
+    lines = [_export_json.encode(dict(zip(names, row))) for row in rows]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def _isoformat_row(row) -> list:
+    row = list(row)
+    for i in _EXPORT_DATETIME_INDEXES:
+        if row[i] is not None:
+            row[i] = row[i].isoformat()
+    return row
+
+def _format_csv(writer, buffer: io.StringIO, rows) -> bytes:
+    writer.writerows([_isoformat_row(row) for row in rows])
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk.encode("utf-8")
+
+def export_device_usages(
+    fmt: str = "ndjson",
+    device_id: int = None,
+    user_id: int = None,
+    start: datetime = None,
+    end: datetime = None
+) -> Iterator[bytes]:
+    """
+    按开始时间顺序流式导出设备使用记录
+
+    使用独立的会话和服务端游标（yield_per），每次取回EXPORT_BATCH_SIZE行并编码为一个分块，
+    只读取列值而不构造ORM对象，内存占用与导出的总行数无关。
+    会话在生成器结束或被关闭（例如客户端断开）时释放。
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+    names = [column.key for column in EXPORT_COLUMNS]
+    stmt = _filter_usages(select(*EXPORT_COLUMNS), device_id, user_id, start, end)
+    stmt = stmt.order_by(DeviceUsage.start_time, DeviceUsage.usage_id)
+
+    db = SessionLocal()
+    try:
+        # 只取列值，直接在连接上执行以绕过ORM的结果处理
+        result = db.connection().execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            yield _format_csv(writer, buffer, [])
+            for rows in result.partitions():
+                yield _format_csv(writer, buffer, rows)
+        else:
+            for rows in result.partitions():
+                yield _format_ndjson(names, rows)
+    finally:
+        db.close()
 
 def create_device_usage(db: Session, device_usage: DeviceUsageCreate):
     db_device_usage = DeviceUsage(
@@ -33,26 +149,65 @@ def create_device_usage(db: Session, device_usage: DeviceUsageCreate):
         operation_value=device_usage.operation_value
     )
     db.add(db_device_usage)
+    # 小时汇总与使用记录在同一事务中提交
+    apply_usage_delta(db, added=[usage_key(db_device_usage)])
+    bump_usage_watermark(db)
     db.commit()
+    cache.invalidate(cache.DEVICE_USAGE_TAG)
     db.refresh(db_device_usage)
     return db_device_usage
 
 def update_device_usage(db: Session, usage_id: int, device_usage: DeviceUsageUpdate):
-    db_device_usage = get_device_usage(db, usage_id)
-    
+    """
+    更新使用记录，记录不存在时返回None
+
+    一条UPDATE ... FROM同时锁定旧行并取回修改前的end_time，用于更新小时汇总；
+    可修改的字段不包括device_id和start_time。
+    """
     update_data = device_usage.dict(exclude_unset=True)
+    if not update_data:
+        return get_device_usage(db, usage_id)
     
-    for key, value in update_data.items():
-        setattr(db_device_usage, key, value)
+    old = (
+        select(DeviceUsage.usage_id, DeviceUsage.start_time, DeviceUsage.end_time)
+        .where(DeviceUsage.usage_id == usage_id)
+        .with_for_update()
+        .subquery("old")
+    )
+    stmt = (
+        update(DeviceUsage)
+        .where(DeviceUsage.usage_id == old.c.usage_id, DeviceUsage.start_time == old.c.start_time)
+        .values(**update_data)
+        .returning(DeviceUsage, old.c.end_time)
+    )
+    row = db.execute(stmt, execution_options={"synchronize_session": False}).first()
+    if row is None:
+        db.rollback()
+        return None
+    db_device_usage, old_end_time = row
+    db.expunge(db_device_usage)
     
+    old_key = (db_device_usage.device_id, db_device_usage.start_time, old_end_time)
+    apply_usage_delta(db, added=[usage_key(db_device_usage)], removed=[old_key])
+    bump_usage_watermark(db)
     db.commit()
-    db.refresh(db_device_usage)
+    cache.invalidate(cache.DEVICE_USAGE_TAG)
     return db_device_usage
 
-def delete_device_usage(db: Session, usage_id: int):
-    db_device_usage = get_device_usage(db, usage_id)
-    db.delete(db_device_usage)
+def delete_device_usage(db: Session, usage_id: int) -> bool:
+    """删除使用记录，记录不存在时返回False"""
+    removed = delete_returning(
+        db, DeviceUsage, DeviceUsage.usage_id == usage_id,
+        DeviceUsage.device_id, DeviceUsage.start_time, DeviceUsage.end_time
+    )
+    if removed is None:
+        db.rollback()
+        return False
+    apply_usage_delta(db, removed=[tuple(removed)])
+    bump_usage_watermark(db)
     db.commit()
+    cache.invalidate(cache.DEVICE_USAGE_TAG)
+    return True
 
 def start_device_usage(db: Session, device_id: int, user_id: int, operation_type: str = None):
     """记录设备开始使用"""
@@ -63,7 +218,10 @@ def start_device_usage(db: Session, device_id: int, user_id: int, operation_type
         operation_type=operation_type
     )
     db.add(db_device_usage)
+    apply_usage_delta(db, added=[usage_key(db_device_usage)])
+    bump_usage_watermark(db)
     db.commit()
+    cache.invalidate(cache.DEVICE_USAGE_TAG)
     db.refresh(db_device_usage)
     return db_device_usage
 
@@ -78,10 +236,312 @@ def stop_device_usage(db: Session, device_id: int, operation_value: str = None):
     )
     
     if db_device_usage:
+        old_key = usage_key(db_device_usage)
         db_device_usage.end_time = datetime.now()
         if operation_value:
             db_device_usage.operation_value = operation_value
+        apply_usage_delta(db, added=[usage_key(db_device_usage)], removed=[old_key])
+        bump_usage_watermark(db)
         db.commit()
+        cache.invalidate(cache.DEVICE_USAGE_TAG)
         db.refresh(db_device_usage)
     
     return db_device_usage
+
+def parse_bulk_payload(body: bytes, ndjson: bool = False) -> Tuple[List[Tuple[int, Any]], List[Dict[str, Any]]]:
+    """
+    解析批量写入的请求体
+
+    参数:
+    - body: JSON数组，或ndjson为True时每行一个JSON对象（空行忽略）
+    
+    返回:
+    - ([(序号, 解析出的对象)], [无法解析的行的错误])
+
+    JSON数组整体无法解析时抛出ValueError。
+    """
+    if not ndjson:
+        data = json.loads(body)
+        if not isinstance(data, list):
+            raise ValueError("请求体必须是JSON数组")
+        return list(enumerate(data)), []
+
+    records = []
+    errors = []
+    index = 0
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append((index, json.loads(line)))
+        except ValueError as e:
+            errors.append({"index": index, "detail": f"JSON解析失败: {str(e)}"})
+        index += 1
+    return records, errors
+
+def _existing_ids(db: Session, column, ids) -> set:
+    if not ids:
+        return set()
+    return set(db.execute(select(column).where(column.in_(ids))).scalars())
+
+def _write_batch(db: Session, batch: List[Tuple[int, Dict[str, Any]]], usage_ids: Dict[int, int], errors: List[Dict[str, Any]]):
+    """
+    用一条executemany的INSERT ... RETURNING写入一批已校验字段的记录
+
+    先一次查询校验外键，避免整批因个别记录违反约束而回退到逐条写入；
+    整批仍然失败时（例如违反其他约束）回滚后逐条用SAVEPOINT重试，找出出错的记录。
+    连接中断等其他数据库错误直接抛出，不记为单条记录的错误。
+    """
+    devices = _existing_ids(db, Device.device_id, {row["device_id"] for _, row in batch})
+    users = _existing_ids(db, User.user_id, {row["user_id"] for _, row in batch})
+    valid = []
+    for index, row in batch:
+        if row["device_id"] not in devices:
+            errors.append({"index": index, "detail": "设备不存在"})
+        elif row["user_id"] not in users:
+            errors.append({"index": index, "detail": "用户不存在"})
+        else:
+            valid.append((index, row))
+    if not valid:
+        return
+
+    values = [row for _, row in valid]
+    try:
+        ids = db.execute(
+            insert(DeviceUsage).returning(DeviceUsage.usage_id, sort_by_parameter_order=True),
+            values
+        ).scalars().all()
+        inserted = list(zip(valid, ids))
+    except (DataError, IntegrityError):
+        db.rollback()
+        inserted = []
+        for index, row in valid:
+            try:
+                with db.begin_nested():
+                    usage_id = db.execute(insert(DeviceUsage).returning(DeviceUsage.usage_id), row).scalar_one()
+                inserted.append(((index, row), usage_id))
+            except (DataError, IntegrityError) as e:
+                errors.append({"index": index, "detail": str(getattr(e, "orig", e)).strip()})
+
+    apply_usage_delta(db, added=[
+        (row["device_id"], row["start_time"], row["end_time"]) for (_, row), _ in inserted
+    ])
+    if inserted:
+        bump_usage_watermark(db)
+    db.commit()
+    for (index, _), usage_id in inserted:
+        usage_ids[index] = usage_id
+
+def _bulk_result(db: Session, total: int, usage_ids: Dict[int, int], errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if usage_ids:
+        cache.invalidate(cache.DEVICE_USAGE_TAG)
+
+    errors.sort(key=lambda error: error["index"])
+    return {
+        "inserted": len(usage_ids),
+        "failed": len(errors),
+        "usage_ids": [usage_ids.get(index) for index in range(total)],
+        "errors": errors
+    }
+
+def bulk_create_device_usages(
+    db: Session,
+    records: Sequence[Tuple[int, Any]],
+    errors: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    批量写入使用记录
+
+    按BULK_BATCH_SIZE分批：每批先逐条校验，再一次性检查设备和用户是否存在，
+    然后用一条语句写入并在同一事务中更新小时汇总。出错的记录不影响其他记录。
+
+    参数:
+    - records: [(序号, 原始对象)]，通常来自parse_bulk_payload
+    - errors: 已有的错误（例如解析失败的行），会合并到返回结果中
+
+    返回:
+    - inserted/failed: 成功和失败的记录数
+    - usage_ids: 与输入顺序一致的新记录ID，失败的记录为None
+    - errors: [{"index": 序号, "detail": 错误信息}]
+    """
+    errors = list(errors or [])
+    usage_ids: Dict[int, int] = {}
+    total = len(records) + len(errors)
+
+    for offset in range(0, len(records), BULK_BATCH_SIZE):
+        batch = []
+        for index, record in records[offset:offset + BULK_BATCH_SIZE]:
+            try:
+                row = DeviceUsageCreate.model_validate(record).model_dump()
+            except ValidationError as e:
+                errors.append({"index": index, "detail": e.errors(include_url=False, include_context=False)})
+                continue
+            batch.append((index, row))
+
+        _write_batch(db, batch, usage_ids, errors)
+
+    return _bulk_result(db, total, usage_ids, errors)
+
+# 列式上报的字段，前三列必填
+COLUMNAR_FIELDS = ("device_id", "user_id", "start_time", "end_time", "operation_type", "operation_value")
+COLUMNAR_REQUIRED = ("device_id", "user_id", "start_time")
+OPERATION_TYPE_MAX_LENGTH = 50
+
+class ColumnarFormatUnavailable(RuntimeError):
+    """服务端未安装msgpack，不能接收列式上报"""
+
+def parse_columnar_payload(body: bytes) -> Dict[str, list]:
+    """
+    解析MessagePack编码的列式请求体：{"列名": [值, ...], ...}
+
+    格式错误时抛出ValueError，未安装msgpack时抛出ColumnarFormatUnavailable。
+    """
+    try:
+        import msgpack
+    except ImportError as e:
+        raise ColumnarFormatUnavailable("列式上报需要先安装msgpack包: pip install msgpack") from e
+    try:
+        columns = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise ValueError(f"MessagePack解析失败: {str(e)}") from e
+    if not isinstance(columns, dict):
+        raise ValueError("请求体必须是列名到值数组的映射")
+    return columns
+
+class _ColumnValidator:
+    """按列向量化校验，记录每行遇到的第一个错误"""
+
+    def __init__(self, n_rows: int):
+        import numpy as np
+
+        self.invalid = np.zeros(n_rows, dtype=bool)
+        self.errors: List[Dict[str, Any]] = []
+
+    def reject(self, mask, detail: str):
+        import numpy as np
+
+        mask = np.asarray(mask, dtype=bool)
+        for index in np.flatnonzero(mask & ~self.invalid):
+            self.errors.append({"index": int(index), "detail": detail})
+        self.invalid |= mask
+
+    @staticmethod
+    def _is_string(values: "pd.Series", kind: str) -> "pd.Series":
+        # 整列类型一致时（常见情况）不必逐个元素检查
+        if kind in ("string", "empty"):
+            return values.notna()
+        return values.map(lambda value: isinstance(value, str)).astype(bool)
+
+    def integers(self, values: "pd.Series", name: str) -> "pd.Series":
+        import numpy as np
+        import pandas as pd
+
+        numbers = pd.to_numeric(values, errors="coerce")
+        self.reject(numbers.isna() | (numbers != np.floor(numbers)), f"{name}必须是整数")
+        return numbers.fillna(0).astype("int64")
+
+    def datetimes(self, values: "pd.Series", name: str, required: bool) -> "pd.Series":
+        import numpy as np
+        import pandas as pd
+
+        # 数值为相对1970-01-01T00:00:00的毫秒数，字符串为ISO 8601格式；均按不带时区的时间保存，
+        # 带时区的换算为UTC，与JSON上报的规则（time_utils.to_naive_utc）一致
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+        numbers = pd.to_numeric(values, errors="coerce") if kind != "string" else pd.Series(np.nan, index=values.index)
+        parsed = pd.to_datetime(numbers, unit="ms", errors="coerce")
+        if kind not in ("integer", "floating", "empty"):
+            strings = values if kind == "string" else values.where(self._is_string(values, kind))
+            from_strings = pd.to_datetime(strings, format="ISO8601", errors="coerce", utc=True).dt.tz_localize(None)
+            parsed = parsed.where(numbers.notna(), from_strings)
+        missing = values.isna()
+        if required:
+            self.reject(missing, f"{name}不能为空")
+        self.reject(parsed.isna() & ~missing, f"{name}必须是毫秒时间戳或ISO 8601时间")
+        return parsed
+
+    def strings(self, values: "pd.Series", name: str, max_length: Optional[int] = None) -> "pd.Series":
+        import pandas as pd
+
+        is_string = self._is_string(values, pd.api.types.infer_dtype(values, skipna=True))
+        self.reject(values.notna() & ~is_string, f"{name}必须是字符串")
+        if max_length is not None:
+            self.reject(is_string & (values.str.len() > max_length), f"{name}长度不能超过{max_length}")
+        return values
+
+def decode_usage_columns(columns: Dict[str, list]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]], int]:
+    """
+    向量化校验列式上报的使用记录，不为每行构建Pydantic模型
+
+    返回:
+    - ([(序号, 记录)], 每行的错误, 总行数)
+
+    缺少必填列、列不是数组或长度不一致时抛出ValueError。
+    """
+    for name in COLUMNAR_REQUIRED:
+        if name not in columns:
+            raise ValueError(f"缺少列: {name}")
+    lengths = set()
+    for name in COLUMNAR_FIELDS:
+        if name in columns:
+            if not isinstance(columns[name], list):
+                raise ValueError(f"列{name}必须是数组")
+            lengths.add(len(columns[name]))
+    if len(lengths) != 1:
+        raise ValueError("各列长度必须一致")
+    n_rows = lengths.pop()
+
+    import numpy as np
+    import pandas as pd
+
+    def column(name: str) -> pd.Series:
+        return pd.Series(columns.get(name, [None] * n_rows), dtype=object)
+
+    validator = _ColumnValidator(n_rows)
+    device_ids = validator.integers(column("device_id"), "device_id")
+    user_ids = validator.integers(column("user_id"), "user_id")
+    start_times = validator.datetimes(column("start_time"), "start_time", required=True)
+    end_times = validator.datetimes(column("end_time"), "end_time", required=False)
+    operation_types = validator.strings(column("operation_type"), "operation_type", OPERATION_TYPE_MAX_LENGTH)
+    operation_values = validator.strings(column("operation_value"), "operation_value")
+
+    valid = np.flatnonzero(~validator.invalid)
+
+    def python_values(values) -> list:
+        # 整列转换为Python对象（datetime64转为datetime，NaT转为None），避免逐个元素经过pandas
+        values = np.asarray(values)[valid]
+        if values.dtype.kind == "M":
+            values = values.astype("datetime64[us]")
+        return values.astype(object).tolist()
+
+    records = [
+        (index, {
+            "device_id": device_id,
+            "user_id": user_id,
+            "start_time": start_time,
+            "end_time": end_time,
+            "operation_type": operation_type,
+            "operation_value": operation_value
+        })
+        for index, device_id, user_id, start_time, end_time, operation_type, operation_value in zip(
+            valid.tolist(),
+            device_ids.to_numpy()[valid].tolist(),
+            user_ids.to_numpy()[valid].tolist(),
+            python_values(start_times),
+            python_values(end_times),
+            python_values(operation_types),
+            python_values(operation_values)
+        )
+    ]
+    return records, validator.errors, n_rows
+
+def bulk_create_device_usages_columnar(db: Session, columns: Dict[str, list]) -> Dict[str, Any]:
+    """
+    批量写入列式上报的使用记录，校验后与bulk_create_device_usages相同地分批写入
+
+    返回值与bulk_create_device_usages相同。
+    """
+    records, errors, total = decode_usage_columns(columns)
+    usage_ids: Dict[int, int] = {}
+    for offset in range(0, len(records), BULK_BATCH_SIZE):
+        _write_batch(db, records[offset:offset + BULK_BATCH_SIZE], usage_ids, errors)
+    return _bulk_result(db, total, usage_ids, errors)
@@ -1,12 +1,23 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session, joinedload
+from ..models.device_usage import DeviceUsage, DeviceUsageHourly
 from ..models.devices import Device, DeviceCategory
 from ..schemas.devices import DeviceCreate, DeviceUpdate, DeviceCategoryCreate
+from ..utils import cache
+from ..utils.crud import delete_returning, update_returning
+from ..utils.pagination import Keyset
+from . import reference_data
+from .usage_rollup import bump_usage_watermark
 
+# 列表的分页排序键
+DEVICE_KEYSET = Keyset(Device.device_id)
+
+# 设备类别经进程内参考数据缓存读取，返回只读快照
 def get_device_category(db: Session, category_id: int):
-    return db.query(DeviceCategory).filter(DeviceCategory.category_id == category_id).first()
+    return reference_data.get_categories(db).get(category_id)
 
 def get_device_categories(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(DeviceCategory).offset(skip).limit(limit).all()
+    return list(reference_data.get_categories(db).values())[skip:skip + limit]
 
 def create_device_category(db: Session, category: DeviceCategoryCreate):
     db_category = DeviceCategory(
@@ -15,14 +26,32 @@ def create_device_category(db: Session, category: DeviceCategoryCreate):
     )
     db.add(db_category)
     db.commit()
+    reference_data.invalidate_categories()
     db.refresh(db_category)
     return db_category
 
 def get_device(db: Session, device_id: int):
-    return db.query(Device).filter(Device.device_id == device_id).first()
+    # 响应模型嵌套了category，需随设备一起加载，异步会话下不能在序列化时延迟加载
+    return (
+        db.query(Device)
+        .options(joinedload(Device.category))
+        .filter(Device.device_id == device_id)
+        .first()
+    )
+
+def get_cached_device(db: Session, device_id: int):
+    """只读查询使用的设备快照（经参考数据缓存），需要修改设备时使用get_device"""
+    return reference_data.get_device(db, device_id)
 
-def get_devices(db: Session, skip: int = 0, limit: int = 100, home_id: int = None, category_id: int = None):
-    query = db.query(Device)
+def get_devices(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    home_id: int = None,
+    category_id: int = None,
+    cursor: str = None
+):
+    query = db.query(Device).options(joinedload(Device.category))
     
     if home_id is not None:
         query = query.filter(Device.home_id == home_id)
@@ -30,7 +59,7 @@ def get_devices(db: Session, skip: int = 0, limit: int = 100, home_id: int = Non
     if category_id is not None:
         query = query.filter(Device.category_id == category_id)
     
-    return query.offset(skip).limit(limit).all()
+    return DEVICE_KEYSET.paginate(query, skip, limit, cursor).all()
 
 def create_device(db: Session, device: DeviceCreate):
     db_device = Device(
@@ -46,23 +75,44 @@ def create_device(db: Session, device: DeviceCreate):
         status=device.status
     )
     db.add(db_device)
+    db.flush()
+    device_id = db_device.device_id
     db.commit()
-    db.refresh(db_device)
-    return db_device
+    return get_device(db, device_id)
 
 def update_device(db: Session, device_id: int, device: DeviceUpdate):
-    db_device = get_device(db, device_id)
-    
+    """更新设备，设备不存在时返回None；响应中的类别取自参考数据缓存"""
     update_data = device.dict(exclude_unset=True)
-    
-    for key, value in update_data.items():
-        setattr(db_device, key, value)
-    
+    db_device = update_returning(db, Device, Device.device_id == device_id, update_data)
+    if db_device is None:
+        db.rollback()
+        return None
+    bump_usage_watermark(db)
     db.commit()
-    db.refresh(db_device)
-    return db_device
+    
+    reference_data.invalidate_device(device_id)
+    # 分析结果中包含设备名和类别名，安防事件统计按设备类别筛选；关联规则以设备名为项
+    cache.invalidate(cache.DEVICE_USAGE_TAG, cache.SECURITY_EVENTS_TAG)
+    return reference_data.device_snapshot(db, db_device)
+
+def delete_device(db: Session, device_id: int) -> bool:
+    """
+    删除设备，设备不存在时返回False
 
-def delete_device(db: Session, device_id: int):
-    db_device = get_device(db, device_id)
-    db.delete(db_device)
+    与原先ORM删除的行为一致，该设备使用记录的device_id置空；这些记录不再属于任何设备，
+    小时汇总中该设备的行一并删除。
+    """
+    orphaned_usages = (
+        update(DeviceUsage).where(DeviceUsage.device_id == device_id).values(device_id=None).cte("orphaned_usages")
+    )
+    hourly = delete(DeviceUsageHourly).where(DeviceUsageHourly.device_id == device_id).cte("deleted_hourly")
+    deleted = delete_returning(db, Device, Device.device_id == device_id, Device.device_id, ctes=[orphaned_usages, hourly])
+    if deleted is None:
+        db.rollback()
+        return False
+    bump_usage_watermark(db)
     db.commit()
+    
+    reference_data.invalidate_device(device_id)
+    cache.invalidate(cache.DEVICE_USAGE_TAG)
+    return True
@@ -1,8 +1,14 @@
 from sqlalchemy.orm import Session
 from ..models.feedback import Feedback
 from ..schemas.feedback import FeedbackCreate, FeedbackUpdate, FeedbackResponse
+from ..utils import cache
+from ..utils.crud import delete_returning, update_returning
+from ..utils.pagination import Keyset
 from datetime import datetime
 
+# 列表的分页排序键：按创建时间倒序，feedback_id区分同一时间的反馈
+FEEDBACK_KEYSET = Keyset(Feedback.created_at, Feedback.feedback_id, descending=True, nullable=True)
+
 def get_feedback(db: Session, feedback_id: int):
     return db.query(Feedback).filter(Feedback.feedback_id == feedback_id).first()
 
@@ -11,7 +17,8 @@ def get_feedbacks(
     skip: int = 0, 
     limit: int = 100, 
     user_id: int = None,
-    feedback_type: str = None
+    feedback_type: str = None,
+    cursor: str = None
 ):
     query = db.query(Feedback)
     
@@ -21,7 +28,7 @@ def get_feedbacks(
     if feedback_type is not None:
         query = query.filter(Feedback.feedback_type == feedback_type)
     
-    return query.order_by(Feedback.created_at.desc()).offset(skip).limit(limit).all()
+    return FEEDBACK_KEYSET.paginate(query, skip, limit, cursor).all()
 
 def create_feedback(db: Session, feedback: FeedbackCreate):
     db_feedback = Feedback(
@@ -32,34 +39,38 @@ def create_feedback(db: Session, feedback: FeedbackCreate):
     )
     db.add(db_feedback)
     db.commit()
+    cache.invalidate(cache.FEEDBACK_TAG)
     db.refresh(db_feedback)
     return db_feedback
 
 def update_feedback(db: Session, feedback_id: int, feedback: FeedbackUpdate):
-    db_feedback = get_feedback(db, feedback_id)
-    
+    """更新反馈，反馈不存在时返回None"""
     update_data = feedback.dict(exclude_unset=True)
-    
-    for key, value in update_data.items():
-        setattr(db_feedback, key, value)
-    
+    db_feedback = update_returning(db, Feedback, Feedback.feedback_id == feedback_id, update_data)
     db.commit()
-    db.refresh(db_feedback)
+    
+    if db_feedback is not None and update_data:
+        cache.invalidate(cache.FEEDBACK_TAG)
     return db_feedback
 
-def delete_feedback(db: Session, feedback_id: int):
-    db_feedback = get_feedback(db, feedback_id)
-    db.delete(db_feedback)
+def delete_feedback(db: Session, feedback_id: int) -> bool:
+    """删除反馈，反馈不存在时返回False"""
+    deleted = delete_returning(db, Feedback, Feedback.feedback_id == feedback_id, Feedback.feedback_id)
     db.commit()
+    if deleted is None:
+        return False
+    cache.invalidate(cache.FEEDBACK_TAG)
+    return True
 
 def respond_to_feedback(db: Session, feedback_id: int, response: FeedbackResponse):
-    """回复用户反馈"""
-    db_feedback = get_feedback(db, feedback_id)
-    
-    db_feedback.response = response.response
-    db_feedback.response_time = datetime.now()
-    db_feedback.responded = True
-    
+    """回复用户反馈，反馈不存在时返回None"""
+    db_feedback = update_returning(db, Feedback, Feedback.feedback_id == feedback_id, {
+        "response": response.response,
+        "response_time": datetime.now(),
+        "responded": True,
+    })
     db.commit()
-    db.refresh(db_feedback)
+    
+    if db_feedback is not None:
+        cache.invalidate(cache.FEEDBACK_TAG)
     return db_feedback
@@ -1,17 +1,26 @@
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from ..models.devices import Device
 from ..models.homes import Home
 from ..schemas.homes import HomeCreate, HomeUpdate
+from ..utils import cache
+from ..utils.crud import delete_returning, update_returning
+from ..utils.pagination import Keyset
+from . import reference_data
+
+# 列表的分页排序键
+HOME_KEYSET = Keyset(Home.home_id)
 
 def get_home(db: Session, home_id: int):
     return db.query(Home).filter(Home.home_id == home_id).first()
 
-def get_homes(db: Session, skip: int = 0, limit: int = 100, user_id: int = None):
+def get_homes(db: Session, skip: int = 0, limit: int = 100, user_id: int = None, cursor: str = None):
     query = db.query(Home)
     
     if user_id is not None:
         query = query.filter(Home.user_id == user_id)
     
-    return query.offset(skip).limit(limit).all()
+    return HOME_KEYSET.paginate(query, skip, limit, cursor).all()
 
 def create_home(db: Session, home: HomeCreate):
     db_home = Home(
@@ -23,22 +32,29 @@ def create_home(db: Session, home: HomeCreate):
     )
     db.add(db_home)
     db.commit()
+    # 安防事件统计包含没有事件的住宅
+    cache.invalidate(cache.SECURITY_EVENTS_TAG)
     db.refresh(db_home)
     return db_home
 
 def update_home(db: Session, home_id: int, home: HomeUpdate):
-    db_home = get_home(db, home_id)
-    
+    """更新住宅，住宅不存在时返回None"""
     update_data = home.dict(exclude_unset=True)
-    
-    for key, value in update_data.items():
-        setattr(db_home, key, value)
-    
+    db_home = update_returning(db, Home, Home.home_id == home_id, update_data)
     db.commit()
-    db.refresh(db_home)
+    if db_home is not None:
+        # 分析结果中包含住宅名称和面积
+        cache.invalidate(cache.DEVICE_USAGE_TAG, cache.SECURITY_EVENTS_TAG)
     return db_home
 
-def delete_home(db: Session, home_id: int):
-    db_home = get_home(db, home_id)
-    db.delete(db_home)
+def delete_home(db: Session, home_id: int) -> bool:
+    """删除住宅，其设备的home_id置空（与原先ORM删除的行为一致），住宅不存在时返回False"""
+    orphaned_devices = update(Device).where(Device.home_id == home_id).values(home_id=None).cte("orphaned_devices")
+    deleted = delete_returning(db, Home, Home.home_id == home_id, Home.home_id, ctes=[orphaned_devices])
     db.commit()
+    # 缓存的设备快照随之过时
+    reference_data.invalidate_device()
+    if deleted is not None:
+        # 该住宅设备的使用记录不再关联任何住宅
+        cache.invalidate(cache.DEVICE_USAGE_TAG, cache.SECURITY_EVENTS_TAG)
+    return deleted is not None
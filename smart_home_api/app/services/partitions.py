@@ -0,0 +1,149 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import List
+from ..database import SessionLocal
+from ..utils.scheduler import try_advisory_lock
+import logging
+import os
+import re
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# device_usage按start_time月度分区（见迁移0003）
+PARENT_TABLE = "device_usage"
+DEFAULT_PARTITION = "device_usage_default"
+PARTITION_NAME_PATTERN = re.compile(r"^device_usage_p(\d{4})(\d{2})$")
+
+# 提前创建的分区月数
+PARTITION_MONTHS_AHEAD = int(os.getenv("DEVICE_USAGE_PARTITION_MONTHS_AHEAD", "3"))
+# 保留的分区月数，更早的分区从父表分离并移入归档schema，0表示不归档
+PARTITION_RETAIN_MONTHS = int(os.getenv("DEVICE_USAGE_RETAIN_MONTHS", "0"))
+ARCHIVE_SCHEMA = os.getenv("DEVICE_USAGE_ARCHIVE_SCHEMA", "archive")
+# 分区维护任务的执行间隔（秒）
+PARTITION_MAINTENANCE_INTERVAL = int(os.getenv("PARTITION_MAINTENANCE_INTERVAL_SECONDS", "86400"))
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    """返回某月对应的分区表名"""
+    return f"{PARENT_TABLE}_p{month:%Y%m}"
+
+def is_partitioned(db: Session) -> bool:
+    """device_usage是否为分区表（非PostgreSQL或未执行迁移0003时为False）"""
+    if db.bind.dialect.name != "postgresql":
+        return False
+    return db.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = CAST(:table AS regclass))"),
+        {"table": PARENT_TABLE}
+    ).scalar()
+
+def get_device_usage_partitions(db: Session) -> List[date]:
+    """返回当前挂载在父表上的月度分区（按月份升序）"""
+    rows = db.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass)
+    """), {"table": PARENT_TABLE}).fetchall()
+
+    months = []
+    for row in rows:
+        match = PARTITION_NAME_PATTERN.match(row.relname)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+def create_device_usage_partition(db: Session, month: date):
+    """
+    创建某月的分区
+
+    DEFAULT分区中若已有该月的数据（例如分区创建前写入的未来时间），
+    先把这些行移到新表，再挂载为分区，否则ATTACH会失败。
+    """
+    name = partition_name(month)
+    lower = month.isoformat()
+    upper = _add_months(month, 1).isoformat()
+
+    db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE start_time >= :lower AND start_time < :upper
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"lower": lower, "upper": upper})
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+    logger.info(f"已创建分区{name}")
+
+def ensure_device_usage_partitions(db: Session, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """确保当前月份及之后months_ahead个月的分区存在，返回新建的分区名"""
+    existing = set(get_device_usage_partitions(db))
+    current_month = _month_start(date.today())
+
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(current_month, offset)
+        if month not in existing:
+            create_device_usage_partition(db, month)
+            created.append(partition_name(month))
+    return created
+
+def archive_old_device_usage_partitions(db: Session, retain_months: int = PARTITION_RETAIN_MONTHS) -> List[str]:
+    """
+    将超出保留期的分区从父表分离并移入归档schema
+
+    分离后的表仍完整保留数据，可直接查询、导出或重新挂载。返回归档的分区名。
+    """
+    if retain_months <= 0:
+        return []
+
+    cutoff = _add_months(_month_start(date.today()), -retain_months)
+    expired = [month for month in get_device_usage_partitions(db) if month < cutoff]
+    if not expired:
+        return []
+
+    db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    archived = []
+    for month in expired:
+        name = partition_name(month)
+        db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        db.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        archived.append(name)
+        logger.info(f"已归档分区{name}到{ARCHIVE_SCHEMA}")
+    return archived
+
+def maintain_device_usage_partitions(db: Session):
+    """创建未来分区并归档过期分区，多个worker同时执行时只有一个生效"""
+    if not is_partitioned(db):
+        return {"created": [], "archived": []}
+
+    if not try_advisory_lock(db, "device_usage_partition_maintenance"):
+        db.rollback()
+        return {"created": [], "archived": []}
+
+    created = ensure_device_usage_partitions(db)
+    archived = archive_old_device_usage_partitions(db)
+    db.commit()
+    return {"created": created, "archived": archived}
+
+def run_partition_maintenance():
+    """后台任务入口"""
+    db = SessionLocal()
+    try:
+        result = maintain_device_usage_partitions(db)
+        if result["created"] or result["archived"]:
+            logger.info(f"分区维护完成: {result}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_partition_maintenance()
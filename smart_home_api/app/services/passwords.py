@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Any, Dict, Optional
+
+import bcrypt
+from starlette.concurrency import run_in_threadpool
+
+from ..utils.process_pool import CancellingProcessPool
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# bcrypt的成本因子（2^rounds次迭代）。调整后，旧密码在用户下次带密码登录时自动按新成本重新哈希
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 计算密码哈希的进程数，0表示在线程池中计算（不启动子进程）
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# 正在计算和排队的哈希任务上限，超过时请求返回503，避免登录高峰时排队无限增长
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+class PasswordHashBusy(Exception):
+    """排队的密码哈希任务已达上限"""
+
+def hash_password(plain_password: str, rounds: Optional[int] = None) -> str:
+    """按rounds（默认BCRYPT_ROUNDS）计算密码哈希（同步，在调用方的线程或进程中执行）"""
+    return bcrypt.hashpw(plain_password.encode("utf-8"), bcrypt.gensalt(rounds or BCRYPT_ROUNDS)).decode("utf-8")
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    """校验密码（同步）"""
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+def needs_rehash(hashed_password: str) -> bool:
+    """哈希的成本因子与BCRYPT_ROUNDS不同时需要重新哈希"""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+_executor: Optional[CancellingProcessPool] = None
+_executor_lock = threading.Lock()
+_pending = 0
+_stats = {"completed": 0, "rejected": 0, "time_total_ms": 0.0}
+
+def _get_executor() -> CancellingProcessPool:
+    """按需创建进程池；使用spawn启动，子进程只导入本模块和bcrypt"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = CancellingProcessPool(max_workers=PASSWORD_HASH_WORKERS, mp_context=get_context("spawn"))
+        return _executor
+
+async def _run(fn, *args):
+    global _pending
+    with _executor_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            _stats["rejected"] += 1
+            raise PasswordHashBusy()
+        _pending += 1
+    started = time.perf_counter()
+    try:
+        if PASSWORD_HASH_WORKERS > 0:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+            except BrokenProcessPool:
+                # 工作进程异常退出后进程池不可再用，丢弃它，下一个请求重新创建
+                logger.error("密码哈希进程池已损坏，将重新创建")
+                shutdown_executor()
+                raise
+        return await run_in_threadpool(fn, *args)
+    finally:
+        with _executor_lock:
+            _pending -= 1
+            _stats["completed"] += 1
+            _stats["time_total_ms"] += (time.perf_counter() - started) * 1000
+
+async def hash_password_async(plain_password: str) -> str:
+    """在进程池中计算密码哈希，排队任务已满时抛出PasswordHashBusy"""
+    # 成本因子由主进程传入，子进程不依赖自己读取的配置
+    return await _run(hash_password, plain_password, BCRYPT_ROUNDS)
+
+async def check_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在进程池中校验密码，排队任务已满时抛出PasswordHashBusy"""
+    return await _run(check_password, plain_password, hashed_password)
+
+async def start():
+    """启动时预先创建工作进程，避免第一次登录等待子进程启动"""
+    if PASSWORD_HASH_WORKERS <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, bcrypt.gensalt) for _ in range(PASSWORD_HASH_WORKERS)))
+    logger.info(f"密码哈希进程池已启动，{PASSWORD_HASH_WORKERS}个进程，成本因子{BCRYPT_ROUNDS}")
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+def get_stats() -> Dict[str, Any]:
+    with _executor_lock:
+        completed = _stats["completed"]
+        return {
+            "rounds": BCRYPT_ROUNDS,
+            "workers": PASSWORD_HASH_WORKERS,
+            "pending": _pending,
+            "max_pending": PASSWORD_HASH_MAX_PENDING,
+            "completed": completed,
+            "rejected": _stats["rejected"],
+            "avg_ms": round(_stats["time_total_ms"] / completed, 3) if completed else 0.0,
+        }
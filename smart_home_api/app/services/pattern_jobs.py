@@ -0,0 +1,163 @@
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from typing import Any, Dict, Optional, Tuple
+from ..database import SessionLocal
+from ..models.pattern_jobs import PatternMiningJob
+from ..schemas.pattern_jobs import PatternJobCreate
+from ..utils.process_pool import CancellingProcessPool
+from .analytics import analyze_device_usage_patterns
+from .usage_rollup import get_usage_watermark
+import hashlib
+import json
+import logging
+import os
+import threading
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 执行挖掘任务的进程数
+PATTERN_JOB_WORKERS = int(os.getenv("PATTERN_JOB_WORKERS", "2"))
+# pending/running超过该时间（秒）的任务视为已丢失（例如进程重启），再次提交时重新执行
+PATTERN_JOB_TIMEOUT = int(os.getenv("PATTERN_JOB_TIMEOUT_SECONDS", "3600"))
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+def job_params_key(params: Dict[str, Any]) -> str:
+    """规范化参数的摘要，参数相同（与字段顺序无关）的提交得到相同的键"""
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def get_pattern_job(db: Session, job_id: int):
+    return db.query(PatternMiningJob).filter(PatternMiningJob.job_id == job_id).first()
+
+def _find_job(db: Session, params_key: str, watermark: int):
+    return db.query(PatternMiningJob).filter(
+        PatternMiningJob.params_key == params_key,
+        PatternMiningJob.data_watermark == watermark
+    ).first()
+
+def _is_expired(job: PatternMiningJob) -> bool:
+    if job.status not in (PENDING, RUNNING):
+        return False
+    since = job.started_at or job.created_at
+    return since is not None and since < datetime.now() - timedelta(seconds=PATTERN_JOB_TIMEOUT)
+
+def submit_pattern_job(db: Session, job_params: PatternJobCreate) -> Tuple[PatternMiningJob, bool]:
+    """
+    提交设备使用模式挖掘任务
+
+    以(参数, 数据版本)查找已有任务：已成功的直接返回结果，执行中的返回该任务，
+    失败或超时的重置为pending重新执行。并发提交相同参数时由唯一约束保证只创建一个任务。
+
+    返回:
+    - (任务, 是否需要调度执行)
+    """
+    params = job_params.model_dump(mode="json")
+    params_key = job_params_key(params)
+    watermark = get_usage_watermark(db)
+
+    job = _find_job(db, params_key, watermark)
+    if job is not None:
+        if job.status == FAILED or _is_expired(job):
+            # 只有一个并发请求能把任务重置为pending
+            reset = db.execute(
+                update(PatternMiningJob)
+                .where(PatternMiningJob.job_id == job.job_id, PatternMiningJob.status == job.status)
+                .values(status=PENDING, error=None, result=None, created_at=datetime.now(),
+                        started_at=None, finished_at=None)
+            )
+            db.commit()
+            db.refresh(job)
+            return job, reset.rowcount == 1
+        return job, False
+
+    stmt = pg_insert(PatternMiningJob).values(
+        params_key=params_key,
+        params=params,
+        data_watermark=watermark,
+        status=PENDING,
+        created_at=datetime.now()
+    ).on_conflict_do_nothing(constraint="uq_pattern_mining_jobs_params_watermark")
+    created = db.execute(stmt).rowcount == 1
+    db.commit()
+    return _find_job(db, params_key, watermark), created
+
+def execute_pattern_job(job_id: int):
+    """
+    执行挖掘任务（在子进程中运行）
+
+    先以条件更新把任务从pending改为running，保证同一任务只执行一次；
+    结果或错误信息写回任务表。
+    """
+    db = SessionLocal()
+    try:
+        claimed = db.execute(
+            update(PatternMiningJob)
+            .where(PatternMiningJob.job_id == job_id, PatternMiningJob.status == PENDING)
+            .values(status=RUNNING, started_at=datetime.now())
+        )
+        db.commit()
+        if claimed.rowcount != 1:
+            return
+
+        job = get_pattern_job(db, job_id)
+        params = PatternJobCreate(**job.params)
+        try:
+            result = analyze_device_usage_patterns(
+                db,
+                params.min_support,
+                start=params.start,
+                end=params.end,
+                home_id=params.home_id,
+                category_id=params.category_id,
+                user_id=params.user_id,
+                max_len=params.max_len,
+                min_confidence=params.min_confidence
+            )
+        except Exception as e:
+            logger.error(f"设备使用模式挖掘任务{job_id}出错: {str(e)}", exc_info=True)
+            db.rollback()
+            job.status = FAILED
+            job.error = str(e)
+        else:
+            job.status = SUCCEEDED
+            job.result = result
+        job.finished_at = datetime.now()
+        db.commit()
+    finally:
+        db.close()
+
+_executor: Optional[CancellingProcessPool] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> CancellingProcessPool:
+    """按需创建进程池；使用spawn启动，避免fork继承父进程的数据库连接和事件循环"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = CancellingProcessPool(max_workers=PATTERN_JOB_WORKERS, mp_context=get_context("spawn"))
+        return _executor
+
+def _log_failure(future):
+    # 关闭进程池时取消的任务没有异常可取
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"设备使用模式挖掘任务进程出错: {str(future.exception())}")
+
+def dispatch_pattern_job(job_id: int):
+    """把任务交给进程池执行，立即返回"""
+    _get_executor().submit(execute_pattern_job, job_id).add_done_callback(_log_failure)
+
+def shutdown_executor():
+    """关闭进程池，取消尚未开始的任务（其状态保持pending，超时后可重新提交）"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
@@ -0,0 +1,77 @@
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, joinedload
+from ..database import SessionLocal
+from ..models.devices import Device, DeviceCategory
+from ..schemas import devices as schemas
+from ..utils.reference_cache import ReferenceCache
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+import os
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 是否开启进程内参考数据缓存
+REFERENCE_CACHE_ENABLED = os.getenv("REFERENCE_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+# 缓存有效期（秒）。失效只作用于当前进程，多个worker时其他进程最多在有效期内读到旧数据
+REFERENCE_CACHE_CATEGORY_TTL = float(os.getenv("REFERENCE_CACHE_CATEGORY_TTL_SECONDS", "300"))
+REFERENCE_CACHE_DEVICE_TTL = float(os.getenv("REFERENCE_CACHE_DEVICE_TTL_SECONDS", "60"))
+# 按ID缓存的设备最多保存的条数
+REFERENCE_CACHE_MAX_DEVICES = int(os.getenv("REFERENCE_CACHE_MAX_DEVICES", "10000"))
+
+# 设备类别很少变化且数量有限，整表作为一个条目缓存
+_categories = ReferenceCache("device_categories", REFERENCE_CACHE_CATEGORY_TTL, enabled=REFERENCE_CACHE_ENABLED)
+_devices = ReferenceCache("devices", REFERENCE_CACHE_DEVICE_TTL, REFERENCE_CACHE_MAX_DEVICES, enabled=REFERENCE_CACHE_ENABLED)
+_ALL = "all"
+
+def _load_categories(db: Session) -> Dict[int, schemas.DeviceCategory]:
+    rows = db.query(DeviceCategory).order_by(DeviceCategory.category_id).all()
+    return {row.category_id: schemas.DeviceCategory.model_validate(row) for row in rows}
+
+def get_categories(db: Session) -> Dict[int, schemas.DeviceCategory]:
+    """按category_id排序的全部设备类别"""
+    return _categories.get(_ALL, lambda: _load_categories(db))
+
+def _load_devices(db: Session, device_ids: List[int]) -> Dict[int, schemas.Device]:
+    rows = db.query(Device).options(joinedload(Device.category)).filter(Device.device_id.in_(device_ids)).all()
+    return {row.device_id: schemas.Device.model_validate(row) for row in rows}
+
+def get_device(db: Session, device_id: int) -> Optional[schemas.Device]:
+    return get_devices(db, [device_id]).get(device_id)
+
+def get_devices(db: Session, device_ids: Iterable[int]) -> Dict[int, schemas.Device]:
+    """按ID读取设备，不存在的设备不在结果中"""
+    return _devices.get_many(device_ids, lambda missing: _load_devices(db, missing))
+
+def device_snapshot(db: Session, device: Device) -> schemas.Device:
+    """由设备的列值和缓存中的类别组成响应对象，不访问device.category"""
+    values = {attr.key: getattr(device, attr.key) for attr in inspect(Device).column_attrs}
+    values["category"] = get_categories(db).get(device.category_id)
+    return schemas.Device.model_validate(values)
+
+def invalidate_categories():
+    _categories.invalidate()
+
+def invalidate_device(device_id: Optional[int] = None):
+    _devices.invalidate(device_id)
+
+def warm():
+    """启动时预先加载设备类别，数据库暂不可用时跳过（之后按需加载）"""
+    if not REFERENCE_CACHE_ENABLED:
+        return
+    db = SessionLocal()
+    try:
+        logger.info(f"参考数据缓存已预热: 设备类别{len(get_categories(db))}个")
+    except Exception as e:
+        logger.warning(f"预热参考数据缓存出错: {str(e)}")
+    finally:
+        db.close()
+
+def get_stats() -> Dict[str, Any]:
+    if not REFERENCE_CACHE_ENABLED:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "device_categories": _categories.stats(),
+        "devices": _devices.stats(),
+    }
@@ -1,8 +1,14 @@
 from sqlalchemy.orm import Session
 from ..models.security_events import SecurityEvent
 from ..schemas.security_events import SecurityEventCreate, SecurityEventUpdate, SecurityEventResolution
+from ..utils import cache
+from ..utils.crud import delete_returning, update_returning
+from ..utils.pagination import Keyset
 from datetime import datetime
 
+# 列表的分页排序键：按事件时间倒序，event_id区分同一时间的事件
+SECURITY_EVENT_KEYSET = Keyset(SecurityEvent.event_time, SecurityEvent.event_id, descending=True, nullable=True)
+
 def get_security_event(db: Session, event_id: int):
     return db.query(SecurityEvent).filter(SecurityEvent.event_id == event_id).first()
 
@@ -12,7 +18,8 @@ def get_security_events(
     limit: int = 100, 
     home_id: int = None,
     event_type: str = None,
-    severity: str = None
+    severity: str = None,
+    cursor: str = None
 ):
     query = db.query(SecurityEvent)
     
@@ -25,7 +32,7 @@ def get_security_events(
     if severity is not None:
         query = query.filter(SecurityEvent.severity == severity)
     
-    return query.order_by(SecurityEvent.event_time.desc()).offset(skip).limit(limit).all()
+    return SECURITY_EVENT_KEYSET.paginate(query, skip, limit, cursor).all()
 
 def create_security_event(db: Session, security_event: SecurityEventCreate):
     db_security_event = SecurityEvent(
@@ -39,34 +46,46 @@ def create_security_event(db: Session, security_event: SecurityEventCreate):
     )
     db.add(db_security_event)
     db.commit()
+    cache.invalidate(cache.SECURITY_EVENTS_TAG)
     db.refresh(db_security_event)
     return db_security_event
 
 def update_security_event(db: Session, event_id: int, security_event: SecurityEventUpdate):
-    db_security_event = get_security_event(db, event_id)
-    
+    """更新安防事件，事件不存在时返回None"""
     update_data = security_event.dict(exclude_unset=True)
+    # 表中没有处理说明列，只在本次响应中返回
+    resolution_notes = update_data.pop("resolution_notes", None)
     
-    for key, value in update_data.items():
-        setattr(db_security_event, key, value)
-    
+    db_security_event = update_returning(db, SecurityEvent, SecurityEvent.event_id == event_id, update_data)
     db.commit()
-    db.refresh(db_security_event)
+    
+    if db_security_event is None:
+        return None
+    if update_data:
+        cache.invalidate(cache.SECURITY_EVENTS_TAG)
+    if resolution_notes is not None:
+        db_security_event.resolution_notes = resolution_notes
     return db_security_event
 
-def delete_security_event(db: Session, event_id: int):
-    db_security_event = get_security_event(db, event_id)
-    db.delete(db_security_event)
+def delete_security_event(db: Session, event_id: int) -> bool:
+    """删除安防事件，事件不存在时返回False"""
+    deleted = delete_returning(db, SecurityEvent, SecurityEvent.event_id == event_id, SecurityEvent.event_id)
     db.commit()
+    if deleted is None:
+        return False
+    cache.invalidate(cache.SECURITY_EVENTS_TAG)
+    return True
 
 def resolve_security_event(db: Session, event_id: int, resolution: SecurityEventResolution):
-    """解决安防事件"""
-    db_security_event = get_security_event(db, event_id)
+    """解决安防事件，事件不存在时返回None"""
+    db_security_event = update_returning(db, SecurityEvent, SecurityEvent.event_id == event_id, {
+        "resolved": True,
+        "resolution_time": datetime.now(),
+    })
+    db.commit()
     
-    db_security_event.resolved = True
-    db_security_event.resolution_time = datetime.now()
+    if db_security_event is None:
+        return None
+    cache.invalidate(cache.SECURITY_EVENTS_TAG)
     db_security_event.resolution_notes = resolution.resolution_notes
-    
-    db.commit()
-    db.refresh(db_security_event)
     return db_security_event
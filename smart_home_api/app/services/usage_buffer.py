@@ -0,0 +1,357 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import DBAPIError, OperationalError
+from starlette.concurrency import run_in_threadpool
+
+from ..database import SessionLocal
+from ..schemas.device_usage import DeviceUsageCreate
+from .device_usage import bulk_create_device_usages
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 是否开启写后缓冲：POST /api/device-usage/先写入队列并返回202，由后台任务批量写入数据库
+WRITE_BEHIND_ENABLED = os.getenv("DEVICE_USAGE_WRITE_BEHIND", "false").strip().lower() in ("1", "true", "yes", "on")
+# 队列容量（已接收但尚未提交的记录数上限），满时新请求最多等待WRITE_BEHIND_ENQUEUE_TIMEOUT后返回503
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+WRITE_BEHIND_ENQUEUE_TIMEOUT = float(os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT_MS", "1000")) / 1000
+# 攒够多少条或第一条记录等待多久（毫秒）后写入一批
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", "200")) / 1000
+# 溢出文件目录：记录在确认前先追加到这里，进程崩溃后下次启动时重新写入
+WRITE_BEHIND_SPILL_DIR = os.getenv("WRITE_BEHIND_SPILL_DIR", "write_behind_spill")
+# 每条记录写入溢出文件后是否fsync（可防止断电丢失，但会明显降低吞吐量）
+WRITE_BEHIND_FSYNC = os.getenv("WRITE_BEHIND_FSYNC", "false").strip().lower() in ("1", "true", "yes", "on")
+# 关闭时等待队列写完的最长时间（秒），超时未写入的记录保留在溢出文件中
+WRITE_BEHIND_SHUTDOWN_TIMEOUT = float(os.getenv("WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+# 无法写入数据库的记录（非连接类错误，重试也不会成功）追加到这里，不再重试
+WRITE_BEHIND_DEAD_LETTER_FILE = os.path.join(WRITE_BEHIND_SPILL_DIR, "dead_letter.jsonl")
+
+class QueueFull(Exception):
+    """写后缓冲队列已满"""
+
+class _SpillSegment:
+    """
+    溢出文件的一个分段
+
+    持有文件锁直到分段中的记录全部提交，其他进程启动恢复时会跳过仍被持有的分段。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.lock = threading.Lock()
+        self.written = 0
+        self.pending = 0
+        self.sealed = False
+
+    def reserve(self):
+        """在事件循环中为一条记录计数，之后在线程中调用write写入"""
+        self.written += 1
+        self.pending += 1
+
+    def write(self, line: str):
+        # 在线程池中执行，多个请求可能同时写入同一分段
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+        if WRITE_BEHIND_FSYNC:
+            os.fsync(self.file.fileno())
+
+    def remove(self):
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def _write_events(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return bulk_create_device_usages(db, list(enumerate(events)))
+    finally:
+        db.close()
+
+def _is_transient(error: Exception) -> bool:
+    """数据库不可用、连接中断等稍后重试可能成功的错误"""
+    return isinstance(error, OperationalError) or (isinstance(error, DBAPIError) and error.connection_invalidated)
+
+def _write_dead_letter(event: Dict[str, Any], error: Exception):
+    with open(WRITE_BEHIND_DEAD_LETTER_FILE, "a", encoding="utf-8") as file:
+        file.write(json.dumps({"event": event, "error": repr(error), "at": time.time()}, ensure_ascii=False) + "\n")
+
+class WriteBehindBuffer:
+    """
+    设备使用记录的写后缓冲
+
+    记录先追加到溢出文件再放入队列，随即向客户端确认；后台任务按数量或时间攒批，
+    通过bulk_create_device_usages写入数据库，提交后才释放队列容量并删除对应的溢出分段。
+    因此进程崩溃不会丢失已确认的记录，但提交后、删除分段前崩溃时，恢复会重复写入这些记录。
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._segment: Optional[_SpillSegment] = None
+        self._segment_seq = 0
+        self._segments: Dict[str, _SpillSegment] = {}
+        self._in_flight = 0
+        self._flushed_events = 0
+        self._stats = {
+            "enqueued": 0,
+            "rejected": 0,
+            "flushed": 0,
+            "failed": 0,
+            "flush_count": 0,
+            "flush_errors": 0,
+            "dead_lettered": 0,
+            "flush_time_total_ms": 0.0,
+            "last_flush_ms": 0.0,
+            "last_flush_at": None,
+            "recovered": 0,
+        }
+
+    async def start(self):
+        os.makedirs(WRITE_BEHIND_SPILL_DIR, exist_ok=True)
+        # 在创建本进程的分段之前列出遗留分段；恢复在后台任务中进行，数据库不可用时不阻止服务启动
+        leftover = sorted(glob.glob(os.path.join(WRITE_BEHIND_SPILL_DIR, "*.ndjson")))
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(WRITE_BEHIND_QUEUE_SIZE)
+        self._task = asyncio.create_task(self._run(leftover), name="write_behind_flush")
+        logger.info(f"写后缓冲已启动，容量{WRITE_BEHIND_QUEUE_SIZE}，每批{WRITE_BEHIND_BATCH_SIZE}条")
+
+    async def stop(self):
+        """写完队列中剩余的记录后停止，超时则取消，未写入的记录留在溢出文件中"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self._task, WRITE_BEHIND_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"写后缓冲关闭超时，{self._queue.qsize()}条记录保留在溢出文件中")
+        self._task = None
+        for segment in list(self._segments.values()):
+            segment.sealed = True
+            if segment.pending == 0:
+                self._release_segment(segment)
+            else:
+                segment.file.close()
+        self._segments.clear()
+        self._segment = None
+
+    async def enqueue(self, device_usage: DeviceUsageCreate) -> int:
+        """
+        接收一条记录，返回当前队列深度
+
+        队列已满时最多等待WRITE_BEHIND_ENQUEUE_TIMEOUT，仍无空位则抛出QueueFull。
+        """
+        try:
+            await asyncio.wait_for(self._slots.acquire(), WRITE_BEHIND_ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise QueueFull()
+        event = device_usage.model_dump(mode="json")
+        try:
+            segment = self._current_segment()
+        except Exception:
+            self._slots.release()
+            raise
+        # 先在事件循环中计数，写入期间分段不会被轮换出去或删除
+        segment.reserve()
+        try:
+            # 写入和fsync在线程池中执行，不阻塞事件循环
+            await run_in_threadpool(segment.write, json.dumps(event, ensure_ascii=False) + "\n")
+        except Exception:
+            segment.pending -= 1
+            self._release_segment(segment)
+            self._slots.release()
+            raise
+        self._queue.put_nowait((segment, event))
+        self._in_flight += 1
+        self._stats["enqueued"] += 1
+        return self._queue.qsize()
+
+    def _current_segment(self) -> _SpillSegment:
+        if self._segment is None or self._segment.written >= WRITE_BEHIND_BATCH_SIZE:
+            if self._segment is not None:
+                self._segment.sealed = True
+                self._release_segment(self._segment)
+            self._segment_seq += 1
+            path = os.path.join(
+                WRITE_BEHIND_SPILL_DIR, f"{os.getpid()}-{int(time.time() * 1000)}-{self._segment_seq}.ndjson"
+            )
+            self._segment = _SpillSegment(path)
+            self._segments[path] = self._segment
+        return self._segment
+
+    def _release_segment(self, segment: _SpillSegment):
+        # 已封闭且记录全部提交的分段可以删除
+        if segment.sealed and segment.pending == 0:
+            segment.remove()
+            self._segments.pop(segment.path, None)
+
+    async def _run(self, leftover: List[str]):
+        await self._recover(leftover)
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + WRITE_BEHIND_FLUSH_INTERVAL
+            while len(batch) < WRITE_BEHIND_BATCH_SIZE:
+                try:
+                    if self._queue.empty():
+                        item = await asyncio.wait_for(self._queue.get(), max(deadline - loop.time(), 0))
+                    else:
+                        item = self._queue.get_nowait()
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[_SpillSegment, Dict[str, Any]]]):
+        """写入一批记录并释放其队列容量和溢出分段"""
+        events = [event for _, event in batch]
+        started = time.perf_counter()
+        inserted, failed = await self._write_isolating(events)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._flushed_events += len(batch)
+        self._stats["flush_count"] += 1
+        self._stats["flushed"] += inserted
+        self._stats["failed"] += failed
+        self._stats["flush_time_total_ms"] += elapsed_ms
+        self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+        self._stats["last_flush_at"] = time.time()
+
+        for segment, _ in batch:
+            segment.pending -= 1
+        for segment in {segment for segment, _ in batch}:
+            self._release_segment(segment)
+        for _ in batch:
+            self._slots.release()
+        self._in_flight -= len(batch)
+
+    async def _write_with_retry(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """写入记录，数据库不可用时退避重试直到成功；其他错误直接抛出"""
+        retry_delay = 0.5
+        while True:
+            try:
+                return await run_in_threadpool(_write_events, events)
+            except Exception as e:
+                if not _is_transient(e):
+                    raise
+                self._stats["flush_errors"] += 1
+                logger.error(f"写后缓冲写入数据库出错，{retry_delay}秒后重试: {str(e)}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30)
+
+    async def _write_isolating(self, events: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        写入记录，返回(写入数, 失败数)
+
+        整批出现非连接类错误时对半拆分重试，找出出错的记录写入死信文件，
+        不让一条无法写入的记录一直占住队列。
+        """
+        try:
+            result = await self._write_with_retry(events)
+        except Exception as e:
+            if len(events) > 1:
+                middle = len(events) // 2
+                first = await self._write_isolating(events[:middle])
+                second = await self._write_isolating(events[middle:])
+                return first[0] + second[0], first[1] + second[1]
+            logger.error(f"写后缓冲无法写入记录{events[0]}，已移入死信文件: {str(e)}")
+            self._stats["dead_lettered"] += 1
+            try:
+                await run_in_threadpool(_write_dead_letter, events[0], e)
+            except OSError as write_error:
+                logger.error(f"写入死信文件出错: {str(write_error)}")
+            return 0, 1
+
+        for error in result["errors"]:
+            # 字段已在接收时校验，这里的错误通常是设备或用户不存在
+            logger.warning(f"写后缓冲丢弃记录{events[error['index']]}: {error['detail']}")
+        return result["inserted"], result["failed"]
+
+    async def _recover(self, paths: List[str]):
+        """
+        写入上次崩溃遗留的溢出分段，跳过其他存活进程仍持有的分段
+
+        与队列中的记录一样，数据库不可用时退避重试，无法写入的记录移入死信文件；
+        恢复完成后才开始写入队列中的新记录。
+        """
+        for path in paths:
+            try:
+                file = open(path, "r+", encoding="utf-8")
+            except FileNotFoundError:
+                # 其他进程已恢复并删除
+                continue
+            with file:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                events = []
+                for line in file:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        # 崩溃时写了一半的最后一行
+                        logger.warning(f"跳过溢出文件{path}中无法解析的行")
+                for offset in range(0, len(events), WRITE_BEHIND_BATCH_SIZE):
+                    inserted, failed = await self._write_isolating(events[offset:offset + WRITE_BEHIND_BATCH_SIZE])
+                    self._stats["recovered"] += inserted
+                    self._stats["failed"] += failed
+            os.remove(path)
+            logger.info(f"已从溢出文件{path}恢复{len(events)}条记录")
+
+    def stats(self) -> Dict[str, Any]:
+        flush_count = self._stats["flush_count"]
+        return {
+            "enabled": True,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "capacity": WRITE_BEHIND_QUEUE_SIZE,
+            "in_flight": self._in_flight,
+            "spill_segments": len(self._segments),
+            "avg_flush_ms": round(self._stats["flush_time_total_ms"] / flush_count, 3) if flush_count else 0.0,
+            "avg_batch_size": round(self._flushed_events / flush_count, 1) if flush_count else 0.0,
+            **{key: value for key, value in self._stats.items() if key != "flush_time_total_ms"},
+        }
+
+_buffer = WriteBehindBuffer()
+
+async def start():
+    await _buffer.start()
+
+async def stop():
+    await _buffer.stop()
+
+async def enqueue(device_usage: DeviceUsageCreate) -> int:
+    return await _buffer.enqueue(device_usage)
+
+def get_stats() -> Dict[str, Any]:
+    if not WRITE_BEHIND_ENABLED:
+        return {"enabled": False}
+    return _buffer.stats()
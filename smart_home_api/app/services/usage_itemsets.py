@@ -0,0 +1,199 @@
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import combinations
+from typing import TYPE_CHECKING, Optional, Tuple
+from ..database import SessionLocal
+from ..models.usage_itemsets import UsageItemsetCount, UsageItemsetState
+from ..utils import cache
+from ..utils.scheduler import try_advisory_lock
+import logging
+import math
+import os
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 计数的最大项集长度，修改后下次刷新时自动全量重算
+ITEMSET_COUNT_MAX_LEN = int(os.getenv("ITEMSET_COUNT_MAX_LEN", "3"))
+# 时间窗口结束后等待多久（秒）再计入，给迟到的使用记录留出时间
+ITEMSET_COUNT_GRACE_SECONDS = int(os.getenv("ITEMSET_COUNT_GRACE_SECONDS", "900"))
+# 后台增量刷新的间隔（秒）
+ITEMSET_COUNT_REFRESH_INTERVAL = int(os.getenv("ITEMSET_COUNT_REFRESH_INTERVAL_SECONDS", "900"))
+# 每批写入的项集数
+ITEMSET_COUNT_BATCH_SIZE = 5000
+
+# 购物篮时间窗口的长度（分钟），同一用户在同一窗口内使用过的设备视为一个购物篮
+BASKET_WINDOW_MINUTES = 15
+_STATE_ID = 1
+
+def basket_window_sql(column: str) -> str:
+    """把时间列截断到所在购物篮窗口起点的SQL表达式"""
+    return (
+        f"date_trunc('hour', {column}) + floor(EXTRACT(MINUTE FROM {column}) / {BASKET_WINDOW_MINUTES})"
+        f" * INTERVAL '{BASKET_WINDOW_MINUTES} minutes'"
+    )
+
+def basket_window(value: datetime) -> datetime:
+    """把时间截断到所在购物篮窗口的起点"""
+    return value.replace(minute=value.minute // BASKET_WINDOW_MINUTES * BASKET_WINDOW_MINUTES, second=0, microsecond=0)
+
+def _get_state(db: Session) -> UsageItemsetState:
+    state = db.get(UsageItemsetState, _STATE_ID)
+    if state is None:
+        state = UsageItemsetState(state_id=_STATE_ID, basket_count=0, usage_count=0, max_len=ITEMSET_COUNT_MAX_LEN)
+        db.add(state)
+    return state
+
+def _reset(db: Session, state: UsageItemsetState):
+    db.execute(delete(UsageItemsetCount))
+    state.counted_until = None
+    state.basket_count = 0
+    state.usage_count = 0
+    state.max_len = ITEMSET_COUNT_MAX_LEN
+
+def _upsert_counts(db: Session, counts: Counter):
+    # 按主键排序分批写入
+    itemsets = sorted(counts)
+    for offset in range(0, len(itemsets), ITEMSET_COUNT_BATCH_SIZE):
+        values = [
+            {"itemset": list(itemset), "length": len(itemset), "basket_count": counts[itemset]}
+            for itemset in itemsets[offset:offset + ITEMSET_COUNT_BATCH_SIZE]
+        ]
+        stmt = pg_insert(UsageItemsetCount).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UsageItemsetCount.itemset],
+            set_={"basket_count": UsageItemsetCount.basket_count + stmt.excluded.basket_count}
+        )
+        db.execute(stmt)
+
+def refresh_itemset_counts(db: Session, rebuild: bool = False) -> bool:
+    """
+    把新结束的时间窗口中的购物篮计入项集计数
+
+    只读取counted_until之后、已超过等待时间的窗口，耗时与新增数据量成正比。
+    每个购物篮的所有长度不超过ITEMSET_COUNT_MAX_LEN的子集各计一次。
+    rebuild为True或计数上限变化时清空后全量重算；多个worker同时执行时只有一个生效。
+    等待时间之后才写入已计入窗口的记录，以及对已有记录的修改和删除，需全量重算才能反映。
+
+    返回:
+    - 是否执行了刷新
+    """
+    if db.bind.dialect.name != "postgresql":
+        return False
+
+    if not try_advisory_lock(db, "usage_itemset_counts"):
+        db.rollback()
+        return False
+
+    state = _get_state(db)
+    if rebuild or state.max_len != ITEMSET_COUNT_MAX_LEN:
+        _reset(db, state)
+
+    cutoff = basket_window(datetime.now() - timedelta(seconds=ITEMSET_COUNT_GRACE_SECONDS))
+    if state.counted_until is not None and state.counted_until >= cutoff:
+        db.commit()
+        return False
+
+    params = {"cutoff": cutoff}
+    since = ""
+    if state.counted_until is not None:
+        since = " AND du.start_time >= :since"
+        params["since"] = state.counted_until
+    window = basket_window_sql("du.start_time")
+
+    usage_count = db.execute(text(f"""
+        SELECT COUNT(*)
+        FROM device_usage du
+        JOIN devices d ON du.device_id = d.device_id
+        WHERE du.start_time < :cutoff{since}
+    """), params).scalar()
+
+    baskets = db.execute(
+        text(f"""
+            SELECT array_agg(DISTINCT d.device_name ORDER BY d.device_name) AS items
+            FROM device_usage du
+            JOIN devices d ON du.device_id = d.device_id
+            WHERE du.user_id IS NOT NULL AND du.start_time < :cutoff{since}
+            GROUP BY du.user_id, {window}
+        """).execution_options(yield_per=ITEMSET_COUNT_BATCH_SIZE),
+        params
+    )
+    counts = Counter()
+    basket_count = 0
+    for row in baskets:
+        basket_count += 1
+        items = row.items
+        for length in range(1, min(len(items), ITEMSET_COUNT_MAX_LEN) + 1):
+            counts.update(combinations(items, length))
+
+    _upsert_counts(db, counts)
+    state.counted_until = cutoff
+    state.basket_count += basket_count
+    state.usage_count += usage_count
+    state.updated_at = datetime.now()
+    db.commit()
+    logger.info(f"项集计数已更新至{cutoff}: 新增购物篮{basket_count}个，项集{len(counts)}个")
+    return True
+
+def load_frequent_itemsets(
+    db: Session,
+    min_support: float,
+    max_len: Optional[int] = None
+) -> Tuple[Optional[UsageItemsetState], "pd.DataFrame"]:
+    """
+    从项集计数中取出频繁项集
+
+    支持度的计算和比较方式与app.utils.itemsets中的算法一致（count / n >= min_support），
+    max_len不能超过计数时的上限。
+
+    返回:
+    - (计数进度，尚未计数时为None, 包含support和itemsets两列的DataFrame)
+    """
+    import pandas as pd
+
+    state = db.get(UsageItemsetState, _STATE_ID)
+    if state is None or state.basket_count == 0:
+        return state, pd.DataFrame(columns=["support", "itemsets"])
+
+    n_baskets = state.basket_count
+    max_len = min(max_len or state.max_len, state.max_len)
+    rows = db.execute(text("""
+        SELECT itemset, basket_count
+        FROM usage_itemset_counts
+        WHERE length <= :max_len AND basket_count >= :min_count
+    """), {"max_len": max_len, "min_count": math.floor(min_support * n_baskets)}).all()
+
+    frequent = [
+        (frozenset(row.itemset), row.basket_count / n_baskets)
+        for row in rows
+        if row.basket_count / n_baskets >= min_support
+    ]
+    return state, pd.DataFrame(
+        {"support": [support for _, support in frequent], "itemsets": [itemset for itemset, _ in frequent]},
+        columns=["support", "itemsets"]
+    )
+
+def run_itemset_count_refresh():
+    """后台任务入口；增量模式的请求只读取计数，刷新后使缓存的分析结果失效"""
+    db = SessionLocal()
+    try:
+        if refresh_itemset_counts(db):
+            cache.invalidate(cache.DEVICE_USAGE_TAG)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # 手动全量重算：python -m app.services.usage_itemsets
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        if refresh_itemset_counts(db, rebuild=True):
+            cache.invalidate(cache.DEVICE_USAGE_TAG)
+    finally:
+        db.close()
@@ -0,0 +1,175 @@
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
+from ..database import SessionLocal
+from ..models.device_usage import DeviceUsageHourly
+from ..utils.scheduler import try_advisory_lock
+import logging
+import os
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 压实任务每次重算最近多少小时的汇总，用于修正绕过服务层直接写入device_usage造成的偏差
+ROLLUP_COMPACTION_LOOKBACK_HOURS = int(os.getenv("USAGE_ROLLUP_COMPACTION_LOOKBACK_HOURS", "48"))
+# 压实任务的执行间隔（秒）
+ROLLUP_COMPACTION_INTERVAL = int(os.getenv("USAGE_ROLLUP_COMPACTION_INTERVAL_SECONDS", "3600"))
+
+# 写入事务递增数据版本时持有该咨询锁的共享模式，读取版本号时以独占模式等待这些事务结束
+USAGE_WATERMARK_LOCK = "device_usage_watermark"
+
+# (device_id, start_time, end_time)
+UsageKey = Tuple[Optional[int], datetime, Optional[datetime]]
+
+def hour_bucket(value: datetime) -> datetime:
+    """将时间截断到整点"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def is_hour_aligned(value: Optional[datetime]) -> bool:
+    """时间是否为整点（为空视为对齐），整点范围可以直接用汇总表精确回答"""
+    return value is None or value == hour_bucket(value)
+
+def usage_key(db_device_usage) -> UsageKey:
+    """提取一条使用记录中影响汇总的字段"""
+    return (db_device_usage.device_id, db_device_usage.start_time, db_device_usage.end_time)
+
+def apply_usage_delta(db: Session, added: Iterable[UsageKey] = (), removed: Iterable[UsageKey] = ()):
+    """
+    把使用记录的增删累加到device_usage_hourly
+
+    在调用方的事务中执行，与device_usage的写入一起提交或回滚。
+    同一批次内按(device_id, bucket)先合并，再用一条INSERT ... ON CONFLICT完成累加。
+    """
+    deltas = {}
+    for sign, rows in ((1, added), (-1, removed)):
+        for device_id, start_time, end_time in rows:
+            if device_id is None or start_time is None:
+                continue
+            key = (device_id, hour_bucket(start_time))
+            usage_count, completed_count, total_seconds = deltas.get(key, (0, 0, 0.0))
+            usage_count += sign
+            if end_time is not None:
+                completed_count += sign
+                total_seconds += sign * (end_time - start_time).total_seconds()
+            deltas[key] = (usage_count, completed_count, total_seconds)
+
+    # 按主键排序，避免并发批次交叉加锁导致死锁
+    values = [
+        {
+            "device_id": device_id,
+            "bucket": bucket,
+            "usage_count": usage_count,
+            "completed_count": completed_count,
+            "total_seconds": total_seconds
+        }
+        for (device_id, bucket), (usage_count, completed_count, total_seconds) in sorted(deltas.items())
+        if usage_count or completed_count or total_seconds
+    ]
+    if not values:
+        return
+
+    stmt = pg_insert(DeviceUsageHourly).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DeviceUsageHourly.device_id, DeviceUsageHourly.bucket],
+        set_={
+            "usage_count": DeviceUsageHourly.usage_count + stmt.excluded.usage_count,
+            "completed_count": DeviceUsageHourly.completed_count + stmt.excluded.completed_count,
+            "total_seconds": DeviceUsageHourly.total_seconds + stmt.excluded.total_seconds
+        }
+    )
+    db.execute(stmt)
+
+def get_usage_watermark(db: Session) -> int:
+    """
+    返回device_usage当前的数据版本号
+
+    每次通过服务层写入使用记录后版本号递增（见bump_usage_watermark），
+    用于判断已保存的分析结果是否基于最新数据。非PostgreSQL数据库始终为0。
+    """
+    if db.bind.dialect.name != "postgresql":
+        return 0
+    # 已递增版本号但尚未提交的写入事务持有共享锁，等它们结束后再读取，
+    # 避免读到新版本号时数据仍是旧的
+    db.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {"name": USAGE_WATERMARK_LOCK})
+    try:
+        row = db.execute(text("SELECT last_value, is_called FROM device_usage_version_seq")).first()
+    finally:
+        db.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": USAGE_WATERMARK_LOCK})
+    return int(row.last_value) if row.is_called else 0
+
+def bump_usage_watermark(db: Session):
+    """
+    在写入事务中递增device_usage的数据版本号，须在db.commit()之前调用
+
+    与数据在同一事务中递增，进程在提交后退出也不会漏掉版本号。事务持有共享咨询锁直到结束，
+    get_usage_watermark等待其提交后才读取；序列不随事务回滚，回滚只会多出一个版本号，
+    最多让相同参数的任务重新执行一次。
+    """
+    if db.bind.dialect.name != "postgresql":
+        return
+    db.execute(text("SELECT pg_advisory_xact_lock_shared(hashtext(:name))"), {"name": USAGE_WATERMARK_LOCK})
+    db.execute(text("SELECT nextval('device_usage_version_seq')"))
+
+def rebuild_hourly_rollup(db: Session, since: Optional[datetime] = None):
+    """
+    从device_usage重算since之后（为空则全部）的小时汇总
+
+    先删除范围内的汇总行再按原始数据重新插入。与增量写入并发时，
+    ON CONFLICT以重算结果覆盖，被删除行上等待的增量会在新行上继续累加。
+    """
+    since = hour_bucket(since) if since is not None else None
+    params = {}
+    bucket_range = usage_range = ""
+    if since is not None:
+        bucket_range = " AND bucket >= :since"
+        usage_range = " AND start_time >= :since"
+        params["since"] = since
+
+    db.execute(text(f"DELETE FROM device_usage_hourly WHERE 1 = 1{bucket_range}"), params)
+    db.execute(text(f"""
+        INSERT INTO device_usage_hourly (device_id, bucket, usage_count, completed_count, total_seconds)
+        SELECT
+            device_id,
+            date_trunc('hour', start_time) AS bucket,
+            COUNT(*),
+            COUNT(end_time),
+            COALESCE(SUM(EXTRACT(EPOCH FROM (end_time - start_time))), 0)
+        FROM device_usage
+        WHERE device_id IS NOT NULL{usage_range}
+        GROUP BY device_id, date_trunc('hour', start_time)
+        ON CONFLICT (device_id, bucket) DO UPDATE SET
+            usage_count = EXCLUDED.usage_count,
+            completed_count = EXCLUDED.completed_count,
+            total_seconds = EXCLUDED.total_seconds
+    """), params)
+
+def compact_hourly_rollup(db: Session, lookback_hours: int = ROLLUP_COMPACTION_LOOKBACK_HOURS) -> bool:
+    """重算最近lookback_hours小时的汇总，多个worker同时执行时只有一个生效"""
+    if not try_advisory_lock(db, "device_usage_hourly_compaction"):
+        db.rollback()
+        return False
+
+    rebuild_hourly_rollup(db, datetime.now() - timedelta(hours=lookback_hours))
+    db.commit()
+    return True
+
+def run_rollup_compaction():
+    """后台任务入口"""
+    db = SessionLocal()
+    try:
+        compact_hourly_rollup(db)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # 手动全量重建：python -m app.services.usage_rollup
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        rebuild_hourly_rollup(db)
+        db.commit()
+        logger.info("device_usage_hourly已全量重建")
+    finally:
+        db.close()
@@ -1,8 +1,16 @@
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from ..models.homes import Home
 from ..models.users import User
 from ..schemas.users import UserCreate, UserUpdate
+from ..utils.crud import delete_returning, update_returning
+from ..utils.pagination import Keyset
+from ..utils.security import revoke_user
+from .passwords import check_password, hash_password
 from datetime import datetime
-import bcrypt
+
+# 列表的分页排序键
+USER_KEYSET = Keyset(User.user_id)
 
 def get_user(db: Session, user_id: int):
     return db.query(User).filter(User.user_id == user_id).first()
@@ -10,15 +18,15 @@ def get_user(db: Session, user_id: int):
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: str = None):
+    return USER_KEYSET.paginate(db.query(User), skip, limit, cursor).all()
 
-def create_user(db: Session, user: UserCreate):
-    hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt())
+def create_user(db: Session, user: UserCreate, password_hash: str = None):
+    """创建用户；password_hash为路由在进程池中算好的哈希，未提供时在当前线程计算"""
     db_user = User(
         username=user.username,
         email=user.email,
-        password_hash=hashed_password.decode('utf-8'),
+        password_hash=password_hash or hash_password(user.password),
         phone=user.phone
     )
     db.add(db_user)
@@ -26,34 +34,40 @@ def create_user(db: Session, user: UserCreate):
     db.refresh(db_user)
     return db_user
 
-def update_user(db: Session, user_id: int, user: UserUpdate):
-    db_user = get_user(db, user_id)
-    
+def update_user(db: Session, user_id: int, user: UserUpdate, password_hash: str = None):
+    """更新用户，用户不存在时返回None；password_hash的含义同create_user"""
     update_data = user.dict(exclude_unset=True)
     
     if "password" in update_data:
-        hashed_password = bcrypt.hashpw(update_data["password"].encode('utf-8'), bcrypt.gensalt())
-        update_data["password_hash"] = hashed_password.decode('utf-8')
+        update_data["password_hash"] = password_hash or hash_password(update_data["password"])
         del update_data["password"]
     
-    for key, value in update_data.items():
-        setattr(db_user, key, value)
-    
+    db_user = update_returning(db, User, User.user_id == user_id, update_data)
     db.commit()
-    db.refresh(db_user)
+    if db_user is not None:
+        revoke_user(user_id)
     return db_user
 
-def delete_user(db: Session, user_id: int):
-    db_user = get_user(db, user_id)
-    db.delete(db_user)
+def delete_user(db: Session, user_id: int) -> bool:
+    """删除用户，其住宅的user_id置空（与原先ORM删除的行为一致），用户不存在时返回False"""
+    orphaned_homes = update(Home).where(Home.user_id == user_id).values(user_id=None).cte("orphaned_homes")
+    deleted = delete_returning(db, User, User.user_id == user_id, User.user_id, ctes=[orphaned_homes])
     db.commit()
+    if deleted is None:
+        return False
+    revoke_user(user_id)
+    return True
     
-def update_last_login(db: Session, user_id: int):
-    db_user = get_user(db, user_id)
-    db_user.last_login = datetime.now()
+def update_last_login(db: Session, user_id: int, password_hash: str = None):
+    """记录登录时间，提供password_hash时一并替换密码哈希（成本因子变化后重新哈希），用户不存在时返回None"""
+    values = {"last_login": datetime.now()}
+    if password_hash:
+        values["password_hash"] = password_hash
+    db_user = update_returning(db, User, User.user_id == user_id, values)
     db.commit()
-    db.refresh(db_user)
+    if db_user is not None:
+        revoke_user(user_id)
     return db_user
 
 def verify_password(plain_password: str, hashed_password: str):
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return check_password(plain_password, hashed_password)
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 缓存后端：memory（进程内LRU）或redis（多个worker共享）
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").strip().lower()
+# 进程内LRU最多保存的条目数
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "smart_home:")
+
+# 失效标签，写入对应数据的服务在提交后调用invalidate
+DEVICE_USAGE_TAG = "device_usage"
+SECURITY_EVENTS_TAG = "security_events"
+FEEDBACK_TAG = "feedback"
+
+class CacheBackend(ABC):
+    """
+    缓存后端接口
+
+    除了带TTL的键值读写，还需要提供不过期的计数器incr，用于标签版本号。
+    is_local为False的后端（需要网络访问）在异步上下文中会放到线程池执行。
+    """
+    is_local = True
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    def get_counter(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+class MemoryLRUBackend(CacheBackend):
+    """进程内LRU缓存，线程安全；多个worker之间不共享，失效只作用于当前进程"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # 标签版本号单独保存，不参与LRU淘汰，否则淘汰后版本号归零会让旧条目重新生效
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions
+            }
+
+class RedisBackend(CacheBackend):
+    """基于Redis的共享缓存，多个worker共享缓存内容和失效（需要安装redis包）"""
+    is_local = False
+
+    def __init__(self, url: str = CACHE_REDIS_URL, prefix: str = CACHE_KEY_PREFIX):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis需要先安装redis包: pip install redis") from e
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._client.set(self.prefix + key, pickle.dumps(value), px=max(int(ttl * 1000), 1))
+
+    def get_counter(self, key: str) -> int:
+        raw = self._client.get(self.prefix + key)
+        return int(raw) if raw is not None else 0
+
+    def incr(self, key: str) -> int:
+        return self._client.incr(self.prefix + key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+def _create_backend() -> CacheBackend:
+    if CACHE_BACKEND == "redis":
+        return RedisBackend()
+    return MemoryLRUBackend()
+
+_backend: CacheBackend = _create_backend()
+
+def get_backend() -> CacheBackend:
+    return _backend
+
+def set_backend(backend: CacheBackend):
+    """替换缓存后端（例如接入其他共享缓存）"""
+    global _backend
+    _backend = backend
+
+def tag_version(tag: str) -> int:
+    """标签当前的版本号，每次invalidate递增；使用redis后端时在所有worker间共享"""
+    try:
+        return _backend.get_counter(f"tag:{tag}")
+    except Exception as e:
+        logger.warning(f"读取缓存标签版本出错({tag}): {str(e)}")
+        return 0
+
+def build_key(namespace: str, params: Dict[str, Any], tags: Iterable[str] = ()) -> str:
+    """
+    生成缓存键
+
+    键中包含各标签当前的版本号，invalidate递增版本号后旧条目不会再被命中，
+    随TTL过期或LRU淘汰自然清除。
+    """
+    versions = ",".join(f"{tag}={tag_version(tag)}" for tag in sorted(tags))
+    raw = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.sha1(f"{versions}|{raw}".encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+def get(key: str) -> Optional[Any]:
+    try:
+        return _backend.get(key)
+    except Exception as e:
+        # 缓存不可用时退化为直接计算
+        logger.warning(f"读取缓存出错: {str(e)}")
+        return None
+
+def put(key: str, value: Any, ttl: float):
+    if ttl <= 0:
+        return
+    try:
+        _backend.set(key, value, ttl)
+    except Exception as e:
+        logger.warning(f"写入缓存出错: {str(e)}")
+
+def invalidate(*tags: str):
+    """使带有这些标签的缓存条目全部失效"""
+    for tag in tags:
+        try:
+            _backend.incr(f"tag:{tag}")
+        except Exception as e:
+            logger.warning(f"缓存失效出错({tag}): {str(e)}")
+
+async def aget(key: str) -> Optional[Any]:
+    if _backend.is_local:
+        return get(key)
+    return await run_in_threadpool(get, key)
+
+async def aput(key: str, value: Any, ttl: float):
+    if _backend.is_local:
+        put(key, value, ttl)
+    else:
+        await run_in_threadpool(put, key, value, ttl)
+
+async def atag_version(tag: str) -> int:
+    if _backend.is_local:
+        return tag_version(tag)
+    return await run_in_threadpool(tag_version, tag)
+
+async def abuild_key(namespace: str, params: Dict[str, Any], tags: Iterable[str] = ()) -> str:
+    if _backend.is_local:
+        return build_key(namespace, params, tags)
+    return await run_in_threadpool(build_key, namespace, params, tags)
+
+def etag_for(body: bytes) -> str:
+    """根据响应体生成强ETag"""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def get_cache_stats() -> Dict[str, Any]:
+    try:
+        return _backend.stats()
+    except Exception as e:
+        return {"error": str(e)}
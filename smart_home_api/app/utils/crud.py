@@ -0,0 +1,31 @@
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+def update_returning(db: Session, model, where, values: Dict[str, Any]):
+    """
+    用一条UPDATE ... RETURNING更新一行并取回更新后的对象，行不存在时返回None
+
+    values为空（请求没有提供任何字段）时退化为一次SELECT。返回的对象已从会话中移除，
+    提交时不会过期，序列化时不会再查询数据库；不要再通过它修改数据。
+    """
+    if values:
+        stmt = update(model).where(where).values(**values).returning(model)
+        obj = db.execute(stmt, execution_options={"synchronize_session": False}).scalars().first()
+    else:
+        obj = db.execute(select(model).where(where)).scalars().first()
+    if obj is not None:
+        db.expunge(obj)
+    return obj
+
+def delete_returning(db: Session, model, where, *columns, ctes=()) -> Optional[Any]:
+    """
+    用一条DELETE ... RETURNING删除一行，返回被删除行的columns，行不存在时返回None
+
+    ctes中的数据修改语句（如清空引用该行的外键）作为WITH子句在同一条语句中执行。
+    """
+    stmt = delete(model).where(where).returning(*columns)
+    for cte in ctes:
+        stmt = stmt.add_cte(cte)
+    return db.execute(stmt, execution_options={"synchronize_session": False}).first()
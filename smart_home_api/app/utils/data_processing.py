@@ -1,7 +1,6 @@
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
 
 def group_by_time_window(data: List[Dict[str, Any]], time_key: str, window_size: str = '1H'):
     """
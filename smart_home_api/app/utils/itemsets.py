@@ -0,0 +1,123 @@
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 默认的频繁项集挖掘算法
+DEFAULT_ALGORITHM = os.getenv("ITEMSET_ALGORITHM", "eclat").strip().lower()
+
+# 挖掘函数签名：(购物篮×项目的稀疏布尔矩阵, 项目名, 最小支持度, 最大项集长度) -> 频繁项集DataFrame
+MiningFunc = Callable[[sparse.csr_matrix, Sequence[str], float, Optional[int]], pd.DataFrame]
+
+def _to_frame(results: List[Tuple[frozenset, float]]) -> pd.DataFrame:
+    """转换为mlxtend格式的频繁项集DataFrame（support, itemsets两列），可直接用于association_rules"""
+    return pd.DataFrame(
+        {"support": [support for _, support in results], "itemsets": [itemset for itemset, _ in results]},
+        columns=["support", "itemsets"]
+    )
+
+def _column_bitsets(csc: sparse.csc_matrix, columns: Sequence[int]) -> List[int]:
+    """把指定列（项目）出现的购物篮各编码为一个整数位图"""
+    n_rows = csc.shape[0]
+    bitsets = []
+    for col in columns:
+        column = np.zeros(n_rows, dtype=bool)
+        column[csc.indices[csc.indptr[col]:csc.indptr[col + 1]]] = True
+        bitsets.append(int.from_bytes(np.packbits(column, bitorder="little").tobytes(), "little"))
+    return bitsets
+
+def eclat(matrix: sparse.csr_matrix, items: Sequence[str], min_support: float, max_len: Optional[int] = None) -> pd.DataFrame:
+    """
+    基于位图的Eclat算法
+
+    每个项目对应一个购物篮位图，项集的支持数为位图按位与后的置1位数。
+    深度优先扩展项集，只保留支持度不低于min_support的分支，内存只与项目数和购物篮数成正比。
+    支持度的计算和比较方式与mlxtend.apriori一致（count / n >= min_support），结果相同。
+    """
+    n_rows = matrix.shape[0]
+    if n_rows == 0:
+        return _to_frame([])
+
+    # 先用列计数筛掉不频繁的项目，只为频繁项目构建位图
+    csc = sparse.csc_matrix(matrix, dtype=bool)
+    csc.sum_duplicates()
+    counts = np.diff(csc.indptr)
+    columns = [col for col in range(csc.shape[1]) if counts[col] / n_rows >= min_support]
+    frequent = [
+        (col, bits, int(counts[col]))
+        for col, bits in zip(columns, _column_bitsets(csc, columns))
+    ]
+
+    results = []
+    # 栈中每项为(前缀项目, 可扩展的(项目, 位图, 支持数)列表)
+    stack = [((), frequent)]
+    while stack:
+        prefix, candidates = stack.pop()
+        for i, (col, bits, count) in enumerate(candidates):
+            itemset = prefix + (col,)
+            results.append((frozenset(items[c] for c in itemset), count / n_rows))
+            if max_len is not None and len(itemset) >= max_len:
+                continue
+            extensions = []
+            for other, other_bits, _ in candidates[i + 1:]:
+                joint = bits & other_bits
+                joint_count = bin(joint).count("1")
+                if joint_count / n_rows >= min_support:
+                    extensions.append((other, joint, joint_count))
+            if extensions:
+                stack.append((itemset, extensions))
+    return _to_frame(results)
+
+def _sparse_frame(matrix: sparse.csr_matrix, items: Sequence[str]) -> pd.DataFrame:
+    return pd.DataFrame.sparse.from_spmatrix(sparse.csr_matrix(matrix, dtype=bool), columns=list(items))
+
+def fpgrowth(matrix: sparse.csr_matrix, items: Sequence[str], min_support: float, max_len: Optional[int] = None) -> pd.DataFrame:
+    """FP-Growth（mlxtend实现），不生成候选项集，直接在稀疏DataFrame上运行"""
+    from mlxtend.frequent_patterns import fpgrowth as mlxtend_fpgrowth
+    return mlxtend_fpgrowth(_sparse_frame(matrix, items), min_support=min_support, use_colnames=True, max_len=max_len)
+
+def apriori(matrix: sparse.csr_matrix, items: Sequence[str], min_support: float, max_len: Optional[int] = None) -> pd.DataFrame:
+    """Apriori（mlxtend实现），项目很多时候选项集数量会急剧膨胀，保留用于对照"""
+    from mlxtend.frequent_patterns import apriori as mlxtend_apriori
+    return mlxtend_apriori(_sparse_frame(matrix, items), min_support=min_support, use_colnames=True, max_len=max_len)
+
+ALGORITHMS: Dict[str, MiningFunc] = {
+    "eclat": eclat,
+    "fpgrowth": fpgrowth,
+    "apriori": apriori,
+}
+
+def register_algorithm(name: str, func: MiningFunc):
+    """注册自定义挖掘算法，之后可通过名称或ITEMSET_ALGORITHM环境变量选用"""
+    ALGORITHMS[name] = func
+
+def mine_frequent_itemsets(
+    matrix: sparse.csr_matrix,
+    items: Sequence[str],
+    min_support: float,
+    max_len: Optional[int] = None,
+    algorithm: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    挖掘频繁项集
+
+    参数:
+    - matrix: 购物篮×项目的稀疏布尔矩阵
+    - items: 各列对应的项目名
+    - min_support: 最小支持度（0~1）
+    - max_len: 项集最大长度，为空表示不限制
+    - algorithm: eclat、fpgrowth、apriori或已注册的算法名，为空使用ITEMSET_ALGORITHM
+
+    返回:
+    - 包含support和itemsets（项目名的frozenset）两列的DataFrame
+    """
+    name = (algorithm or DEFAULT_ALGORITHM).lower()
+    if name not in ALGORITHMS:
+        raise ValueError(f"未知的频繁项集算法: {name}，可选: {', '.join(ALGORITHMS)}")
+    return ALGORITHMS[name](matrix, items, min_support, max_len)
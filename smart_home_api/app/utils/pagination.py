@@ -0,0 +1,98 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import and_, or_, tuple_
+
+# 列表接口返回下一页游标的响应头
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class InvalidCursor(ValueError):
+    """分页游标无法解析"""
+
+class Keyset:
+    """
+    基于排序键的游标分页（keyset pagination）
+
+    游标编码了上一页最后一行的排序键，下一页用行值比较(a, b) < (x, y)直接定位，
+    不再像offset那样扫描并丢弃前面所有的行。排序键的最后一列必须唯一（通常是主键）。
+    除首列外各列不能为NULL；首列可为NULL时设置nullable=True，NULL行排在最后，
+    游标中的NULL单独用IS NULL条件处理（行值比较对NULL不成立，这些行会被跳过）。
+    """
+
+    def __init__(self, *columns, descending: bool = False, nullable: bool = False):
+        self.columns = columns
+        self.descending = descending
+        self.nullable = nullable
+
+    def order_by(self) -> List[Any]:
+        order = [column.desc() if self.descending else column.asc() for column in self.columns]
+        if self.nullable:
+            order[0] = order[0].nulls_last()
+        return order
+
+    def encode(self, row) -> str:
+        values = [getattr(row, column.key) for column in self.columns]
+        raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode(self, cursor: str) -> List[Any]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self.columns):
+                raise ValueError("字段数不符")
+            if values[0] is None and self.nullable:
+                return [None] + [self._parse(column, value) for column, value in zip(self.columns[1:], values[1:])]
+            return [self._parse(column, value) for column, value in zip(self.columns, values)]
+        except (ValueError, TypeError) as e:
+            raise InvalidCursor("无效的分页游标") from e
+
+    @staticmethod
+    def _parse(column, value):
+        if value is None:
+            raise ValueError(f"{column.key}不能为空")
+        return datetime.fromisoformat(value) if column.type.python_type is datetime else column.type.python_type(value)
+
+    def after(self, cursor: str):
+        """游标之后的行的过滤条件"""
+        values = self.decode(cursor)
+        first, first_value = self.columns[0], values[0]
+        if first_value is None:
+            # 游标位于排在最后的NULL行中，之后只剩首列为NULL且其余列在游标之后的行
+            rest, rest_values = tuple_(*self.columns[1:]), tuple_(*values[1:])
+            return and_(first.is_(None), rest < rest_values if self.descending else rest > rest_values)
+        if self.descending:
+            # 首列的单独条件让分区裁剪和单列索引也能生效
+            condition = and_(first <= first_value, tuple_(*self.columns) < tuple_(*values))
+        else:
+            condition = and_(first >= first_value, tuple_(*self.columns) > tuple_(*values))
+        if self.nullable:
+            return or_(condition, first.is_(None))
+        return condition
+
+    def paginate(self, query, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+        """
+        按排序键排序并分页
+
+        提供cursor时从游标之后开始（忽略skip），否则沿用offset分页。
+        """
+        query = query.order_by(*self.order_by())
+        if cursor:
+            query = query.filter(self.after(cursor))
+        elif skip:
+            query = query.offset(skip)
+        return query.limit(limit)
+
+    def next_cursor(self, rows: Sequence[Any], limit: int) -> Optional[str]:
+        """返回满页时指向最后一行的游标，不满一页说明已经没有下一页"""
+        if not rows or len(rows) < limit:
+            return None
+        return self.encode(rows[-1])
+
+def set_next_cursor(response, keyset: Keyset, rows: Sequence[Any], limit: int):
+    """有下一页时把游标写入响应头"""
+    cursor = keyset.next_cursor(rows, limit)
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,36 @@
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Set
+
+class CancellingProcessPool(ProcessPoolExecutor):
+    """
+    关闭时取消尚未开始的任务的进程池
+
+    效果与Python 3.9起的shutdown(cancel_futures=True)相同，兼容Python 3.8；
+    已交给工作进程的任务不受影响，会执行完毕。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._submitted: Set[Future] = set()
+        self._submitted_lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        # loop.run_in_executor也经由submit提交
+        future = super().submit(fn, *args, **kwargs)
+        with self._submitted_lock:
+            self._submitted.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future: Future):
+        with self._submitted_lock:
+            self._submitted.discard(future)
+
+    def shutdown(self, wait: bool = True):
+        with self._submitted_lock:
+            futures = list(self._submitted)
+        for future in futures:
+            # 已开始执行的任务cancel()返回False
+            future.cancel()
+        super().shutdown(wait=wait)
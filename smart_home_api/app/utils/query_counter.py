@@ -0,0 +1,68 @@
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+# 是否统计每个请求执行的SQL语句数，开启后响应头X-SQL-Statements给出该数值
+SQL_STATEMENT_COUNT_ENABLED = os.getenv("SQL_STATEMENT_COUNT", "false").strip().lower() in ("1", "true", "yes", "on")
+# 单个请求的语句数超过该值时记录警告（用于发现N+1查询），0表示不检查
+SQL_STATEMENT_WARN_THRESHOLD = int(os.getenv("SQL_STATEMENT_WARN_THRESHOLD", "0"))
+
+SQL_STATEMENTS_HEADER = "X-SQL-Statements"
+
+class StatementCounter:
+    """一次请求（或一段代码）中执行的SQL语句"""
+
+    def __init__(self, record: bool = False):
+        self.count = 0
+        self.statements: Optional[List[str]] = [] if record else None
+
+    def add(self, statement: str):
+        self.count += 1
+        if self.statements is not None:
+            self.statements.append(statement)
+
+# 线程池和run_sync中执行的查询继承请求的上下文，计到同一个计数器上
+_current: ContextVar[Optional[StatementCounter]] = ContextVar("sql_statement_counter", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is not None:
+        counter.add(statement)
+
+def install(engine):
+    """在引擎（异步引擎传入其sync_engine）上注册语句计数"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+@contextmanager
+def count_statements(record: bool = False) -> Iterator[StatementCounter]:
+    """
+    统计代码块中执行的SQL语句
+
+    用法：
+        with count_statements() as counter:
+            service.get_devices(db, limit=100)
+        assert counter.count == 1
+    """
+    counter = StatementCounter(record)
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+async def statement_count_middleware(request, call_next):
+    """把请求执行的语句数写入响应头，超过阈值时记录警告"""
+    with count_statements() as counter:
+        response = await call_next(request)
+    response.headers[SQL_STATEMENTS_HEADER] = str(counter.count)
+    if SQL_STATEMENT_WARN_THRESHOLD and counter.count > SQL_STATEMENT_WARN_THRESHOLD:
+        logger.warning(f"{request.method} {request.url.path}执行了{counter.count}条SQL语句，可能存在N+1查询")
+    return response
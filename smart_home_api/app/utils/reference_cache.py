@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+class ReferenceCache:
+    """
+    带版本号的进程内读穿缓存
+
+    未命中时调用loader从数据库读取。每次失效都递增版本号，读取开始后发生过失效的结果不会写入缓存，
+    避免并发的读请求把失效前读到的旧数据重新放回缓存。缓存的值是只读的快照（Pydantic对象），
+    不与任何会话关联，可以在请求之间共享。
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 1, enabled: bool = True):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def _active(self) -> bool:
+        return self.enabled and self.ttl > 0
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        # 调用方持有锁
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[1]
+
+    def _store(self, version: int, values: Dict[Hashable, Any]):
+        with self._lock:
+            if version != self._version:
+                return
+            expires = time.monotonic() + self.ttl
+            for key, value in values.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """读取单个键，loader返回None时不缓存"""
+        if not self._active():
+            return loader()
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._hits += 1
+                return value
+            self._misses += 1
+            version = self._version
+        value = loader()
+        if value is not None:
+            self._store(version, {key: value})
+        return value
+
+    def get_many(self, keys: Iterable[Hashable], loader: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """读取多个键，未命中的键用一次loader调用读取；loader结果中不存在的键视为不存在且不缓存"""
+        keys = list(dict.fromkeys(keys))
+        if not self._active():
+            return loader(keys) if keys else {}
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                hit, value = self._lookup(key)
+                if hit:
+                    found[key] = value
+                else:
+                    missing.append(key)
+            self._hits += len(found)
+            self._misses += len(missing)
+            version = self._version
+        if missing:
+            loaded = loader(missing)
+            self._store(version, loaded)
+            found.update(loaded)
+        return found
+
+    def peek(self, key: Hashable) -> Tuple[bool, Any]:
+        """只查缓存不加载，返回(是否命中, 值)；未命中不计入统计（随后的get会计入）"""
+        if not self._active():
+            return False, None
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._hits += 1
+            return found, value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """使单个键（key为None时为全部条目）失效"""
+        with self._lock:
+            self._version += 1
+            self._invalidations += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "version": self._version,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+            }
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+# 设置日志
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PeriodicJob:
+    """定期执行的后台任务"""
+    name: str
+    interval_seconds: float
+    func: Callable[[], None]
+    run_on_start: bool = True
+
+_jobs: Dict[str, PeriodicJob] = {}
+_tasks: List[asyncio.Task] = []
+
+def register_job(name: str, interval_seconds: float, func: Callable[[], None], run_on_start: bool = True):
+    """
+    注册后台任务
+
+    参数:
+    - name: 任务名称，重复注册时覆盖
+    - interval_seconds: 执行间隔（秒）
+    - func: 无参数的同步函数，在线程池中执行
+    - run_on_start: 启动后是否立即执行一次
+    """
+    _jobs[name] = PeriodicJob(name, interval_seconds, func, run_on_start)
+
+async def _run_periodically(job: PeriodicJob):
+    if not job.run_on_start:
+        await asyncio.sleep(job.interval_seconds)
+    while True:
+        try:
+            await run_in_threadpool(job.func)
+        except Exception as e:
+            logger.error(f"后台任务{job.name}执行出错: {str(e)}", exc_info=True)
+        await asyncio.sleep(job.interval_seconds)
+
+def start_jobs():
+    """启动所有已注册的后台任务，需在事件循环中调用"""
+    for job in _jobs.values():
+        _tasks.append(asyncio.create_task(_run_periodically(job), name=f"job:{job.name}"))
+        logger.info(f"后台任务{job.name}已启动，间隔{job.interval_seconds}秒")
+
+async def stop_jobs():
+    """取消所有后台任务并等待其退出"""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+def try_advisory_lock(db: Session, lock_name: str) -> bool:
+    """
+    尝试获取事务级咨询锁，保证多个worker中同一任务只有一个在执行
+
+    锁在当前事务提交或回滚时自动释放。非PostgreSQL数据库不加锁，直接返回True。
+    """
+    if db.bind.dialect.name != "postgresql":
+        return True
+    return db.execute(
+        text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"), {"name": lock_name}
+    ).scalar()
@@ -1,12 +1,19 @@
 import jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..services import users as user_service
+from sqlalchemy.orm import Session, load_only
+from ..database import DbSession, get_session, run_db
+from ..models.users import User
+from ..schemas import users as schemas
+from . import cache
+from .reference_cache import ReferenceCache
+import hashlib
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -17,8 +24,72 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# 是否缓存已验证的令牌和当前用户
+AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+# 已验证令牌最多保存的条数，令牌过期（exp）后条目随之失效
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+# 当前用户信息的缓存秒数。修改、删除用户时递增该用户在缓存后端中的版本号：
+# CACHE_BACKEND=redis时所有进程立即失效，memory时只有当前进程，其他进程最多在该时间内读到旧数据
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token")
 
+class VerifiedTokenCache:
+    """
+    已通过签名和有效期校验的令牌
+
+    以令牌的SHA-256摘要为键（不在内存中保存令牌原文），值为(过期时间, 用户ID)，
+    按LRU淘汰。命中时只比较过期时间，不再重复校验签名。
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, token: str) -> Optional[int]:
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, token: str, expires_at: float, user_id: int):
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        with self._lock:
+            self._entries[key] = (expires_at, user_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revoke_user(self, user_id: int):
+        """删除某个用户的全部条目，这些令牌下次使用时重新校验"""
+        with self._lock:
+            for key in [key for key, (_, owner) in self._entries.items() if owner == user_id]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+_tokens = VerifiedTokenCache(AUTH_TOKEN_CACHE_MAX_ENTRIES)
+# 键为(用户ID, 版本号)，版本号变化后旧条目不再命中，随TTL过期或LRU淘汰清除
+_users = ReferenceCache("auth_users", AUTH_USER_CACHE_TTL, AUTH_TOKEN_CACHE_MAX_ENTRIES, enabled=AUTH_CACHE_ENABLED)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,17 +100,46 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
+def verify_token(token: str) -> Optional[int]:
+    """校验令牌并返回用户ID，无效或已过期时返回None"""
+    if AUTH_CACHE_ENABLED:
+        user_id = _tokens.get(token)
+        if user_id is not None:
+            return user_id
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            return None
-        return user_id
-    except jwt.PyJWTError:
+        user_id = int(payload["sub"])
+    except (jwt.PyJWTError, KeyError, TypeError, ValueError):
         return None
+    # 没有exp的令牌永不过期，不放入缓存，每次都校验签名
+    if AUTH_CACHE_ENABLED and "exp" in payload:
+        _tokens.put(token, float(payload["exp"]), user_id)
+    return user_id
+
+def _load_user(db: Session, user_id: int) -> Optional[schemas.User]:
+    # 只读取响应需要的列，缓存中不保存密码哈希
+    user = db.query(User).options(load_only(
+        User.user_id, User.username, User.email, User.phone, User.created_at, User.last_login
+    )).filter(User.user_id == user_id).first()
+    return schemas.User.model_validate(user) if user is not None else None
+
+def _user_tag(user_id: int) -> str:
+    return f"auth_user:{user_id}"
+
+def get_user_projection(db: Session, user_id: int, version: int = 0) -> Optional[schemas.User]:
+    """经缓存读取用户信息，version为该用户的缓存版本号；用户不存在时返回None（不缓存）"""
+    return _users.get((user_id, version), lambda: _load_user(db, user_id))
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def revoke_user(user_id: int):
+    """
+    用户被修改或删除后调用：递增该用户的缓存版本号，清除当前进程中的已验证令牌
+
+    版本号保存在缓存后端中，使用redis后端时其他进程下次认证即读取到新版本号。
+    """
+    cache.invalidate(_user_tag(user_id))
+    _tokens.revoke_user(user_id)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: DbSession = Depends(get_session)) -> schemas.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的凭证",
@@ -48,7 +148,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     user_id = verify_token(token)
     if user_id is None:
         raise credentials_exception
-    user = user_service.get_user(db, user_id=user_id)
+    # 缓存命中时不访问数据库；版本号的读取使用redis后端时是一次网络往返，比查询用户表轻
+    version = await cache.atag_version(_user_tag(user_id)) if AUTH_CACHE_ENABLED else 0
+    found, user = _users.peek((user_id, version))
+    if not found:
+        user = await run_db(db, get_user_projection, user_id=user_id, version=version)
     if user is None:
         raise credentials_exception
     return user
+
+def get_auth_cache_stats() -> Dict[str, Any]:
+    if not AUTH_CACHE_ENABLED:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "tokens": _tokens.stats(),
+        "users": _users.stats(),
+    }
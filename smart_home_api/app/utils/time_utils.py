@@ -1,6 +1,18 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import pytz
 
+def to_naive_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    """
+    将带时区的时间换算为UTC并去掉时区，不带时区的时间原样返回
+
+    数据库中的时间列不带时区，所有写入途径按同一规则转换，
+    同一时刻不会因上报方式不同而保存为不同的值，带时区与不带时区的时间也可以直接相减和比较。
+    """
+    if dt is None or dt.tzinfo is None or dt.utcoffset() is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
 def get_local_time(timezone_str: str = "Asia/Shanghai"):
     """获取指定时区的当前时间"""
     tz = pytz.timezone(timezone_str)
@@ -1,15 +1,47 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
-import numpy as np
 import io
 import base64
-from typing import List, Dict, Any, Tuple, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Optional
 
-def create_bar_chart(data: List[Dict[str, Any]], x_key: str, y_key: str, title: str, xlabel: str, ylabel: str) -> str:
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 图表图像的分辨率，宽高参数（像素）按此换算为英寸
+CHART_DPI = 100
+# 支持的输出格式及其媒体类型
+CHART_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+def _pyplot():
+    """
+    按需导入matplotlib和seaborn
+
+    使用不依赖显示设备的Agg后端，可以在服务进程和后台进程中绘图；
+    导入应用时不加载matplotlib，只有绘图的进程承担导入开销。
     """
-    创建柱状图并返回base64编码的图像
-    
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    # 设置中文字体，找不到时依次回退，最后使用默认字体
+    plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Noto Sans CJK SC', 'WenQuanYi Zen Hei', 'DejaVu Sans']
+    plt.rcParams['axes.unicode_minus'] = False
+    return plt
+
+def _figure_bytes(plt, fmt: str = "png") -> bytes:
+    """保存当前图表并关闭，返回图像的原始字节"""
+    buffer = io.BytesIO()
+    try:
+        plt.savefig(buffer, format=fmt, dpi=CHART_DPI)
+    finally:
+        plt.close()
+    return buffer.getvalue()
+
+def _to_base64(image: bytes) -> str:
+    return base64.b64encode(image).decode('utf-8')
+
+def render_bar_chart(data: List[Dict[str, Any]], x_key: str, y_key: str, title: str, xlabel: str, ylabel: str,
+                     fmt: str = "png", figsize: Tuple[float, float] = (10, 6)) -> bytes:
+    """
+    创建柱状图并返回图像的原始字节
+
     参数:
     - data: 数据列表
     - x_key: X轴数据的键名
@@ -17,127 +49,118 @@ def create_bar_chart(data: List[Dict[str, Any]], x_key: str, y_key: str, title:
     - title: 图表标题
     - xlabel: X轴标签
     - ylabel: Y轴标签
-    
-    返回:
-    - base64编码的图像
+    - fmt: 图像格式（png或svg）
+    - figsize: 图表尺寸（英寸）
     """
-    plt.figure(figsize=(10, 6))
+    import pandas as pd
+    import seaborn as sns
+    plt = _pyplot()
+
+    plt.figure(figsize=figsize)
     df = pd.DataFrame(data)
-    
+
     # 绘制柱状图
     sns.barplot(x=x_key, y=y_key, data=df)
-    
+
     # 设置标题和标签
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
     plt.xticks(rotation=45)
     plt.tight_layout()
-    
-    # 将图像转换为base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-    plt.close()
-    
-    return image_base64
 
-def create_line_chart(data: List[Dict[str, Any]], x_key: str, y_key: str, title: str, xlabel: str, ylabel: str) -> str:
+    return _figure_bytes(plt, fmt)
+
+def render_line_chart(data: List[Dict[str, Any]], x_key: str, y_key: str, title: str, xlabel: str, ylabel: str,
+                      fmt: str = "png", figsize: Tuple[float, float] = (10, 6)) -> bytes:
     """
-    创建折线图并返回base64编码的图像
-    
-    参数与create_bar_chart相同
+    创建折线图并返回图像的原始字节
+
+    参数与render_bar_chart相同
     """
-    plt.figure(figsize=(10, 6))
+    import pandas as pd
+    import seaborn as sns
+    plt = _pyplot()
+
+    plt.figure(figsize=figsize)
     df = pd.DataFrame(data)
-    
+
     # 绘制折线图
     sns.lineplot(x=x_key, y=y_key, data=df)
-    
+
     # 设置标题和标签
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
     plt.xticks(rotation=45)
     plt.tight_layout()
-    
-    # 将图像转换为base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-    plt.close()
-    
-    return image_base64
-
-def create_heatmap(data: pd.DataFrame, title: str) -> str:
+
+    return _figure_bytes(plt, fmt)
+
+def render_heatmap(data: "pd.DataFrame", title: str, fmt: str = "png", figsize: Tuple[float, float] = (10, 8),
+                   xlabel: Optional[str] = None, ylabel: Optional[str] = None) -> bytes:
     """
-    创建热力图并返回base64编码的图像
-    
+    创建热力图并返回图像的原始字节
+
     参数:
     - data: 包含相关性数据的DataFrame
     - title: 图表标题
-    
-    返回:
-    - base64编码的图像
+    - fmt: 图像格式（png或svg）
+    - figsize: 图表尺寸（英寸）
+    - xlabel/ylabel: 坐标轴标签（可选）
     """
-    plt.figure(figsize=(10, 8))
-    
+    import seaborn as sns
+    plt = _pyplot()
+
+    plt.figure(figsize=figsize)
+
     # 绘制热力图
     sns.heatmap(data, annot=True, cmap='coolwarm', linewidths=0.5)
-    
+
     # 设置标题
     plt.title(title)
+    if xlabel is not None:
+        plt.xlabel(xlabel)
+    if ylabel is not None:
+        plt.ylabel(ylabel)
     plt.tight_layout()
-    
-    # 将图像转换为base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-    plt.close()
-    
-    return image_base64
 
-def create_pie_chart(data: List[Dict[str, Any]], value_key: str, label_key: str, title: str) -> str:
+    return _figure_bytes(plt, fmt)
+
+def render_pie_chart(data: List[Dict[str, Any]], value_key: str, label_key: str, title: str,
+                     fmt: str = "png", figsize: Tuple[float, float] = (10, 10)) -> bytes:
     """
-    创建饼图并返回base64编码的图像
-    
+    创建饼图并返回图像的原始字节
+
     参数:
     - data: 数据列表
     - value_key: 数值的键名
     - label_key: 标签的键名
     - title: 图表标题
-    
-    返回:
-    - base64编码的图像
+    - fmt: 图像格式（png或svg）
+    - figsize: 图表尺寸（英寸）
     """
-    plt.figure(figsize=(10, 10))
+    import pandas as pd
+    plt = _pyplot()
+
+    plt.figure(figsize=figsize)
     df = pd.DataFrame(data)
-    
+
     # 绘制饼图
     plt.pie(df[value_key], labels=df[label_key], autopct='%1.1f%%', startangle=90)
     plt.axis('equal')  # 使饼图为正圆形
-    
+
     # 设置标题
     plt.title(title)
     plt.tight_layout()
-    
-    # 将图像转换为base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-    plt.close()
-    
-    return image_base64
-
-def create_scatter_plot(data: List[Dict[str, Any]], x_key: str, y_key: str, title: str, xlabel: str, ylabel: str, 
-                        hue_key: Optional[str] = None) -> str:
+
+    return _figure_bytes(plt, fmt)
+
+def render_scatter_plot(data: List[Dict[str, Any]], x_key: str, y_key: str, title: str, xlabel: str, ylabel: str,
+                        hue_key: Optional[str] = None, fmt: str = "png", figsize: Tuple[float, float] = (10, 6)) -> bytes:
     """
-    创建散点图并返回base64编码的图像
-    
+    创建散点图并返回图像的原始字节
+
     参数:
     - data: 数据列表
     - x_key: X轴数据的键名
@@ -146,31 +169,125 @@ def create_scatter_plot(data: List[Dict[str, Any]], x_key: str, y_key: str, titl
     - xlabel: X轴标签
     - ylabel: Y轴标签
     - hue_key: 用于分组的键名（可选）
-    
-    返回:
-    - base64编码的图像
+    - fmt: 图像格式（png或svg）
+    - figsize: 图表尺寸（英寸）
     """
-    plt.figure(figsize=(10, 6))
+    import pandas as pd
+    import seaborn as sns
+    plt = _pyplot()
+
+    plt.figure(figsize=figsize)
     df = pd.DataFrame(data)
-    
+
     # 绘制散点图
     if hue_key and hue_key in df.columns:
         sns.scatterplot(x=x_key, y=y_key, hue=hue_key, data=df)
         plt.legend(title=hue_key)
     else:
         sns.scatterplot(x=x_key, y=y_key, data=df)
-    
+
     # 设置标题和标签
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
     plt.tight_layout()
-    
-    # 将图像转换为base64
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-    plt.close()
-    
-    return image_base64
+
+    return _figure_bytes(plt, fmt)
+
+def create_bar_chart(data: List[Dict[str, Any]], x_key: str, y_key: str, title: str, xlabel: str, ylabel: str) -> str:
+    """创建柱状图并返回base64编码的PNG图像，参数见render_bar_chart"""
+    return _to_base64(render_bar_chart(data, x_key, y_key, title, xlabel, ylabel))
+
+def create_line_chart(data: List[Dict[str, Any]], x_key: str, y_key: str, title: str, xlabel: str, ylabel: str) -> str:
+    """创建折线图并返回base64编码的PNG图像，参数见render_line_chart"""
+    return _to_base64(render_line_chart(data, x_key, y_key, title, xlabel, ylabel))
+
+def create_heatmap(data: "pd.DataFrame", title: str) -> str:
+    """创建热力图并返回base64编码的PNG图像，参数见render_heatmap"""
+    return _to_base64(render_heatmap(data, title))
+
+def create_pie_chart(data: List[Dict[str, Any]], value_key: str, label_key: str, title: str) -> str:
+    """创建饼图并返回base64编码的PNG图像，参数见render_pie_chart"""
+    return _to_base64(render_pie_chart(data, value_key, label_key, title))
+
+def create_scatter_plot(data: List[Dict[str, Any]], x_key: str, y_key: str, title: str, xlabel: str, ylabel: str,
+                        hue_key: Optional[str] = None) -> str:
+    """创建散点图并返回base64编码的PNG图像，参数见render_scatter_plot"""
+    return _to_base64(render_scatter_plot(data, x_key, y_key, title, xlabel, ylabel, hue_key))
+
+def _top_rows(data: List[Dict[str, Any]], label_key: str, value_key: str, limit: int) -> List[Dict[str, Any]]:
+    """按标签汇总数值（同名设备、住宅合并），取数值最大的limit项"""
+    totals: Dict[Any, float] = {}
+    for row in data:
+        totals[row[label_key]] = totals.get(row[label_key], 0) + (row[value_key] or 0)
+    top = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{label_key: label, value_key: value} for label, value in top]
+
+def _device_usage_frequency(data, fmt, figsize, limit):
+    return render_bar_chart(_top_rows(data, 'device_name', 'usage_count', limit), 'device_name', 'usage_count',
+                            '设备使用频率分析', '设备名称', '使用次数', fmt, figsize)
+
+def _device_usage_hours(data, fmt, figsize, limit):
+    return render_bar_chart(_top_rows(data, 'device_name', 'total_hours', limit), 'device_name', 'total_hours',
+                            '设备使用总时长', '设备名称', '使用时长(小时)', fmt, figsize)
+
+def _device_usage_timeframe(data, fmt, figsize, limit):
+    import pandas as pd
+    devices = {row['device_name'] for row in _top_rows(data, 'device_name', 'usage_count', limit)}
+    df = pd.DataFrame([row for row in data if row['device_name'] in devices],
+                      columns=['device_name', 'hour_of_day', 'usage_count'])
+    pivot = df.pivot_table(index='device_name', columns='hour_of_day', values='usage_count', aggfunc='sum', fill_value=0)
+    return render_heatmap(pivot, '设备使用时间段分布', fmt, figsize, xlabel='一天中的小时', ylabel='设备名称')
+
+def _home_area_impact(data, fmt, figsize, limit):
+    return render_scatter_plot(data, 'square_meters', 'usage_count', '房屋面积与设备使用次数的关系',
+                               '房屋面积（平方米）', '使用次数', hue_key='category_name', fmt=fmt, figsize=figsize)
+
+def _security_events(data, fmt, figsize, limit):
+    return render_bar_chart(_top_rows(data, 'home_name', 'total_events', limit), 'home_name', 'total_events',
+                            '各住宅安防事件总数', '住宅', '事件数', fmt, figsize)
+
+def _feedback_ratings(data, fmt, figsize, limit):
+    # 按反馈数量加权汇总各月的平均评分；某月的反馈都没有评分时平均评分为NULL，不参与加权
+    totals: Dict[str, List[float]] = {}
+    for row in data:
+        weighted = totals.setdefault(row['feedback_type'], [0.0, 0])
+        if row['average_rating'] is None or not row['total_feedbacks']:
+            continue
+        weighted[0] += row['average_rating'] * row['total_feedbacks']
+        weighted[1] += row['total_feedbacks']
+    rows = [
+        {'feedback_type': feedback_type, 'average_rating': total / count if count else 0}
+        for feedback_type, (total, count) in totals.items()
+    ]
+    return render_bar_chart(rows, 'feedback_type', 'average_rating', '不同类型反馈的平均评分', '反馈类型', '平均评分', fmt, figsize)
+
+# 图表名 -> 绘图函数，参数为对应分析接口的结果
+CHART_RENDERERS = {
+    "device-usage-frequency": _device_usage_frequency,
+    "device-usage-hours": _device_usage_hours,
+    "device-usage-timeframe": _device_usage_timeframe,
+    "home-area-impact": _home_area_impact,
+    "security-events": _security_events,
+    "feedback-ratings": _feedback_ratings,
+}
+
+def render_chart(name: str, data: List[Dict[str, Any]], fmt: str = "png", width: int = 1000, height: int = 600,
+                 limit: int = 20) -> bytes:
+    """
+    按图表名绘制分析结果，返回图像的原始字节（在后台进程中执行）
+
+    参数:
+    - name: CHART_RENDERERS中的图表名
+    - data: 对应分析接口返回的数据
+    - fmt: 图像格式（png或svg）
+    - width/height: 图像尺寸（像素）
+    - limit: 柱状图和热力图最多显示的设备或住宅数
+    """
+    if not data:
+        plt = _pyplot()
+        plt.figure(figsize=(width / CHART_DPI, height / CHART_DPI))
+        plt.text(0.5, 0.5, '暂无数据', ha='center', va='center', fontsize=16)
+        plt.axis('off')
+        return _figure_bytes(plt, fmt)
+    return CHART_RENDERERS[name](data, fmt, (width / CHART_DPI, height / CHART_DPI), limit)
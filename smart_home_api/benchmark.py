@@ -0,0 +1,609 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# 脚本所在目录（uvicorn需要在此目录下启动以挂载静态文件）
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def wait_for_server(base_url, timeout=30):
+    """等待服务启动完成"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+def run_load(url, total_requests, concurrency, headers=None):
+    """
+    以固定并发对URL发起GET请求
+
+    返回:
+    - 包含吞吐量和延迟分位数的统计字典
+    """
+    def worker(num_requests):
+        session = requests.Session()
+        session.headers.update(headers or {})
+        worker_latencies = []
+        worker_errors = 0
+        for _ in range(num_requests):
+            started = time.perf_counter()
+            try:
+                response = session.get(url, timeout=30)
+                if response.status_code != 200:
+                    worker_errors += 1
+            except requests.RequestException:
+                worker_errors += 1
+            worker_latencies.append(time.perf_counter() - started)
+        return worker_latencies, worker_errors
+
+    per_worker = [total_requests // concurrency] * concurrency
+    for i in range(total_requests % concurrency):
+        per_worker[i] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(worker, per_worker))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for worker_latencies, _ in outcomes for latency in worker_latencies]
+    errors = sum(worker_errors for _, worker_errors in outcomes)
+    latencies.sort()
+    return {
+        "requests": total_requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total_requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+def start_server(port, env_overrides):
+    """以指定环境变量启动一个uvicorn进程"""
+    env = os.environ.copy()
+    env.update(env_overrides)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR,
+        env=env,
+    )
+
+def benchmark_db_mode(args):
+    """对比同步与异步数据库模式下的吞吐量"""
+    results = {}
+    for mode, enabled in (("sync", "false"), ("async", "true")):
+        port = args.port
+        server = start_server(port, {"DB_ASYNC_ENABLED": enabled})
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            if not wait_for_server(base_url):
+                print(f"{mode}模式服务启动失败")
+                continue
+            url = f"{base_url}{args.path}"
+            # 预热连接池
+            run_load(url, args.concurrency, args.concurrency)
+            results[mode] = run_load(url, args.requests, args.concurrency)
+            print(f"{mode}: {results[mode]}")
+        finally:
+            server.terminate()
+            server.wait()
+
+    if "sync" in results and "async" in results:
+        ratio = results["async"]["requests_per_second"] / results["sync"]["requests_per_second"]
+        print(f"async / sync 吞吐量比: {ratio:.2f}")
+
+def _usage_events(count, device_ids, user_id, start):
+    """生成count条互不相同的使用记录"""
+    from datetime import datetime, timedelta
+
+    base = datetime.fromisoformat(start)
+    return [
+        {
+            "device_id": device_ids[i % len(device_ids)],
+            "user_id": user_id,
+            "start_time": (base + timedelta(seconds=i)).isoformat(),
+            "end_time": (base + timedelta(seconds=i + 30)).isoformat(),
+            "operation_type": "benchmark"
+        }
+        for i in range(count)
+    ]
+
+def benchmark_ingest(args):
+    """对比逐条写入接口与批量写入接口（JSON数组、NDJSON、MessagePack列式）的每秒写入记录数"""
+    import json
+
+    server = start_server(args.port, {})
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        if not wait_for_server(base_url):
+            print("服务启动失败")
+            return
+        device_ids = [int(value) for value in args.device_ids.split(",")]
+        session = requests.Session()
+
+        single = _usage_events(args.single_rows, device_ids, args.user_id, args.start)
+        def post_one(event):
+            return session.post(f"{base_url}/api/device-usage/", json=event, timeout=30).status_code == 201
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            errors = sum(not ok for ok in executor.map(post_one, single))
+        elapsed = time.perf_counter() - started
+        print(f"single: {len(single)}条, 并发{args.concurrency}, {len(single) / elapsed:.0f}条/秒, 失败{errors}")
+
+        formats = [("bulk-json", "application/json"), ("bulk-ndjson", "application/x-ndjson")]
+        try:
+            import msgpack
+            formats.append(("bulk-msgpack", "application/msgpack"))
+        except ImportError:
+            print("未安装msgpack，跳过列式上报")
+
+        for name, content_type in formats:
+            events = _usage_events(args.bulk_rows, device_ids, args.user_id, args.start)
+            inserted = 0
+            started = time.perf_counter()
+            for offset in range(0, len(events), args.batch_size):
+                batch = events[offset:offset + args.batch_size]
+                path = "/api/device-usage/bulk"
+                if content_type == "application/json":
+                    body = json.dumps(batch)
+                elif content_type == "application/x-ndjson":
+                    body = "\n".join(json.dumps(event) for event in batch)
+                else:
+                    path = "/api/device-usage/bulk/columnar"
+                    body = msgpack.packb({field: [event[field] for event in batch] for field in batch[0]})
+                response = session.post(
+                    f"{base_url}{path}", data=body, headers={"Content-Type": content_type}, timeout=300
+                )
+                inserted += response.json().get("inserted", 0)
+            elapsed = time.perf_counter() - started
+            print(f"{name}: {len(events)}条, 每批{args.batch_size}条, {len(events) / elapsed:.0f}条/秒, 写入{inserted}")
+    finally:
+        server.terminate()
+        server.wait()
+
+def _synthetic_baskets(n_baskets, n_items, avg_size, seed=0):
+    """生成带热点设备和关联设备的随机购物篮（稀疏布尔矩阵）"""
+    import numpy as np
+    from scipy import sparse
+
+    rng = np.random.default_rng(seed)
+    # 设备热度服从Zipf分布，少数设备被频繁使用
+    weights = 1.0 / np.arange(1, n_items + 1) ** 1.1
+    weights /= weights.sum()
+    sizes = rng.poisson(avg_size - 1, n_baskets) + 1
+    rows = np.repeat(np.arange(n_baskets), sizes)
+    cols = rng.choice(n_items, size=rows.size, p=weights)
+    # 相邻设备经常一起使用
+    paired = rng.random(rows.size) < 0.3
+    rows = np.concatenate([rows, rows[paired]])
+    cols = np.concatenate([cols, (cols[paired] + 1) % n_items])
+    matrix = sparse.csr_matrix((np.ones(rows.size, dtype=bool), (rows, cols)), shape=(n_baskets, n_items))
+    matrix.sum_duplicates()
+    return matrix, [f"device_{i}" for i in range(n_items)]
+
+def benchmark_itemsets(args):
+    """对比各频繁项集算法在不同购物篮数和设备数下的耗时，并校验结果与apriori一致"""
+    from app.utils import itemsets
+
+    algorithms = args.algorithms.split(",")
+    print(f"{'baskets':>8} {'devices':>8} {'itemsets':>9} " + " ".join(f"{name + '_s':>12}" for name in algorithms) + "  consistent")
+    for n_baskets in args.baskets:
+        for n_items in args.devices:
+            matrix, items = _synthetic_baskets(n_baskets, n_items, args.avg_size)
+            timings = {}
+            results = {}
+            for name in algorithms:
+                if name == "apriori" and n_items > args.apriori_max_devices:
+                    continue
+                started = time.perf_counter()
+                frame = itemsets.mine_frequent_itemsets(matrix, items, args.min_support, max_len=args.max_len, algorithm=name)
+                timings[name] = time.perf_counter() - started
+                results[name] = {
+                    itemset: round(support, 12) for itemset, support in zip(frame["itemsets"], frame["support"])
+                }
+            reference = next(iter(results.values()))
+            consistent = all(result == reference for result in results.values())
+            cells = " ".join(
+                f"{timings[name]:>12.4f}" if name in timings else f"{'-':>12}" for name in algorithms
+            )
+            print(f"{n_baskets:>8} {n_items:>8} {len(reference):>9} {cells}  {consistent}")
+
+LIST_PATHS = [
+    "/api/users/",
+    "/api/homes/",
+    "/api/devices/",
+    "/api/devices/categories/",
+    "/api/device-usage/",
+    "/api/security-events/",
+    "/api/feedback/",
+]
+
+def check_query_counts(args):
+    """
+    检查列表接口的SQL语句数不随返回行数增长（N+1查询）
+
+    分别以limit=1和较大的limit请求每个列表接口，比较响应头X-SQL-Statements；
+    有接口的语句数随行数增加时以非零状态退出。CI中使用tests/test_query_counts.py。
+    """
+    server = start_server(args.port, {"SQL_STATEMENT_COUNT": "true", "ENABLE_BACKGROUND_JOBS": "false"})
+    failures = []
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        if not wait_for_server(base_url):
+            print("服务启动失败")
+            sys.exit(1)
+        print(f"{'path':<28} {'rows':>6} {'statements':>10} {'rows':>6} {'statements':>10}")
+        for path in LIST_PATHS:
+            counts = []
+            for limit in (1, args.limit):
+                response = requests.get(f"{base_url}{path}", params={"limit": limit}, timeout=30)
+                response.raise_for_status()
+                counts.append((len(response.json()), int(response.headers["X-SQL-Statements"])))
+            (small_rows, small), (large_rows, large) = counts
+            print(f"{path:<28} {small_rows:>6} {small:>10} {large_rows:>6} {large:>10}")
+            if large > small:
+                failures.append(path)
+    finally:
+        server.terminate()
+        server.wait()
+
+    if failures:
+        print(f"以下接口的SQL语句数随返回行数增长: {', '.join(failures)}")
+        sys.exit(1)
+
+def _timed(session, method, url, **kwargs):
+    started = time.perf_counter()
+    response = session.request(method, url, timeout=30, **kwargs)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return response, elapsed
+
+def benchmark_writes(args):
+    """
+    测量更新和删除接口的延迟及每个请求的SQL语句数
+
+    创建一个测试用户和若干反馈，依次PUT用户、PUT反馈、DELETE反馈，最后删除测试用户。
+    """
+    server = start_server(args.port, {"SQL_STATEMENT_COUNT": "true", "ENABLE_BACKGROUND_JOBS": "false"})
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        if not wait_for_server(base_url):
+            print("服务启动失败")
+            sys.exit(1)
+        session = requests.Session()
+        suffix = int(time.time() * 1000)
+        user = session.post(f"{base_url}/api/users/", json={
+            "username": f"bench_{suffix}", "email": f"bench_{suffix}@example.com", "password": "Benchmark123",
+        }, timeout=30)
+        user.raise_for_status()
+        user_id = user.json()["user_id"]
+        feedback_ids = []
+        for _ in range(args.requests):
+            response, _ = _timed(session, "POST", f"{base_url}/api/feedback/", json={
+                "user_id": user_id, "feedback_type": "benchmark", "content": "benchmark",
+            })
+            feedback_ids.append(response.json()["feedback_id"])
+
+        cases = [
+            ("PUT /api/users/{id}", lambda i: ("PUT", f"{base_url}/api/users/{user_id}", {"json": {"phone": str(i)}})),
+            ("PUT /api/feedback/{id}", lambda i: ("PUT", f"{base_url}/api/feedback/{feedback_ids[i]}", {"json": {"rating": i % 5 + 1}})),
+            ("DELETE /api/feedback/{id}", lambda i: ("DELETE", f"{base_url}/api/feedback/{feedback_ids[i]}", {})),
+        ]
+        print(f"{'request':<28} {'p50_ms':>8} {'p95_ms':>8} {'statements':>10}")
+        for name, build in cases:
+            latencies = []
+            statements = set()
+            for i in range(args.requests):
+                method, url, kwargs = build(i)
+                response, elapsed = _timed(session, method, url, **kwargs)
+                latencies.append(elapsed)
+                statements.add(int(response.headers["X-SQL-Statements"]))
+            latencies.sort()
+            p50 = statistics.median(latencies) * 1000
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
+            print(f"{name:<28} {p50:>8.2f} {p95:>8.2f} {','.join(map(str, sorted(statements))):>10}")
+        session.delete(f"{base_url}/api/users/{user_id}", timeout=30)
+    finally:
+        server.terminate()
+        server.wait()
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return 0.0, 0.0
+    return statistics.median(latencies) * 1000, latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
+
+def benchmark_logins(args):
+    """
+    并发带密码登录时的登录延迟，以及同时到达的其他请求的延迟
+
+    对每个PASSWORD_HASH_WORKERS取值启动一个服务：以固定并发发起登录，
+    另一个客户端在此期间持续请求--probe-path，观察密码哈希是否拖慢其他请求。
+    """
+    print(f"{'workers':>8} {'logins/s':>9} {'login_p50':>10} {'login_p95':>10} {'probe_p50':>10} {'probe_p95':>10} {'errors':>7}")
+    for workers in args.workers:
+        server = start_server(args.port, {"PASSWORD_HASH_WORKERS": str(workers), "ENABLE_BACKGROUND_JOBS": "false"})
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            if not wait_for_server(base_url):
+                print("服务启动失败")
+                sys.exit(1)
+            suffix = int(time.time() * 1000)
+            password = "Benchmark123"
+            user = requests.post(f"{base_url}/api/users/", json={
+                "username": f"bench_{suffix}", "email": f"bench_{suffix}@example.com", "password": password,
+            }, timeout=30)
+            user.raise_for_status()
+            login_url = f"{base_url}/api/users/{user.json()['user_id']}/login"
+
+            done = False
+            probe_latencies = []
+            def probe():
+                session = requests.Session()
+                while not done:
+                    started = time.perf_counter()
+                    session.get(f"{base_url}{args.probe_path}", timeout=30)
+                    probe_latencies.append(time.perf_counter() - started)
+
+            def login(_):
+                started = time.perf_counter()
+                response = requests.post(login_url, json={"password": password}, timeout=60)
+                return time.perf_counter() - started, response.status_code != 200
+
+            with ThreadPoolExecutor(max_workers=args.concurrency + 1) as executor:
+                prober = executor.submit(probe)
+                started = time.perf_counter()
+                outcomes = list(executor.map(login, range(args.requests)))
+                elapsed = time.perf_counter() - started
+                done = True
+                prober.result()
+
+            login_p50, login_p95 = _percentiles([latency for latency, _ in outcomes])
+            probe_p50, probe_p95 = _percentiles(probe_latencies)
+            errors = sum(error for _, error in outcomes)
+            print(f"{workers:>8} {args.requests / elapsed:>9.1f} {login_p50:>10.1f} {login_p95:>10.1f} {probe_p50:>10.1f} {probe_p95:>10.1f} {errors:>7}")
+            requests.delete(f"{base_url}/api/users/{user.json()['user_id']}", timeout=30)
+        finally:
+            server.terminate()
+            server.wait()
+
+def benchmark_auth(args):
+    """对比开启和关闭令牌/用户缓存时需要认证的接口（/api/users/me）的吞吐量和SQL语句数"""
+    results = {}
+    for enabled in ("false", "true"):
+        server = start_server(args.port, {
+            "AUTH_CACHE_ENABLED": enabled, "SQL_STATEMENT_COUNT": "true", "ENABLE_BACKGROUND_JOBS": "false",
+        })
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            if not wait_for_server(base_url):
+                print("服务启动失败")
+                sys.exit(1)
+            suffix = int(time.time() * 1000)
+            email = f"bench_{suffix}@example.com"
+            user = requests.post(f"{base_url}/api/users/", json={
+                "username": f"bench_{suffix}", "email": email, "password": "Benchmark123",
+            }, timeout=30)
+            user.raise_for_status()
+            token = requests.post(f"{base_url}/api/users/token", data={"username": email, "password": "Benchmark123"}, timeout=30)
+            token.raise_for_status()
+            headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+            url = f"{base_url}/api/users/me"
+            run_load(url, args.concurrency, args.concurrency, headers)
+            results[enabled] = run_load(url, args.requests, args.concurrency, headers)
+            results[enabled]["statements"] = requests.get(url, headers=headers, timeout=30).headers["X-SQL-Statements"]
+            requests.delete(f"{base_url}/api/users/{user.json()['user_id']}", timeout=30)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'cache':<8} {'req/s':>10} {'p50_ms':>10} {'p95_ms':>10} {'statements':>10} {'errors':>8}")
+    for enabled, stats in results.items():
+        print(
+            f"{'on' if enabled == 'true' else 'off':<8} {stats['requests_per_second']:>10} {stats['p50_ms']:>10} "
+            f"{stats['p95_ms']:>10} {stats['statements']:>10} {stats['errors']:>8}"
+        )
+
+def benchmark_charts(args):
+    """
+    测量图表接口在各阶段的延迟：进程池冷启动、绘制新图、命中图像缓存和条件请求（304），
+    并对比原始图像与base64编码后的大小
+    """
+    import base64
+
+    server = start_server(args.port, {"ENABLE_BACKGROUND_JOBS": "false"})
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        if not wait_for_server(base_url):
+            print("服务启动失败")
+            sys.exit(1)
+        url = f"{base_url}/api/analytics/charts/{args.chart}"
+        params = {"format": args.format}
+        if args.start:
+            params["start"] = args.start
+
+        session = requests.Session()
+        rows = []
+        # 第一次请求包含启动绘图进程和导入matplotlib；之后每个新尺寸都要重新绘制
+        for label, width in (("首次绘制", 1000), ("绘制新图", 1001)):
+            response, latency = _timed(session, "GET", url, params={**params, "width": width})
+            rows.append((label, latency))
+        response, latency = _timed(session, "GET", url, params={**params, "width": 1001})
+        rows.append(("命中缓存", latency))
+        _, latency = _timed(session, "GET", url, params={**params, "width": 1001}, headers={"If-None-Match": response.headers["ETag"]})
+        rows.append(("条件请求304", latency))
+
+        for label, latency in rows:
+            print(f"{label:<10} {latency * 1000:>10.1f} ms")
+        raw = len(response.content)
+        encoded = len(base64.b64encode(response.content))
+        print(f"图像{raw}字节，base64编码后{encoded}字节（+{(encoded / raw - 1) * 100:.0f}%）")
+
+        cached_url = requests.Request("GET", url, params={**params, "width": 1001}).prepare().url
+        stats = run_load(cached_url, args.requests, args.concurrency)
+        print(f"缓存命中时: {stats['requests_per_second']} req/s, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, 错误{stats['errors']}")
+    finally:
+        server.terminate()
+        server.wait()
+
+# 只有分析接口用到的依赖，导入app.main时不应加载
+HEAVY_MODULES = ("numpy", "pandas", "scipy", "mlxtend", "sklearn", "matplotlib", "seaborn")
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+try:
+    import resource
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+except ImportError:  # Windows
+    rss_mb = None
+print(json.dumps({"seconds": elapsed, "rss_mb": rss_mb, "modules": sorted({name.split(".")[0] for name in sys.modules})}))
+"""
+
+def check_import_time(args):
+    """
+    检查导入app.main（即每个worker启动）的耗时和内存，以及是否加载了重量级分析依赖
+
+    在新的解释器中重复导入若干次取最短耗时；超过--budget-ms或加载了HEAVY_MODULES时以非零状态退出。CI中使用tests/test_import_time.py。
+    """
+    import json
+
+    runs = []
+    for _ in range(args.repeat):
+        result = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], cwd=BASE_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"导入app.main失败:\n{result.stderr}")
+            sys.exit(1)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda run: run["seconds"])
+    heavy = [name for name in HEAVY_MODULES if name in best["modules"]]
+    elapsed_ms = best["seconds"] * 1000
+    rss = f"{best['rss_mb']:.0f}MB" if best["rss_mb"] is not None else "-"
+    print(f"import app.main: {elapsed_ms:.0f}ms（{args.repeat}次中最短）, 峰值内存{rss}, 已加载的重量级依赖: {', '.join(heavy) or '无'}")
+
+    failures = []
+    if elapsed_ms > args.budget_ms:
+        failures.append(f"导入耗时超过{args.budget_ms}ms")
+    if heavy:
+        failures.append(f"导入时加载了{', '.join(heavy)}")
+    if failures:
+        print("；".join(failures))
+        sys.exit(1)
+
+def benchmark_startup(args):
+    """测量uvicorn进程从启动到--path返回200所需的时间（多次取中位数）"""
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        server = start_server(args.port, {"ENABLE_BACKGROUND_JOBS": "false"})
+        try:
+            url = f"http://127.0.0.1:{args.port}{args.path}"
+            deadline = time.time() + 60
+            while time.time() < deadline:
+                try:
+                    if requests.get(url, timeout=1).status_code == 200:
+                        break
+                except requests.RequestException:
+                    pass
+                time.sleep(0.02)
+            else:
+                print("服务启动失败")
+                sys.exit(1)
+            timings.append(time.perf_counter() - started)
+        finally:
+            server.terminate()
+            server.wait()
+    print(f"{args.path}: 中位数{statistics.median(timings) * 1000:.0f}ms, 最短{min(timings) * 1000:.0f}ms（{args.repeat}次）")
+
+def main():
+    parser = argparse.ArgumentParser(description="智能家居API性能基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    db_mode = subparsers.add_parser("db-mode", help="对比同步与异步数据库模式的每秒请求数")
+    db_mode.add_argument("--path", default="/api/devices/?limit=20", help="压测的接口路径")
+    db_mode.add_argument("--requests", type=int, default=2000, help="总请求数")
+    db_mode.add_argument("--concurrency", type=int, default=64, help="并发客户端数")
+    db_mode.add_argument("--port", type=int, default=8100, help="临时服务端口")
+    db_mode.set_defaults(func=benchmark_db_mode)
+
+    mining = subparsers.add_parser("itemsets", help="对比频繁项集挖掘算法随购物篮数和设备数的扩展性")
+    mining.add_argument("--baskets", type=int, nargs="+", default=[1000, 10000, 100000], help="购物篮数")
+    mining.add_argument("--devices", type=int, nargs="+", default=[20, 200, 2000], help="不同设备数")
+    mining.add_argument("--avg-size", type=float, default=3.0, help="平均每个购物篮的设备数")
+    mining.add_argument("--min-support", type=float, default=0.01, help="最小支持度")
+    mining.add_argument("--max-len", type=int, default=None, help="项集最大长度")
+    mining.add_argument("--algorithms", default="eclat,fpgrowth,apriori", help="参与对比的算法，逗号分隔")
+    mining.add_argument("--apriori-max-devices", type=int, default=200, help="设备数超过此值时跳过apriori")
+    mining.set_defaults(func=benchmark_itemsets)
+
+    ingest = subparsers.add_parser("ingest", help="对比逐条写入与批量写入使用记录的吞吐量（会向数据库写入测试记录）")
+    ingest.add_argument("--single-rows", type=int, default=2000, help="逐条写入的记录数")
+    ingest.add_argument("--bulk-rows", type=int, default=100000, help="批量写入的记录数")
+    ingest.add_argument("--batch-size", type=int, default=5000, help="每个批量请求的记录数")
+    ingest.add_argument("--concurrency", type=int, default=16, help="逐条写入的并发客户端数")
+    ingest.add_argument("--device-ids", default="1", help="使用的设备ID，逗号分隔（需已存在）")
+    ingest.add_argument("--user-id", type=int, default=1, help="使用的用户ID（需已存在）")
+    ingest.add_argument("--start", default="2020-01-01T00:00:00", help="生成记录的起始时间")
+    ingest.add_argument("--port", type=int, default=8100, help="临时服务端口")
+    ingest.set_defaults(func=benchmark_ingest)
+
+    queries = subparsers.add_parser("queries", help="检查列表接口是否存在N+1查询（语句数随行数增长时返回非零状态）")
+    queries.add_argument("--limit", type=int, default=100, help="与limit=1对比的每页行数")
+    queries.add_argument("--port", type=int, default=8100, help="临时服务端口")
+    queries.set_defaults(func=check_query_counts)
+
+    writes = subparsers.add_parser("writes", help="测量更新和删除接口的延迟及SQL语句数（会向数据库写入测试记录）")
+    writes.add_argument("--requests", type=int, default=500, help="每种请求的次数")
+    writes.add_argument("--port", type=int, default=8100, help="临时服务端口")
+    writes.set_defaults(func=benchmark_writes)
+
+    logins = subparsers.add_parser("logins", help="测量并发登录时登录和其他请求的延迟（会向数据库写入测试用户）")
+    logins.add_argument("--workers", type=int, nargs="+", default=[0, 2], help="对比的PASSWORD_HASH_WORKERS取值")
+    logins.add_argument("--requests", type=int, default=200, help="登录请求数")
+    logins.add_argument("--concurrency", type=int, default=16, help="并发登录的客户端数")
+    logins.add_argument("--probe-path", default="/api/devices/categories/", help="登录期间持续请求的接口")
+    logins.add_argument("--port", type=int, default=8100, help="临时服务端口")
+    logins.set_defaults(func=benchmark_logins)
+
+    auth = subparsers.add_parser("auth", help="对比开启和关闭认证缓存时需要认证的接口的吞吐量（会向数据库写入测试用户）")
+    auth.add_argument("--requests", type=int, default=2000, help="总请求数")
+    auth.add_argument("--concurrency", type=int, default=16, help="并发客户端数")
+    auth.add_argument("--port", type=int, default=8100, help="临时服务端口")
+    auth.set_defaults(func=benchmark_auth)
+
+    imports = subparsers.add_parser("imports", help="检查导入应用的耗时和是否加载了分析依赖（超出预算时返回非零状态）")
+    imports.add_argument("--budget-ms", type=float, default=1500, help="导入耗时预算（毫秒）")
+    imports.add_argument("--repeat", type=int, default=3, help="重复导入的次数")
+    imports.set_defaults(func=check_import_time)
+
+    chart = subparsers.add_parser("charts", help="测量图表接口的绘制、缓存命中和304延迟")
+    chart.add_argument("--chart", default="device-usage-frequency", help="图表名")
+    chart.add_argument("--format", default="png", choices=["png", "svg"], help="图像格式")
+    chart.add_argument("--start", default="2000-01-01T00:00:00", help="数据的起始时间（带过滤条件时实时计算，不读物化视图）")
+    chart.add_argument("--requests", type=int, default=500, help="缓存命中阶段的总请求数")
+    chart.add_argument("--concurrency", type=int, default=16, help="并发客户端数")
+    chart.add_argument("--port", type=int, default=8100, help="临时服务端口")
+    chart.set_defaults(func=benchmark_charts)
+
+    startup = subparsers.add_parser("startup", help="测量服务从启动到可以响应请求所需的时间")
+    startup.add_argument("--path", default="/health/ready", help="判断启动完成的接口")
+    startup.add_argument("--repeat", type=int, default=5, help="重复启动的次数")
+    startup.add_argument("--port", type=int, default=8100, help="临时服务端口")
+    startup.set_defaults(func=benchmark_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""initial schema
+
+与引入迁移之前Base.metadata.create_all创建的表结构一致。
+已有数据库由init_db自动标记为此版本，不会重复建表。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('phone', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_login', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_index('ix_users_user_id', 'users', ['user_id'])
+
+    op.create_table(
+        'device_categories',
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('category_name', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('category_id'),
+    )
+    op.create_index('ix_device_categories_category_id', 'device_categories', ['category_id'])
+
+    op.create_table(
+        'homes',
+        sa.Column('home_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('home_name', sa.String(length=100), nullable=False),
+        sa.Column('address', sa.String(length=255), nullable=True),
+        sa.Column('square_meters', sa.Float(), nullable=False),
+        sa.Column('num_rooms', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('home_id'),
+    )
+    op.create_index('ix_homes_home_id', 'homes', ['home_id'])
+
+    op.create_table(
+        'devices',
+        sa.Column('device_id', sa.Integer(), nullable=False),
+        sa.Column('home_id', sa.Integer(), nullable=True),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('device_name', sa.String(length=100), nullable=False),
+        sa.Column('model', sa.String(length=100), nullable=True),
+        sa.Column('manufacturer', sa.String(length=100), nullable=True),
+        sa.Column('room_location', sa.String(length=50), nullable=True),
+        sa.Column('ip_address', sa.String(length=20), nullable=True),
+        sa.Column('mac_address', sa.String(length=20), nullable=True),
+        sa.Column('firmware_version', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['category_id'], ['device_categories.category_id']),
+        sa.ForeignKeyConstraint(['home_id'], ['homes.home_id']),
+        sa.PrimaryKeyConstraint('device_id'),
+    )
+    op.create_index('ix_devices_device_id', 'devices', ['device_id'])
+
+    op.create_table(
+        'feedbacks',
+        sa.Column('feedback_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('feedback_type', sa.String(length=50), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=True),
+        sa.Column('responded', sa.Boolean(), nullable=True),
+        sa.Column('response', sa.Text(), nullable=True),
+        sa.Column('response_time', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('feedback_id'),
+    )
+    op.create_index('ix_feedbacks_feedback_id', 'feedbacks', ['feedback_id'])
+
+    op.create_table(
+        'device_usage',
+        sa.Column('usage_id', sa.Integer(), nullable=False),
+        sa.Column('device_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=True),
+        sa.Column('operation_type', sa.String(length=50), nullable=True),
+        sa.Column('operation_value', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.device_id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('usage_id'),
+    )
+    op.create_index('ix_device_usage_usage_id', 'device_usage', ['usage_id'])
+
+    op.create_table(
+        'security_events',
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('home_id', sa.Integer(), nullable=True),
+        sa.Column('device_id', sa.Integer(), nullable=True),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('severity', sa.String(length=20), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('location', sa.String(length=100), nullable=True),
+        sa.Column('event_time', sa.DateTime(), nullable=True),
+        sa.Column('is_resolved', sa.Boolean(), nullable=True),
+        sa.Column('resolved_by', sa.Integer(), nullable=True),
+        sa.Column('resolved_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.device_id']),
+        sa.ForeignKeyConstraint(['home_id'], ['homes.home_id']),
+        sa.ForeignKeyConstraint(['resolved_by'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('event_id'),
+    )
+    op.create_index('ix_security_events_event_id', 'security_events', ['event_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_security_events_event_id', table_name='security_events')
+    op.drop_table('security_events')
+    op.drop_index('ix_device_usage_usage_id', table_name='device_usage')
+    op.drop_table('device_usage')
+    op.drop_index('ix_feedbacks_feedback_id', table_name='feedbacks')
+    op.drop_table('feedbacks')
+    op.drop_index('ix_devices_device_id', table_name='devices')
+    op.drop_table('devices')
+    op.drop_index('ix_homes_home_id', table_name='homes')
+    op.drop_table('homes')
+    op.drop_index('ix_device_categories_category_id', table_name='device_categories')
+    op.drop_table('device_categories')
+    op.drop_index('ix_users_user_id', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,60 @@
+"""device_usage indexes for hot queries
+
+- (device_id, start_time DESC)：按设备查询使用记录并按时间倒序，以及分析SQL中按device_id关联
+- (user_id, start_time DESC)：按用户查询使用记录并按时间倒序
+- BRIN(start_time)：按时间范围扫描，start_time随写入单调增长，BRIN索引体积极小
+
+索引使用CREATE INDEX CONCURRENTLY创建，不阻塞线上写入。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY不能在事务中执行
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_device_usage_device_id_start_time',
+            'device_usage',
+            ['device_id', sa.text('start_time DESC')],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_device_usage_user_id_start_time',
+            'device_usage',
+            ['user_id', sa.text('start_time DESC')],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_device_usage_start_time_brin',
+            'device_usage',
+            ['start_time'],
+            postgresql_using='brin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_device_usage_start_time_brin', table_name='device_usage', postgresql_concurrently=True)
+        op.drop_index('ix_device_usage_user_id_start_time', table_name='device_usage', postgresql_concurrently=True)
+        op.drop_index('ix_device_usage_device_id_start_time', table_name='device_usage', postgresql_concurrently=True)
@@ -0,0 +1,135 @@
+"""partition device_usage by month on start_time
+
+将device_usage转换为按start_time月度范围分区的分区表：
+- 主键改为(usage_id, start_time)，分区表的主键必须包含分区键
+- 为已有数据覆盖的每个月以及未来几个月创建分区，另建DEFAULT分区兜底
+- 沿用原usage_id序列，已有ID保持不变
+- 索引建在父表上，由PostgreSQL自动传播到各分区
+
+后续分区由app.services.partitions定期创建和归档。仅PostgreSQL执行此迁移。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "usage_id, device_id, user_id, start_time, end_time, operation_type, operation_value, created_at"
+MONTHS_AHEAD = 3
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + 1, 1, 1) if month.month == 12 else date(month.year, month.month + 1, 1)
+
+
+def _create_usage_indexes() -> None:
+    op.create_index('ix_device_usage_usage_id', 'device_usage', ['usage_id'])
+    op.create_index('ix_device_usage_device_id_start_time', 'device_usage', ['device_id', sa.text('start_time DESC')])
+    op.create_index('ix_device_usage_user_id_start_time', 'device_usage', ['user_id', sa.text('start_time DESC')])
+    op.create_index('ix_device_usage_start_time_brin', 'device_usage', ['start_time'], postgresql_using='brin')
+
+
+def _drop_usage_indexes() -> None:
+    op.drop_index('ix_device_usage_start_time_brin', table_name='device_usage')
+    op.drop_index('ix_device_usage_user_id_start_time', table_name='device_usage')
+    op.drop_index('ix_device_usage_device_id_start_time', table_name='device_usage')
+    op.drop_index('ix_device_usage_usage_id', table_name='device_usage')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # 旧表改名保留，数据复制完成后删除
+    _drop_usage_indexes()
+    op.execute("ALTER TABLE device_usage RENAME TO device_usage_legacy")
+    op.execute("ALTER TABLE device_usage_legacy RENAME CONSTRAINT device_usage_pkey TO device_usage_legacy_pkey")
+    op.execute("ALTER SEQUENCE device_usage_usage_id_seq OWNED BY NONE")
+
+    op.create_table(
+        'device_usage',
+        sa.Column('usage_id', sa.Integer(), server_default=sa.text("nextval('device_usage_usage_id_seq'::regclass)"), nullable=False),
+        sa.Column('device_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=True),
+        sa.Column('operation_type', sa.String(length=50), nullable=True),
+        sa.Column('operation_value', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.device_id'], name='device_usage_device_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], name='device_usage_user_id_fkey'),
+        sa.PrimaryKeyConstraint('usage_id', 'start_time'),
+        postgresql_partition_by='RANGE (start_time)',
+    )
+    op.execute("ALTER SEQUENCE device_usage_usage_id_seq OWNED BY device_usage.usage_id")
+
+    # 覆盖已有数据的月份到当前月份之后MONTHS_AHEAD个月
+    today = date.today()
+    current_month = date(today.year, today.month, 1)
+    oldest = bind.execute(sa.text("SELECT MIN(start_time) FROM device_usage_legacy")).scalar()
+    month = date(oldest.year, oldest.month, 1) if oldest else current_month
+    last_month = current_month
+    for _ in range(MONTHS_AHEAD):
+        last_month = _next_month(last_month)
+
+    while month <= last_month:
+        upper = _next_month(month)
+        op.execute(
+            f"CREATE TABLE device_usage_p{month:%Y%m} PARTITION OF device_usage "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+    op.execute("CREATE TABLE device_usage_default PARTITION OF device_usage DEFAULT")
+
+    op.execute(f"INSERT INTO device_usage ({COLUMNS}) SELECT {COLUMNS} FROM device_usage_legacy")
+    op.drop_table('device_usage_legacy')
+
+    _create_usage_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    _drop_usage_indexes()
+    op.execute("ALTER TABLE device_usage RENAME TO device_usage_partitioned")
+    op.execute("ALTER TABLE device_usage_partitioned RENAME CONSTRAINT device_usage_pkey TO device_usage_partitioned_pkey")
+    op.execute("ALTER SEQUENCE device_usage_usage_id_seq OWNED BY NONE")
+
+    op.create_table(
+        'device_usage',
+        sa.Column('usage_id', sa.Integer(), server_default=sa.text("nextval('device_usage_usage_id_seq'::regclass)"), nullable=False),
+        sa.Column('device_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=True),
+        sa.Column('operation_type', sa.String(length=50), nullable=True),
+        sa.Column('operation_value', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.device_id'], name='device_usage_device_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], name='device_usage_user_id_fkey'),
+        sa.PrimaryKeyConstraint('usage_id'),
+    )
+    op.execute("ALTER SEQUENCE device_usage_usage_id_seq OWNED BY device_usage.usage_id")
+
+    op.execute(f"INSERT INTO device_usage ({COLUMNS}) SELECT {COLUMNS} FROM device_usage_partitioned")
+    # 删除父表会连同所有分区一起删除；已归档（detach）的分区不受影响
+    op.drop_table('device_usage_partitioned')
+
+    _create_usage_indexes()
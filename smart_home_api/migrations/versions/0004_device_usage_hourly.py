@@ -0,0 +1,57 @@
+"""add device_usage_hourly rollup
+
+按(device_id, 小时)预聚合的使用统计，供使用频率、时间段和房屋面积分析读取。
+由app.services.usage_rollup在写入使用记录时增量维护，并由后台任务定期重算最近的数据。
+升级时根据已有使用记录回填。
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'device_usage_hourly',
+        sa.Column('device_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('usage_count', sa.Integer(), nullable=False),
+        sa.Column('completed_count', sa.Integer(), nullable=False),
+        sa.Column('total_seconds', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.device_id']),
+        sa.PrimaryKeyConstraint('device_id', 'bucket'),
+    )
+    op.create_index('ix_device_usage_hourly_bucket', 'device_usage_hourly', ['bucket'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            INSERT INTO device_usage_hourly (device_id, bucket, usage_count, completed_count, total_seconds)
+            SELECT
+                device_id,
+                date_trunc('hour', start_time),
+                COUNT(*),
+                COUNT(end_time),
+                COALESCE(SUM(EXTRACT(EPOCH FROM (end_time - start_time))), 0)
+            FROM device_usage
+            WHERE device_id IS NOT NULL
+            GROUP BY device_id, date_trunc('hour', start_time)
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_device_usage_hourly_bucket', table_name='device_usage_hourly')
+    op.drop_table('device_usage_hourly')
@@ -0,0 +1,127 @@
+"""add materialized views for analytics
+
+为不带过滤条件的分析查询建立物化视图，由app.services.analytics_views定期
+REFRESH MATERIALIZED VIEW CONCURRENTLY刷新。CONCURRENTLY刷新要求视图上有唯一索引。
+analytics_view_refreshes记录每个视图最近一次刷新的时间，用于在响应中报告数据的新鲜度。
+
+设备使用相关视图基于device_usage_hourly汇总表计算。仅PostgreSQL执行此迁移。
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 视图名 -> (查询, 唯一索引列)
+VIEWS = {
+    'mv_device_usage_frequency': ("""
+        SELECT 
+            d.device_id,
+            d.device_name,
+            dc.category_name,
+            h.home_id,
+            h.square_meters,
+            SUM(r.completed_count) as usage_count,
+            SUM(r.total_seconds)/3600 as total_hours
+        FROM devices d
+        JOIN device_categories dc ON d.category_id = dc.category_id
+        JOIN homes h ON d.home_id = h.home_id
+        JOIN device_usage_hourly r ON d.device_id = r.device_id
+        WHERE r.completed_count > 0
+        GROUP BY d.device_id, d.device_name, dc.category_name, h.home_id, h.square_meters
+    """, ['device_id']),
+    'mv_device_usage_timeframe': ("""
+        SELECT 
+            d.device_id,
+            d.device_name,
+            dc.category_name,
+            EXTRACT(HOUR FROM r.bucket) as hour_of_day,
+            SUM(r.usage_count) as usage_count
+        FROM device_usage_hourly r
+        JOIN devices d ON r.device_id = d.device_id
+        JOIN device_categories dc ON d.category_id = dc.category_id
+        WHERE r.usage_count > 0
+        GROUP BY d.device_id, d.device_name, dc.category_name, hour_of_day
+    """, ['device_id', 'hour_of_day']),
+    'mv_home_area_impact': ("""
+        SELECT 
+            h.square_meters,
+            h.num_rooms,
+            d.device_id,
+            d.device_name,
+            dc.category_name,
+            SUM(r.completed_count) as usage_count,
+            SUM(r.total_seconds)/3600 as total_hours
+        FROM homes h
+        JOIN devices d ON h.home_id = d.home_id
+        JOIN device_categories dc ON d.category_id = dc.category_id
+        JOIN device_usage_hourly r ON d.device_id = r.device_id
+        WHERE r.completed_count > 0
+        GROUP BY h.square_meters, h.num_rooms, d.device_id, d.device_name, dc.category_name
+    """, ['device_id']),
+    'mv_security_events_summary': ("""
+        SELECT 
+            h.home_id,
+            h.home_name,
+            h.square_meters,
+            COUNT(se.event_id) as total_events,
+            COUNT(CASE WHEN se.is_resolved = FALSE THEN 1 END) as unresolved_events,
+            COUNT(CASE WHEN se.severity = 'high' THEN 1 END) as high_severity_events,
+            COUNT(CASE WHEN se.severity = 'medium' THEN 1 END) as medium_severity_events,
+            COUNT(CASE WHEN se.severity = 'low' THEN 1 END) as low_severity_events
+        FROM homes h
+        LEFT JOIN security_events se ON h.home_id = se.home_id
+        GROUP BY h.home_id, h.home_name, h.square_meters
+    """, ['home_id']),
+    'mv_user_feedback_analysis': ("""
+        SELECT 
+            feedback_type,
+            AVG(rating) as average_rating,
+            COUNT(*) as total_feedbacks,
+            COUNT(CASE WHEN responded = TRUE THEN 1 END) as responded_count,
+            EXTRACT(MONTH FROM created_at) as month,
+            EXTRACT(YEAR FROM created_at) as year
+        FROM feedbacks
+        GROUP BY feedback_type, EXTRACT(MONTH FROM created_at), EXTRACT(YEAR FROM created_at)
+    """, ['feedback_type', 'year', 'month']),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.create_table(
+        'analytics_view_refreshes',
+        sa.Column('view_name', sa.String(length=100), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('duration_ms', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('view_name'),
+    )
+
+    for name, (query, unique_columns) in VIEWS.items():
+        op.execute(f"CREATE MATERIALIZED VIEW {name} AS {query} WITH DATA")
+        op.create_index(f'ux_{name}', name, unique_columns, unique=True)
+        op.execute(f"INSERT INTO analytics_view_refreshes (view_name, refreshed_at) VALUES ('{name}', now())")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name in reversed(list(VIEWS)):
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name}")
+    op.drop_table('analytics_view_refreshes')
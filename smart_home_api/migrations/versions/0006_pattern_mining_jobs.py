@@ -0,0 +1,55 @@
+"""add pattern_mining_jobs and device_usage data version sequence
+
+pattern_mining_jobs保存后台关联规则挖掘任务的参数、状态和结果，
+以(参数摘要, 数据版本)唯一，相同参数在数据未变化时直接复用已有结果。
+
+device_usage_version_seq在每次通过服务层写入device_usage后递增，作为数据版本（watermark）。
+序列不受事务回滚影响且不会产生行锁竞争。仅PostgreSQL创建序列。
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'pattern_mining_jobs',
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('params_key', sa.String(length=64), nullable=False),
+        sa.Column('params', sa.JSON(), nullable=False),
+        sa.Column('data_watermark', sa.BigInteger(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('job_id'),
+        sa.UniqueConstraint('params_key', 'data_watermark', name='uq_pattern_mining_jobs_params_watermark'),
+    )
+    op.create_index('ix_pattern_mining_jobs_job_id', 'pattern_mining_jobs', ['job_id'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE SEQUENCE IF NOT EXISTS device_usage_version_seq")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP SEQUENCE IF EXISTS device_usage_version_seq")
+    op.drop_index('ix_pattern_mining_jobs_job_id', table_name='pattern_mining_jobs')
+    op.drop_table('pattern_mining_jobs')
@@ -0,0 +1,55 @@
+"""add usage_itemset_counts for incremental association-rule mining
+
+usage_itemset_counts保存每个设备组合（长度不超过计数上限）出现过的购物篮数，
+usage_itemset_state记录已计入的时间窗口和购物篮总数。
+由app.services.usage_itemsets只对新的时间窗口增量更新，关联规则直接由计数推导。
+升级时不回填，首次刷新时自动全量计数。
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'usage_itemset_counts',
+        sa.Column('itemset', postgresql.ARRAY(sa.Text()), nullable=False),
+        sa.Column('length', sa.SmallInteger(), nullable=False),
+        sa.Column('basket_count', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('itemset'),
+    )
+    op.create_index(
+        'ix_usage_itemset_counts_length_basket_count', 'usage_itemset_counts', ['length', 'basket_count']
+    )
+    op.create_table(
+        'usage_itemset_state',
+        sa.Column('state_id', sa.Integer(), nullable=False),
+        sa.Column('counted_until', sa.DateTime(), nullable=True),
+        sa.Column('basket_count', sa.BigInteger(), nullable=False),
+        sa.Column('usage_count', sa.BigInteger(), nullable=False),
+        sa.Column('max_len', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('state_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('usage_itemset_state')
+    op.drop_index('ix_usage_itemset_counts_length_basket_count', table_name='usage_itemset_counts')
+    op.drop_table('usage_itemset_counts')
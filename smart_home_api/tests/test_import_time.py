@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from .conftest import TEST_DATABASE_URL
+
+# 导入app.main时会创建数据库引擎（不连接），需要能导入DATABASE_URL对应的驱动；
+# 子进程继承conftest设置的DATABASE_URL（未指定驱动时已固定为psycopg2）
+try:
+    TEST_DATABASE_URL.get_dialect().import_dbapi()
+except ImportError as e:
+    pytest.skip(f"未安装数据库驱动，无法导入app.main: {e}", allow_module_level=True)
+
+# 只有分析接口用到的依赖，导入app.main（即每个worker启动）时不应加载
+HEAVY_MODULES = ("numpy", "pandas", "scipy", "mlxtend", "sklearn", "matplotlib", "seaborn")
+# 导入耗时预算（毫秒），取多次导入中的最短耗时比较
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+IMPORT_REPEAT = 3
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted({name.split(".")[0] for name in sys.modules})}))
+"""
+
+def _import_app():
+    """在新的解释器中导入app.main，返回(耗时毫秒, 已加载的顶层模块)"""
+    result = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, f"导入app.main失败:\n{result.stderr}"
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return probe["seconds"] * 1000, set(probe["modules"])
+
+def test_import_does_not_load_analytics_dependencies():
+    _, modules = _import_app()
+    loaded = sorted(modules.intersection(HEAVY_MODULES))
+    assert not loaded, f"导入app.main时加载了{', '.join(loaded)}，应改为在使用它们的函数内导入"
+
+def test_import_time_within_budget():
+    elapsed_ms = min(_import_app()[0] for _ in range(IMPORT_REPEAT))
+    assert elapsed_ms <= IMPORT_TIME_BUDGET_MS, f"导入app.main耗时{elapsed_ms:.0f}ms，超过预算{IMPORT_TIME_BUDGET_MS:.0f}ms"
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import text
+
+# 排序键首列可为NULL的列表接口：(路径, 表, 主键, 可为NULL的排序列)
+NULLABLE_KEYSET_PATHS = [
+    ("/api/feedback/", "feedbacks", "feedback_id", "created_at"),
+    ("/api/security-events/", "security_events", "event_id", "event_time"),
+]
+
+def _walk(client, path, key, limit):
+    """按游标逐页读取整个列表，返回依次读到的主键"""
+    seen = []
+    params = {"limit": limit}
+    while True:
+        response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        seen.extend(row[key] for row in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen
+        params = {"limit": limit, "cursor": cursor}
+
+@pytest.fixture(scope="module")
+def null_keyed_rows(seeded):
+    """绕过API写入排序键为NULL的行（列本身可为空）"""
+    from app.database import engine
+    with engine.begin() as connection:
+        user_id, home_id = connection.execute(text("SELECT u.user_id, h.home_id FROM users u JOIN homes h USING (user_id) LIMIT 1")).one()
+        for _ in range(3):
+            connection.execute(text(
+                "INSERT INTO feedbacks (user_id, feedback_type, content, rating, responded) "
+                "VALUES (:user_id, 'general', 'NULL排序键', 3, false)"
+            ), {"user_id": user_id})
+            connection.execute(text(
+                "INSERT INTO security_events (home_id, event_type, description, severity, is_resolved, created_at) "
+                "VALUES (:home_id, '测试', 'NULL排序键', 'low', false, now())"
+            ), {"home_id": home_id})
+    return seeded
+
+@pytest.mark.parametrize("path, table, key, column", NULLABLE_KEYSET_PATHS)
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_cursor_pagination_includes_null_keyed_rows(null_keyed_rows, path, table, key, column, limit):
+    from app.database import engine
+    with engine.connect() as connection:
+        expected = connection.execute(text(f"SELECT count(*) FROM {table}")).scalar_one()
+        nulls = connection.execute(text(f"SELECT count(*) FROM {table} WHERE {column} IS NULL")).scalar_one()
+    assert nulls > 0
+
+    seen = _walk(null_keyed_rows, path, key, limit)
+    assert len(seen) == len(set(seen)) == expected
@@ -0,0 +1,26 @@
+import pytest
+
+from .conftest import SEEDED_ROWS
+
+# 列表接口：返回的行数增加时执行的SQL语句数应保持不变（没有N+1查询）
+LIST_PATHS = [
+    "/api/users/",
+    "/api/homes/",
+    "/api/devices/",
+    "/api/devices/categories/",
+    "/api/device-usage/",
+    "/api/security-events/",
+    "/api/feedback/",
+]
+
+@pytest.mark.parametrize("path", LIST_PATHS)
+def test_list_statement_count_does_not_grow_with_limit(seeded, count_request_statements, path):
+    small, small_count = count_request_statements(path, limit=1)
+    large, large_count = count_request_statements(path, limit=100)
+
+    assert small.status_code == 200 and large.status_code == 200
+    assert len(small.json()) == 1
+    assert len(large.json()) >= SEEDED_ROWS
+    # 语句数为0说明计数没有覆盖到请求内的查询，比较没有意义
+    assert small_count > 0
+    assert large_count == small_count, f"{path}: limit=1执行{small_count}条语句，limit=100执行{large_count}条"
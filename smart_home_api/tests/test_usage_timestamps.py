@@ -0,0 +1,48 @@
+import pytest
+
+def _device_and_user(client):
+    device = client.get("/api/devices/", params={"limit": 1}).json()[0]
+    user = client.get("/api/users/", params={"limit": 1}).json()[0]
+    return device["device_id"], user["user_id"]
+
+def test_mixed_aware_and_naive_timestamps(seeded):
+    device_id, user_id = _device_and_user(seeded)
+
+    # 带时区的时间换算为UTC后保存，可以与不带时区的时间相减
+    response = seeded.post("/api/device-usage/", json={
+        "device_id": device_id, "user_id": user_id,
+        "start_time": "2026-10-02T10:00:00+08:00", "end_time": "2026-10-02T02:30:00",
+    })
+    assert response.status_code == 201, response.text
+    assert response.json()["start_time"] == "2026-10-02T02:00:00"
+    assert response.json()["end_time"] == "2026-10-02T02:30:00"
+
+    # 同一批次中同一设备的记录混用带时区和不带时区的时间
+    response = seeded.post("/api/device-usage/bulk", json=[
+        {"device_id": device_id, "user_id": user_id,
+         "start_time": "2026-10-03T09:00:00+08:00", "end_time": "2026-10-03T01:20:00"},
+        {"device_id": device_id, "user_id": user_id,
+         "start_time": "2026-10-03T01:30:00", "end_time": "2026-10-03T01:40:00Z"},
+    ])
+    assert response.status_code == 200, response.text
+    assert response.json()["inserted"] == 2, response.json()["errors"]
+
+def test_json_and_columnar_store_the_same_time(seeded):
+    msgpack = pytest.importorskip("msgpack")
+    device_id, user_id = _device_and_user(seeded)
+    start_time = "2026-10-04T10:00:00+08:00"
+
+    response = seeded.post("/api/device-usage/bulk", json=[
+        {"device_id": device_id, "user_id": user_id, "start_time": start_time},
+    ])
+    json_id = response.json()["usage_ids"][0]
+    response = seeded.post(
+        "/api/device-usage/bulk/columnar",
+        content=msgpack.packb({"device_id": [device_id], "user_id": [user_id], "start_time": [start_time]}),
+        headers={"Content-Type": "application/msgpack"},
+    )
+    columnar_id = response.json()["usage_ids"][0]
+    assert json_id is not None and columnar_id is not None
+
+    stored = [seeded.get(f"/api/device-usage/{usage_id}").json()["start_time"] for usage_id in (json_id, columnar_id)]
+    assert stored == ["2026-10-04T02:00:00", "2026-10-04T02:00:00"]
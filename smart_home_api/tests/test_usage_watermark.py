@@ -0,0 +1,41 @@
+import threading
+
+def _watermark():
+    from app.database import SessionLocal
+    from app.services.usage_rollup import get_usage_watermark
+    db = SessionLocal()
+    try:
+        return get_usage_watermark(db)
+    finally:
+        db.close()
+
+def test_write_bumps_watermark(seeded):
+    device = seeded.get("/api/devices/", params={"limit": 1}).json()[0]
+    user = seeded.get("/api/users/", params={"limit": 1}).json()[0]
+    before = _watermark()
+
+    response = seeded.post("/api/device-usage/", json={
+        "device_id": device["device_id"], "user_id": user["user_id"], "start_time": "2026-10-05T08:00:00",
+    })
+    assert response.status_code == 201, response.text
+    assert _watermark() > before
+
+def test_watermark_waits_for_uncommitted_write(seeded):
+    from app.database import SessionLocal
+    from app.services.usage_rollup import bump_usage_watermark
+
+    writer = SessionLocal()
+    try:
+        bump_usage_watermark(writer)
+        result = []
+        reader = threading.Thread(target=lambda: result.append(_watermark()))
+        reader.start()
+        # 写入事务提交前读取方一直等待
+        reader.join(0.5)
+        assert reader.is_alive()
+        writer.commit()
+        reader.join(10)
+        assert not reader.is_alive()
+    finally:
+        writer.close()
+    assert result == [_watermark()]